@@ -1,8 +1,6 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-import seaborn as sns
 import os
+import time
 from datetime import datetime
 import numpy as np
 import re
@@ -10,15 +8,86 @@ import json
 import sys
 import ast
 import shutil
+import hashlib
+import importlib.metadata
+from concurrent.futures import ProcessPoolExecutor
 from collections import Counter
 from pathlib import Path  # 使用 pathlib 处理路径
 
-# 关键修复：在导入 matplotlib 后立即设置非交互式后端
-import matplotlib
-matplotlib.use('Agg')  # 必须在导入 pyplot 前设置
-mpl.rcParams['font.family'] = 'sans-serif'
-mpl.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'KaiTi', 'Arial Unicode MS']
-mpl.rcParams['axes.unicode_minus'] = False
+try:
+    from src.backup_store import DEFAULT_RETENTION, BackupStore
+    from src.code_structure import analyze_code_structure
+    from src.contributors import contributor_timeline, summarize_contributors
+    from src.cube import CommitCube, config_digest, default_cube_format
+    from src.identity import mailmap_digest, resolve_author_identities
+    from src.instrumentation import profiling, record_span, span
+    from src.pipeline import Pipeline, file_digest
+    from src.storage import (SUPPORTED_FORMATS, load_commit_table, save_commit_table,
+                             split_date_offset)
+except ImportError:  # 直接以脚本方式运行 src/analysis.py
+    from backup_store import DEFAULT_RETENTION, BackupStore
+    from code_structure import analyze_code_structure
+    from contributors import contributor_timeline, summarize_contributors
+    from cube import CommitCube, config_digest, default_cube_format
+    from identity import mailmap_digest, resolve_author_identities
+    from instrumentation import profiling, record_span, span
+    from pipeline import Pipeline, file_digest
+    from storage import (SUPPORTED_FORMATS, load_commit_table, save_commit_table,
+                             split_date_offset)
+
+# 已导入并配置好的绘图库 (pyplot, seaborn)，首次绘图时才导入
+_PLOTTING = None
+
+def _plotting():
+    """
+    按需导入绘图库：matplotlib 与 seaborn 的导入开销较大，只收集数据或读取结果时不需要
+
+    Returns:
+        tuple: (matplotlib.pyplot, seaborn)
+    """
+    global _PLOTTING
+    if _PLOTTING is None:
+        # 关键修复：在导入 pyplot 前设置非交互式后端
+        import matplotlib
+        matplotlib.use('Agg')
+        matplotlib.rcParams['font.family'] = 'sans-serif'
+        matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'KaiTi', 'Arial Unicode MS']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        _PLOTTING = plt, sns
+    return _PLOTTING
+
+def _package_version(name):
+    """已安装包的版本（读取包元数据，不导入包本身）"""
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return '未安装'
+
+# 流水线阶段缓存目录（位于输出目录下，清理和备份时跳过）
+PIPELINE_CACHE_DIR = '.cache'
+# 代码结构分析的 blob 解析结果缓存（位于流水线缓存目录中，跨运行复用）
+BLOB_METRICS_CACHE = 'ast_blob_metrics.json'
+# 作者身份映射缓存（位于流水线缓存目录中，跨运行复用，只解析新出现的身份）
+IDENTITY_CACHE = 'author_identities.json'
+# 运行剖析文件（与 summary.txt 放在一起）；Trace Event 文件可用 Chrome / Perfetto 打开
+RUN_PROFILE = 'run_profile.json'
+RUN_TRACE = 'run_profile.trace.json'
+# 预聚合立方体文件名（不含扩展名），位于输出目录下，跨运行保留并增量更新
+CUBE_NAME = 'commit_cube'
+
+# 报告中的项目信息（默认为 requests；批量分析时按仓库替换）
+DEFAULT_PROJECT = {
+    'name': 'requests',
+    'url': 'https://github.com/psf/requests',
+    'description': '简单而优雅的HTTP库，Python中最流行的HTTP客户端库之一',
+    'note': 'requests 是一个被 1,000,000+ 仓库依赖的流行库，每周下载量约 3000 万次，是研究开源项目演化的理想案例。',
+}
+
+# 分析用到的列（列式存储时只加载这些列）
+ANALYSIS_COLUMNS = ['hash', 'commit_hash', 'author', 'date', 'utc_offset', 'message',
+                    'lines_added', 'lines_deleted', 'files_changed']
 
 def robust_date_parser(date_str):
     """健壮的日期解析函数，处理各种可能的日期格式"""
@@ -45,15 +114,242 @@ def robust_date_parser(date_str):
         # 最终尝试：使用 pandas 自动推断
         return pd.to_datetime(date_str, errors='coerce')
 
-def save_figure(output_dir, figure_name):
-    """保存图表并验证"""
+def _parse_date_with_offset(value):
+    """逐行回退解析：返回 (本地时间, UTC 偏移分钟数)"""
+    parsed = robust_date_parser(value)
+    if pd.isna(parsed):
+        # 最终尝试：使用 pandas 自动推断
+        parsed = pd.to_datetime(value, errors='coerce')
+    if pd.isna(parsed):
+        return pd.NaT, pd.NA
+    parsed = pd.Timestamp(parsed)
+    if parsed.tzinfo is not None:
+        return parsed.tz_localize(None), int(parsed.utcoffset().total_seconds() // 60)
+    return parsed, 0
+
+def normalize_dates(dates):
+    """
+    向量化日期规范化：一次解析整列，只对无法解析的值逐行回退
+
+    Args:
+        dates (pd.Series): 原始日期列
+
+    Returns:
+        pd.DataFrame: date（提交者本地时间）、utc_offset（分钟）、date_utc 三列
+    """
+    local, offset = split_date_offset(dates)
+    failed = local.isna() & dates.notna()
+    if failed.any():
+        print(f"⚠️  {int(failed.sum())} 个日期无法向量化解析，逐行回退解析")
+        fallback = dates[failed].map(_parse_date_with_offset)
+        local = local.copy()
+        offset = offset.copy()
+        local[failed] = pd.to_datetime(fallback.map(lambda item: item[0]))
+        offset[failed] = fallback.map(lambda item: item[1]).astype('Int16')
+
+    utc = local - pd.to_timedelta(offset.fillna(0).astype('int64'), unit='m')
+    return pd.DataFrame({'date': local, 'utc_offset': offset, 'date_utc': utc}, index=dates.index)
+
+# 提交消息类型规则（按优先级排列，先匹配的类型优先）
+DEFAULT_MESSAGE_RULES = {
+    'fix': r'\b(fix|bug|error|issue|crash|fail)\b',
+    'feature': r'\b(add|feature|implement|support|new)\b',
+    'refactor': r'\b(refactor|clean|improve|optimize|reorg)\b',
+    'docs': r'\b(doc|readme|comment|typo)\b',
+    'test': r'\b(test|coverage|spec|assert)\b',
+    'perf': r'\b(perf|performance|speed|optimize)\b',
+    'chore': r'\b(chore|ci|build|deps|release)\b'
+}
+# Conventional Commits 前缀 -> 消息类型，优先于关键词规则
+CONVENTIONAL_COMMIT_TYPES = {
+    'feat': 'feature',
+    'fix': 'fix',
+    'docs': 'docs',
+    'refactor': 'refactor',
+    'style': 'refactor',
+    'test': 'test',
+    'perf': 'perf',
+    'chore': 'chore',
+    'build': 'chore',
+    'ci': 'chore',
+}
+
+def _normalize_prefixes(conventional_types):
+    """
+    前缀统一为小写（大小写不同的重复前缀以先出现的为准）
+
+    两条分类路径都按忽略大小写匹配，pyarrow 路径在小写后的消息上提取前缀，
+    因此前缀本身也必须是小写，自定义的大写前缀在两条路径上才能得到相同结果。
+    """
+    normalized = {}
+    for prefix, label in (conventional_types or {}).items():
+        normalized.setdefault(prefix.lower(), label)
+    return normalized
+
+def _message_branches(rules=None, conventional_types=CONVENTIONAL_COMMIT_TYPES):
+    """按优先级列出 (类型, 搜索正则)，Conventional Commits 前缀排在最前"""
+    rules = DEFAULT_MESSAGE_RULES if rules is None else rules
+    branches = []
+    # Conventional Commits: type(scope)!: subject
+    for prefix, label in _normalize_prefixes(conventional_types).items():
+        branches.append((label, rf'^\s*{re.escape(prefix)}(?:\([^)]*\))?!?:'))
+    for label, pattern in rules.items():
+        branches.append((label, pattern))
+    return branches
+
+def build_message_classifier(rules=None, conventional_types=CONVENTIONAL_COMMIT_TYPES):
+    """
+    把所有规则编译成一个正则表达式
+
+    每条规则是一个带前瞻的分支，正则引擎按顺序尝试分支，第一个成功的分支即为
+    该消息的类型，因此一次匹配就能得到与逐条 re.search 相同的优先级结果。
+
+    Args:
+        rules (dict): 类型 -> 正则，按优先级排列，默认 DEFAULT_MESSAGE_RULES
+        conventional_types (dict): Conventional Commits 前缀 -> 类型，传入空字典可关闭
+
+    Returns:
+        tuple: (编译后的正则, 分支名 -> 类型)
+    """
+    parts, labels = [], {}
+    for label, pattern in _message_branches(rules, conventional_types):
+        name = f'b{len(labels)}'
+        parts.append(rf'(?=.*?(?:{pattern}))(?P<{name}>)')
+        labels[name] = label
+    if not parts:
+        return None, labels
+    return re.compile('^(?:' + '|'.join(parts) + ')', re.IGNORECASE | re.DOTALL), labels
+
+def _classify_with_arrow(messages, rules=None, conventional_types=CONVENTIONAL_COMMIT_TYPES):
+    """
+    使用 pyarrow.compute 的 RE2 正则对整列做向量化匹配
+
+    先用所有规则的并集过滤一遍，只有命中的消息才逐条规则确定优先级；
+    Conventional Commits 前缀通过一次 extract_regex 取出。
+    pyarrow 未安装或规则不被 RE2 支持（例如前瞻、反向引用）时返回 None。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return None
+    rules = DEFAULT_MESSAGE_RULES if rules is None else rules
+    conventional_types = _normalize_prefixes(conventional_types)
+    branches = _message_branches(rules, conventional_types)
+    labels = np.full(len(messages), 'other', dtype=object)
+    if not branches or len(messages) == 0:
+        return labels
+    try:
+        array = pc.fill_null(pa.array(messages, type=pa.string(), from_pandas=True), '')
+        combined = '|'.join(f'(?:{pattern})' for _, pattern in branches)
+        hit = pc.match_substring_regex(array, combined, ignore_case=True)
+        hit_index = np.flatnonzero(hit.to_numpy(zero_copy_only=False))
+        candidates = array.take(pa.array(hit_index, type=pa.int64()))
+
+        conditions, choices = [], []
+        if conventional_types:
+            prefixes = '|'.join(re.escape(prefix) for prefix in conventional_types)
+            extracted = pc.extract_regex(
+                pc.utf8_lower(candidates), rf'^\s*(?P<type>{prefixes})(?:\([^)]*\))?!?:'
+            )
+            # 未匹配的行是空结构体，其子字段为 ''，映射后为缺失值
+            prefix = extracted.field('type').to_pandas().map(conventional_types)
+            conditions.append(prefix.notna().to_numpy())
+            choices.append(prefix.to_numpy(dtype=object))
+        for label, pattern in rules.items():
+            conditions.append(
+                pc.match_substring_regex(candidates, pattern, ignore_case=True).to_numpy(zero_copy_only=False)
+            )
+            choices.append(label)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    labels[hit_index] = np.select(conditions, choices, default='other')
+    return labels
+
+def classify_messages(messages, rules=None, conventional_types=CONVENTIONAL_COMMIT_TYPES):
+    """
+    为每条提交消息标注类型
+
+    安装了 pyarrow 时整列交给 RE2 向量化匹配；否则退回到组合正则，
+    相同的消息只匹配一次，每条消息只执行一次匹配。
+
+    Args:
+        messages (pd.Series): 提交消息列
+        rules (dict): 类型 -> 正则，按优先级排列，默认 DEFAULT_MESSAGE_RULES
+        conventional_types (dict): Conventional Commits 前缀 -> 类型
+
+    Returns:
+        pd.Series: 每条提交的类型（未匹配为 'other'）
+    """
+    labels = _classify_with_arrow(messages, rules, conventional_types)
+    if labels is None:
+        codes, uniques = pd.factorize(messages.fillna('').astype(str))
+        classifier, names = build_message_classifier(rules, conventional_types)
+        unique_labels = np.full(len(uniques) + 1, 'other', dtype=object)
+        if classifier is not None:
+            for i, message in enumerate(uniques):
+                match = classifier.match(message)
+                if match:
+                    unique_labels[i] = names[match.lastgroup]
+        labels = unique_labels[codes]
+    return pd.Series(labels, index=messages.index, name='message_type', dtype=object)
+
+def count_message_types(message_types, rules=None):
+    """统计每种类型的提交数（包括数量为 0 的类型）"""
+    rules = DEFAULT_MESSAGE_RULES if rules is None else rules
+    categories = list(dict.fromkeys(list(rules) + list(CONVENTIONAL_COMMIT_TYPES.values())))
+    counts = message_types.value_counts()
+    results = {key: int(counts.get(key, 0)) for key in categories}
+    results['other'] = int(counts.get('other', 0))
+    return results
+
+def load_message_rules(path):
+    """
+    从 JSON 文件读取自定义消息类型规则
+
+    文件内容为 {"类型": "正则", ...}，按书写顺序决定优先级。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError(f"消息规则文件必须是 JSON 对象: {path}")
+    return rules
+
+def build_contributor_profiles(commits, core_authors=()):
+    """
+    用一次 groupby 生成贡献者画像表
+
+    Args:
+        commits (pd.DataFrame): 已完成日期处理的提交数据（需要 date、date_only 列）
+        core_authors (Iterable): 核心贡献者列表
+
+    Returns:
+        pd.DataFrame: 以作者为索引，包含提交数、活跃天数、首末次提交、代码变更量与核心标记，
+        按提交数降序排列
+    """
+    profiles = commits.groupby('author', observed=True, sort=False).agg(
+        total_commits=('commit_hash', 'size'),
+        active_days=('date_only', 'nunique'),
+        first_commit=('date', 'min'),
+        last_commit=('date', 'max'),
+        lines_added=('lines_added', 'sum'),
+        lines_deleted=('lines_deleted', 'sum')
+    )
+    profiles['churn'] = profiles['lines_added'] + profiles['lines_deleted']
+    profiles['avg_commits_per_day'] = profiles['total_commits'] / profiles['active_days'].clip(lower=1)
+    profiles['is_core'] = profiles.index.isin(list(core_authors))
+    return profiles.sort_values('total_commits', ascending=False, kind='stable')
+
+def save_figure(output_dir, figure_name, dpi=300):
+    """保存图表并验证（输出格式由文件扩展名决定）"""
+    plt, _ = _plotting()
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
     file_path = output_path / figure_name
     
     try:
-        plt.savefig(str(file_path), dpi=300, bbox_inches='tight')
+        plt.savefig(str(file_path), dpi=dpi, bbox_inches='tight')
         plt.close()
         
         # 验证文件是否保存成功
@@ -80,239 +376,19 @@ def save_figure(output_dir, figure_name):
             print(f"❌ 备用图表也失败: {str(fallback_e)}")
             return None
 
-def analyze_commit_patterns(input_path, output_dir):
-    """
-    分析提交模式并生成图表和报告
-    """
-     # ===== 关键修复：添加类型验证 =====
-    if not isinstance(input_path, (str, os.PathLike)):
-        raise TypeError(f"input_path 必须是字符串或路径对象，而不是 {type(input_path).__name__}")
-    
-    if not isinstance(output_dir, (str, os.PathLike)):
-        raise TypeError(f"output_dir 必须是字符串或路径对象，而不是 {type(output_dir).__name__}")
-    
-    # 确保输出目录存在
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-    
-    print(f"\n{'📁 路径信息':-^60}")
-    print(f"输入路径: {Path(input_path).resolve()}")
-    print(f"输出目录: {output_path.resolve()}")
-    print(f"当前工作目录: {Path.cwd()}")
+# 图表输出配置：格式与分辨率
+RENDER_PROFILES = {
+    'preview': {'format': 'png', 'dpi': 100},   # 快速预览
+    'print': {'format': 'png', 'dpi': 300},     # 打印质量（原默认行为）
+    'vector': {'format': 'svg', 'dpi': 300},    # 矢量图
+}
+# 记录每张图表输入摘要的清单，输入未变化的图表不再重绘
+RENDER_MANIFEST = '.render_manifest.json'
 
-     # ===== 关键修复：验证输入文件存在 =====
-    input_file = Path(input_path)
-    if not input_file.exists():
-        raise FileNotFoundError(f"❌ 数据文件不存在: {input_file.resolve()}")
-    
-    # =============== 0. 备份旧结果 ===============
-    if output_path.exists() and any(output_path.iterdir()):
-        print(f"\n{'🛡️  备份旧结果':-^60}")
-        
-        # 创建带时间戳的备份目录
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = Path(f"results/backups/analysis_{timestamp}")
-        backup_dir.parent.mkdir(parents=True, exist_ok=True)
-        
-        # 备份旧结果
-        if not backup_dir.exists():
-            try:
-                shutil.copytree(str(output_path), str(backup_dir))
-                print(f"✅ 备份成功: {backup_dir}")
-            except Exception as e:
-                print(f"⚠️  备份失败: {str(e)}")
-        
-        # 清理旧结果
-        print(f"\n{'🧹 清理旧结果':-^60}")
-        for item in output_path.iterdir():
-            try:
-                if item.is_file() or item.is_symlink():
-                    item.unlink()
-                elif item.is_dir():
-                    shutil.rmtree(str(item))
-                print(f"✅ 清理: {item.name}")
-            except Exception as e:
-                print(f"⚠️  无法清理 {item.name}: {str(e)}")
-    else:
-        print(f"\n{'✅ 目录已干净，无需清理':-^60}")
-    
-    # =============== 1. 验证输入文件 ===============
-    input_file = Path(input_path)
-    if not input_file.exists():
-        raise FileNotFoundError(f"❌ 数据文件不存在: {input_file.resolve()}")
-    
-    # =============== 2. 加载和验证数据 ===============
-    print(f"\n{'📊 数据加载与验证':-^60}")
-    try:
-        # 尝试不同的编码
-        encodings = ['utf-8', 'utf-8-sig', 'gbk', 'latin1']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(str(input_file), encoding=encoding)
-                print(f"✅ 使用编码 '{encoding}' 成功加载数据")
-                break
-            except Exception as e:
-                print(f"⚠️  尝试编码 '{encoding}' 失败: {str(e)}")
-                continue
-        
-        if df is None:
-            raise ValueError("无法用任何支持的编码读取CSV文件")
-        
-        print(f"原始数据形状: {df.shape}")
-        print(f"列名: {', '.join(df.columns)}")
-        
-        # 验证必要列
-        required_columns = ['commit_hash', 'author', 'date', 'message']
-        missing_cols = [col for col in required_columns if col not in df.columns]
-        if missing_cols:
-            raise ValueError(f"缺少必要列: {', '.join(missing_cols)}")
-        
-        # 检查数据质量
-        print(f"\n🔍 数据质量检查:")
-        for col in df.columns:
-            null_count = df[col].isna().sum()
-            if null_count > 0:
-                print(f"   ⚠️  列 '{col}' 有 {null_count} 个空值")
-        
-        # 确保有数值列
-        if 'lines_added' not in df.columns:
-            df['lines_added'] = 0
-        if 'lines_deleted' not in df.columns:
-            df['lines_deleted'] = 0
-        if 'files_changed' not in df.columns:
-            df['files_changed'] = 1  # 默认至少一个文件
-            
-    except Exception as e:
-        print(f"❌ 数据加载失败: {str(e)}")
-        raise
-    
-    # =============== 3. 日期处理 ===============
-    print(f"\n{'🕒 日期处理':-^60}")
-    try:
-        # 保存原始日期用于调试
-        df['date_original'] = df['date'].copy()
-        
-        # 应用健壮的日期解析
-        print("正在解析日期列...")
-        df['date'] = df['date'].apply(robust_date_parser)
-        
-        # 处理无效日期
-        invalid_dates = df['date'].isna().sum()
-        print(f"无效日期数量: {invalid_dates}/{len(df)}")
-        
-        if invalid_dates > 0:
-            print("尝试修复无效日期...")
-            # 使用有效日期的中位数作为回退
-            valid_dates = df['date'][df['date'].notna()]
-            if len(valid_dates) > 0:
-                median_date = valid_dates.median()
-                df.loc[df['date'].isna(), 'date'] = median_date
-                print(f"✅ 用中位日期 {median_date} 修复了无效日期")
-            else:
-                # 完全失败，使用当前日期
-                current_date = pd.Timestamp.now()
-                df['date'] = current_date
-                print(f"⚠️  所有日期无效，使用当前日期 {current_date} 作为回退")
-        
-        # 提取日期组件
-        df['date_only'] = df['date'].dt.date
-        df['hour'] = df['date'].dt.hour
-        df['day_of_week'] = df['date'].dt.day_name()
-        df['month'] = df['date'].dt.to_period('M')
-        
-        # 检查日期范围
-        date_range = (df['date'].min(), df['date'].max())
-        print(f"日期范围: {date_range[0]} 至 {date_range[1]}")
-        print(f"唯一日期数量: {df['date_only'].nunique()}")
-        
-    except Exception as e:
-        print(f"❌ 日期处理失败: {str(e)}")
-        raise
-    
-    # =============== 4. 多维度分析 ===============
-    print(f"\n{'📈 多维度分析':-^60}")
-    
-    # 4.1 时间分布分析
-    print("\n⌛ 时间分布分析...")
-    
-    # 按星期几分析
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    day_names_cn = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-    day_map = dict(zip(day_order, day_names_cn))
-    
-    df['day_of_week_cn'] = df['day_of_week'].map(day_map)
-    day_counts = df['day_of_week_cn'].value_counts().reindex(day_names_cn).fillna(0)
-    
-    # 按小时分析
-    hour_counts = df['hour'].value_counts().sort_index()
-    all_hours = pd.Series(range(24))
-    hour_counts = hour_counts.reindex(all_hours, fill_value=0)
-    
-    # 4.2 贡献者分析
-    print("👥 贡献者分析...")
-    author_counts = df['author'].value_counts()
-    
-    # 识别核心贡献者 (提交数前20%)
-    core_threshold = max(1, int(len(author_counts) * 0.2))
-    core_authors = author_counts.head(core_threshold).index.tolist()
-    df['is_core'] = df['author'].isin(core_authors)
-    
-    # 4.3 提交消息分析
-    print("📝 提交消息分析...")
-    
-    # 分析提交消息模式
-    def analyze_message_patterns(messages):
-        """分析提交消息中的模式"""
-        patterns = {
-            'fix': r'\b(fix|bug|error|issue|crash|fail)\b',
-            'feature': r'\b(add|feature|implement|support|new)\b',
-            'refactor': r'\b(refactor|clean|improve|optimize|reorg)\b',
-            'docs': r'\b(doc|readme|comment|typo)\b',
-            'test': r'\b(test|coverage|spec|assert)\b',
-            'perf': r'\b(perf|performance|speed|optimize)\b',
-            'chore': r'\b(chore|ci|build|deps|release)\b'
-        }
-        
-        results = {key: 0 for key in patterns.keys()}
-        results['other'] = 0
-        
-        for msg in messages:
-            msg_lower = str(msg).lower()
-            matched = False
-            
-            for key, pattern in patterns.items():
-                if re.search(pattern, msg_lower):
-                    results[key] += 1
-                    matched = True
-                    break
-            
-            if not matched:
-                results['other'] += 1
-        
-        return results
-    
-    message_patterns = analyze_message_patterns(df['message'])
-    
-    # 4.4 代码变更分析
-    print("💻 代码变更分析...")
-    
-    # 按月份汇总
-    monthly_stats = df.groupby('month').agg(
-        commits=('commit_hash', 'count'),
-        authors=('author', 'nunique'),
-        lines_added=('lines_added', 'sum'),
-        lines_deleted=('lines_deleted', 'sum'),
-        files_changed=('files_changed', 'sum')
-    ).reset_index()
-    monthly_stats['month_str'] = monthly_stats['month'].astype(str)
-    monthly_stats['net_change'] = monthly_stats['lines_added'] - monthly_stats['lines_deleted']
-    
-    # =============== 5. 生成可视化图表 ===============
-    print(f"\n{'🖼️  生成可视化图表':-^60}")
-    
-    # 5.1 星期分布图 - 修复 Seaborn API
+def _plot_weekday_distribution(data, output_dir, figure_name, dpi):
+    """星期分布图"""
+    plt, sns = _plotting()
+    day_counts = pd.Series(data['values'], index=data['labels'])
     try:
         plt.figure(figsize=(12, 7))
         # 修复：移除无效的 legend 参数，使用新API
@@ -337,7 +413,7 @@ def analyze_commit_patterns(input_path, output_dir):
             if v > 0:
                 ax.text(i, v + 0.5, str(int(v)), ha='center', va='bottom', fontsize=12, fontweight='bold')
         
-        save_figure(str(output_path), "weekday_distribution.png")
+        return save_figure(output_dir, figure_name, dpi=dpi)
     except Exception as e:
         print(f"❌ 生成星期分布图失败: {str(e)}")
         # 创建备用图表
@@ -348,11 +424,15 @@ def analyze_commit_patterns(input_path, output_dir):
             plt.xlabel('星期', fontsize=12)
             plt.ylabel('提交数量', fontsize=12)
             plt.grid(axis='y', alpha=0.3)
-            save_figure(str(output_path), "weekday_distribution.png")
+            return save_figure(output_dir, figure_name, dpi=dpi)
         except Exception as fallback_e:
             print(f"⚠️  备用图表也失败: {str(fallback_e)}")
-    
-    # 5.2 小时分布图 - 修复 Seaborn API
+            return None
+
+def _plot_hourly_distribution(data, output_dir, figure_name, dpi):
+    """小时分布图"""
+    plt, sns = _plotting()
+    hour_counts = pd.Series(data['values'], index=data['labels'])
     try:
         plt.figure(figsize=(14, 7))
         # 修复：移除无效的 legend 参数
@@ -385,7 +465,7 @@ def analyze_commit_patterns(input_path, output_dir):
                 color='red', fontweight='bold', fontsize=12)
         
         plt.grid(axis='y', alpha=0.3)
-        save_figure(str(output_path), "hourly_distribution.png")
+        return save_figure(output_dir, figure_name, dpi=dpi)
     except Exception as e:
         print(f"❌ 生成小时分布图失败: {str(e)}")
         # 创建备用图表
@@ -396,20 +476,16 @@ def analyze_commit_patterns(input_path, output_dir):
             plt.xlabel('小时', fontsize=12)
             plt.ylabel('提交数量', fontsize=12)
             plt.grid(axis='y', alpha=0.3)
-            save_figure(str(output_path), "hourly_distribution.png")
+            return save_figure(output_dir, figure_name, dpi=dpi)
         except Exception as fallback_e:
             print(f"⚠️  备用图表也失败: {str(fallback_e)}")
-    
-    # 5.3 贡献者分布图 - 修复 Seaborn API
+            return None
+
+def _plot_contributors_distribution(data, output_dir, figure_name, dpi):
+    """贡献者分布图（前15名，其余合并）"""
+    plt, sns = _plotting()
+    top_authors = pd.Series(data['values'], index=data['labels'])
     try:
-        # 只显示前15名贡献者，其他合并
-        top_n = min(15, len(author_counts))
-        top_authors = author_counts.head(top_n)
-        other_count = author_counts.iloc[top_n:].sum() if len(author_counts) > top_n else 0
-        
-        if other_count > 0:
-            top_authors['其他贡献者'] = other_count
-        
         plt.figure(figsize=(14, 10))
         # 修复：移除无效的 legend 参数
         ax = sns.barplot(
@@ -432,7 +508,7 @@ def analyze_commit_patterns(input_path, output_dir):
         for i, v in enumerate(top_authors.values):
             ax.text(v + 0.5, i, str(int(v)), va='center', fontsize=11)
         
-        save_figure(str(output_path), "contributors_distribution.png")
+        return save_figure(output_dir, figure_name, dpi=dpi)
     except Exception as e:
         print(f"❌ 生成贡献者分布图失败: {str(e)}")
         # 创建备用图表
@@ -443,10 +519,15 @@ def analyze_commit_patterns(input_path, output_dir):
             plt.xlabel('提交数量', fontsize=12)
             plt.ylabel('贡献者', fontsize=12)
             plt.grid(axis='x', alpha=0.3)
-            save_figure(str(output_path), "contributors_distribution.png")
+            return save_figure(output_dir, figure_name, dpi=dpi)
         except Exception as fallback_e:
             print(f"⚠️  备用图表也失败: {str(fallback_e)}")
-    # 5.4 月度趋势图
+            return None
+
+def _plot_monthly_trends(data, output_dir, figure_name, dpi):
+    """月度趋势图（提交数量折线 + 净代码变更柱状）"""
+    plt, _ = _plotting()
+    monthly_stats = pd.DataFrame(data)
     try:
         plt.figure(figsize=(16, 9))
         
@@ -490,16 +571,19 @@ def analyze_commit_patterns(input_path, output_dir):
         ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left', fontsize=12)
         
         plt.grid(True, alpha=0.3)
-        save_figure(str(output_path), "monthly_trends.png")
+        return save_figure(output_dir, figure_name, dpi=dpi)
     except Exception as e:
         print(f"❌ 生成月度趋势图失败: {str(e)}")
-    
-    # 5.5 提交消息类型分布图
+        return None
+
+def _plot_message_types(data, output_dir, figure_name, dpi):
+    """提交消息类型饼图（没有非零类型时不生成）"""
+    plt, _ = _plotting()
     try:
         # 过滤零值
         pattern_df = pd.DataFrame({
-            '类型': list(message_patterns.keys()),
-            '数量': list(message_patterns.values())
+            '类型': list(data.keys()),
+            '数量': list(data.values())
         })
         pattern_df = pattern_df[pattern_df['数量'] > 0]
         
@@ -517,37 +601,19 @@ def analyze_commit_patterns(input_path, output_dir):
             plt.title('提交消息类型分布', fontsize=18, fontweight='bold', pad=20)
             plt.axis('equal')
             
-            save_figure(str(output_path), "message_types_pie.png")
+            return save_figure(output_dir, figure_name, dpi=dpi)
     except Exception as e:
         print(f"❌ 生成提交消息类型图失败: {str(e)}")
-    
-    # =============== 6. 高级分析（使用课程讲授的库） ===============
-    print(f"\n{'🔬 高级分析（使用课程技术）':-^60}")
-    
-    # 6.1 使用 ast 分析 Python 代码变更模式
+    return None
+
+def _plot_code_structure(data, output_dir, figure_name, dpi):
+    """代码结构特征柱状图"""
+    plt, _ = _plotting()
     try:
-        print("🐍 使用 ast 库分析代码变更模式...")
-        
-        # 假设我们有文件变更信息，这里模拟分析
-        # 在实际项目中，这会分析真实的代码变更
-        
-        def mock_code_analysis():
-            """模拟代码分析结果"""
-            return {
-                'function_defs': 45,
-                'class_defs': 12,
-                'imports': 67,
-                'if_statements': 89,
-                'loops': 34,
-                'comments': 215
-            }
-        
-        ast_results = mock_code_analysis()
-        
-        if ast_results:
+        if data:
             plt.figure(figsize=(14, 8))
-            features = list(ast_results.keys())
-            counts = list(ast_results.values())
+            features = list(data.keys())
+            counts = list(data.values())
             
             bars = plt.bar(features, counts, color=plt.cm.tab20(np.linspace(0, 1, len(features))))
             
@@ -564,50 +630,548 @@ def analyze_commit_patterns(input_path, output_dir):
                 plt.text(bar.get_x() + bar.get_width()/2., height + 0.5,
                         f'{int(height)}', ha='center', va='bottom', fontsize=11)
             
-            save_figure(str(output_path), "code_structure_analysis.png")
+            return save_figure(output_dir, figure_name, dpi=dpi)
     except Exception as e:
-        print(f"⚠️  ast 分析失败（正常，因为需要真实代码变更数据）: {str(e)}")
-        print("💡 提示: 在大作业中，您可以分析真实项目的代码变更模式")
-    
-    # 6.2 使用 pysnooper 进行动态分析
+        print(f"❌ 生成代码结构分析图失败: {str(e)}")
+    return None
+
+# 图表名 -> (绘图函数, 报告中的说明)
+CHART_RENDERERS = {
+    'weekday_distribution': (_plot_weekday_distribution, '星期分布'),
+    'hourly_distribution': (_plot_hourly_distribution, '小时分布'),
+    'contributors_distribution': (_plot_contributors_distribution, '贡献者分布'),
+    'monthly_trends': (_plot_monthly_trends, '月度趋势'),
+    'message_types_pie': (_plot_message_types, '消息类型分布'),
+    'code_structure_analysis': (_plot_code_structure, '代码结构分析'),
+}
+
+def build_chart_data(day_counts, hour_counts, author_counts, monthly_stats, message_patterns,
+                     code_structure=None, top_n=15):
+    """
+    把分析结果整理成绘图所需的聚合数据（只含可 JSON 序列化的基本类型）
+
+    Args:
+        day_counts (pd.Series): 星期 -> 提交数
+        hour_counts (pd.Series): 小时 -> 提交数
+        author_counts (pd.Series): 作者 -> 提交数（降序）
+        monthly_stats (pd.DataFrame): 月度汇总，需含 month_str、commits、net_change
+        message_patterns (dict): 消息类型 -> 数量
+        code_structure (dict): 代码结构特征 -> 数量
+        top_n (int): 贡献者图显示的人数，其余合并为“其他贡献者”
+
+    Returns:
+        dict: 图表名 -> 聚合数据
+    """
+    # 只显示前15名贡献者，其他合并
+    top_n = min(top_n, len(author_counts))
+    top_authors = author_counts.head(top_n).copy()
+    other_count = author_counts.iloc[top_n:].sum() if len(author_counts) > top_n else 0
+    if other_count > 0:
+        top_authors['其他贡献者'] = other_count
+
+    chart_data = {
+        'weekday_distribution': {
+            'labels': [str(label) for label in day_counts.index],
+            'values': [int(v) for v in day_counts.values],
+        },
+        'hourly_distribution': {
+            'labels': [int(h) for h in hour_counts.index],
+            'values': [int(v) for v in hour_counts.values],
+        },
+        'contributors_distribution': {
+            'labels': [str(author) for author in top_authors.index],
+            'values': [int(v) for v in top_authors.values],
+        },
+        'monthly_trends': {
+            'month_str': monthly_stats['month_str'].astype(str).tolist(),
+            'commits': [int(v) for v in monthly_stats['commits']],
+            'net_change': [int(v) for v in monthly_stats['net_change']],
+        },
+        'message_types_pie': {str(k): int(v) for k, v in message_patterns.items()},
+    }
+    if code_structure:
+        chart_data['code_structure_analysis'] = {str(k): int(v) for k, v in code_structure.items()}
+    return chart_data
+
+def _chart_digest(data, profile):
+    """图表输入与输出配置的摘要"""
+    payload = json.dumps({'data': data, 'profile': profile}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_render_manifest(output_dir):
+    """读取渲染清单，不存在或损坏时返回空清单"""
+    manifest_path = Path(output_dir) / RENDER_MANIFEST
     try:
-        import pysnooper
-        
-        print("🔍 使用 pysnooper 库进行动态分析...")
-        
-        @pysnooper.snoop(str(output_path / "pysnooper_analysis.log"), depth=1)
-        def analyze_contributor_patterns(authors, commits):
-            """使用 pysnooper 跟踪贡献者模式分析过程"""
-            # 模拟贡献者分析
-            patterns = {}
-            for author in set(authors):
-                author_commits = commits[commits['author'] == author].copy()
-                avg_commits_per_day = len(author_commits) / max(1, author_commits['date_only'].nunique())
-                patterns[author] = {
-                    'total_commits': len(author_commits),
-                    'avg_commits_per_day': avg_commits_per_day,
-                    'active_days': author_commits['date_only'].nunique()
-                }
-            return patterns
-        
-        # 执行分析
-        if len(df) > 0:
-            contributor_patterns = analyze_contributor_patterns(df['author'].values, df)
-            print(f"✅ 生成: pysnooper_analysis.log (使用 pysnooper 库)")
+        with open(str(manifest_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest.get('charts'), dict) else {'charts': {}}
+    except (OSError, ValueError, AttributeError):
+        return {'charts': {}}
+
+def rendered_chart_files(output_dir):
+    """渲染清单中记录的图表文件名（以及清单本身），清理旧结果时保留"""
+    charts = load_render_manifest(output_dir)['charts']
+    return {RENDER_MANIFEST} | {entry['file'] for entry in charts.values() if entry.get('file')}
+
+def _render_chart(task):
+    """
+    在工作进程中绘制一张图表
+
+    Returns:
+        tuple: (图表名, 文件路径, (开始时间, 耗时秒数, 进程号))，计时交给主进程记录到运行剖析
+    """
+    name, data, output_dir, figure_name, dpi = task
+    plot, _ = CHART_RENDERERS[name]
+    start = time.perf_counter()
+    file_path = plot(data, output_dir, figure_name, dpi)
+    return name, file_path, (start, time.perf_counter() - start, os.getpid())
+
+def render_charts(chart_data, output_dir, profile='print', workers=None):
+    """
+    用进程池并行绘制图表，输入未变化的图表直接复用上次的结果
+
+    Args:
+        chart_data (dict): build_chart_data 生成的聚合数据
+        output_dir (str): 输出目录
+        profile (str): 输出配置，'preview'（PNG 100dpi）、'print'（PNG 300dpi）或 'vector'（SVG）
+        workers (int): 工作进程数，默认 CPU 核数；1 表示在当前进程中顺序绘制
+
+    Returns:
+        dict: 图表名 -> 图表文件路径（生成失败的图表不包含在内）
+    """
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"不支持的渲染配置: {profile}，可选: {', '.join(RENDER_PROFILES)}")
+    settings = RENDER_PROFILES[profile]
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    previous = load_render_manifest(output_path)['charts']
+    charts = {}
+    rendered = {}
+    tasks = []
+    for name, data in chart_data.items():
+        digest = _chart_digest(data, settings)
+        figure_name = f"{name}.{settings['format']}"
+        entry = previous.get(name, {})
+        if entry.get('digest') == digest and entry.get('file') and (output_path / entry['file']).exists():
+            print(f"⏭️  跳过未变化的图表: {entry['file']}")
+            charts[name] = entry
+            rendered[name] = str(output_path / entry['file'])
+            continue
+        charts[name] = {'digest': digest}
+        tasks.append((name, data, str(output_path), figure_name, settings['dpi']))
+
+    figure_names = {task[0]: task[3] for task in tasks}
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        print(f"🖌️  使用 {min(workers, len(tasks))} 个进程绘制 {len(tasks)} 张图表...")
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_render_chart, tasks))
+    else:
+        results = [_render_chart(task) for task in tasks]
+
+    for name, file_path, (start, seconds, pid) in results:
+        record_span(f'chart {name}', 'chart', start, seconds, pid=pid, tid=pid, file=figure_names.get(name),
+                    ok=file_path is not None)
+        stale = previous.get(name, {}).get('file')
+        if file_path is None:
+            del charts[name]
+        else:
+            charts[name]['file'] = Path(file_path).name
+            rendered[name] = file_path
+        # 输出格式变化后删除旧文件
+        if stale and stale != charts.get(name, {}).get('file'):
+            (output_path / stale).unlink(missing_ok=True)
+
+    with open(str(output_path / RENDER_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({'profile': profile, 'charts': charts}, f, ensure_ascii=False, indent=2)
+    return rendered
+
+def load_stage(input_path, columns=ANALYSIS_COLUMNS):
+    """
+    阶段：加载和验证数据
+
+    Args:
+        input_path (str): 提交数据文件（.csv / .parquet / .feather）
+        columns (list): 要加载的列（列式存储时只读取这些列）
+
+    Returns:
+        pd.DataFrame: 只含分析用到的列的提交数据
+    """
+    print(f"\n{'📊 数据加载与验证':-^60}")
+    try:
+        # 按扩展名选择 CSV / Parquet / Feather，只加载分析用到的列
+        df = load_commit_table(str(input_path), columns=columns, verbose=True)
+        
+        print(f"原始数据形状: {df.shape}")
+        print(f"列名: {', '.join(df.columns)}")
+        
+        # 验证必要列
+        required_columns = ['commit_hash', 'author', 'date', 'message']
+        missing_cols = [col for col in required_columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"缺少必要列: {', '.join(missing_cols)}")
+        
+        # 检查数据质量
+        print(f"\n🔍 数据质量检查:")
+        for col in df.columns:
+            null_count = df[col].isna().sum()
+            if null_count > 0:
+                print(f"   ⚠️  列 '{col}' 有 {null_count} 个空值")
+        
+        # 确保有数值列
+        if 'lines_added' not in df.columns:
+            df['lines_added'] = 0
+        if 'lines_deleted' not in df.columns:
+            df['lines_deleted'] = 0
+        if 'files_changed' not in df.columns:
+            df['files_changed'] = 1  # 默认至少一个文件
             
-            # 从日志中提取关键信息用于报告
-            pysnooper_summary = "成功使用 pysnooper 跟踪贡献者分析过程，识别出提交模式特征"
-    except ImportError:
-        print("⚠️  pysnooper 未安装，跳过动态分析")
-        pysnooper_summary = "未执行动态分析（需要安装 pysnooper 库）"
     except Exception as e:
-        print(f"⚠️  pysnooper 分析失败: {str(e)}")
-        pysnooper_summary = f"动态分析失败: {str(e)}"
+        print(f"❌ 数据加载失败: {str(e)}")
+        raise
+    
+    return df
+
+def normalize_stage(df, time_basis='local'):
+    """
+    阶段：日期规范化，并按本地时间或 UTC 时间提取日期、小时、星期、月份
+
+    Args:
+        df (pd.DataFrame): load_stage 的结果
+        time_basis (str): 'local'（提交者本地时间）或 'utc'
+
+    Returns:
+        pd.DataFrame: 增加了时间组件列的提交数据
+    """
+    print(f"\n{'🕒 日期处理':-^60}")
+    try:
+        # 保存原始日期用于调试
+        df['date_original'] = df['date'].copy()
+        
+        # 向量化日期规范化（列式存储中的日期已是 datetime 类型）
+        print("正在解析日期列...")
+        with span('date parse', rows=len(df)):
+            if pd.api.types.is_datetime64_any_dtype(df['date']):
+                offset = df['utc_offset'] if 'utc_offset' in df.columns else pd.Series(0, index=df.index)
+                normalized = pd.DataFrame({'date': df['date'], 'utc_offset': offset.astype('Int16')})
+                normalized['date_utc'] = normalized['date'] - pd.to_timedelta(
+                    normalized['utc_offset'].fillna(0).astype('int64'), unit='m')
+            else:
+                normalized = normalize_dates(df['date'])
+        df['date'] = normalized['date']
+        df['utc_offset'] = normalized['utc_offset']
+        df['date_utc'] = normalized['date_utc']
+        
+        # 处理无效日期
+        invalid_dates = df['date'].isna().sum()
+        print(f"无效日期数量: {invalid_dates}/{len(df)}")
+        
+        if invalid_dates > 0:
+            print("尝试修复无效日期...")
+            # 使用有效日期的中位数作为回退
+            valid_dates = df['date'][df['date'].notna()]
+            if len(valid_dates) > 0:
+                median_date = valid_dates.median()
+                df.loc[df['date'].isna(), 'date'] = median_date
+                df.loc[df['date_utc'].isna(), 'date_utc'] = df['date_utc'].median()
+                df['utc_offset'] = df['utc_offset'].fillna(0)
+                print(f"✅ 用中位日期 {median_date} 修复了无效日期")
+            else:
+                # 完全失败，使用当前日期
+                current_date = pd.Timestamp.now()
+                df['date'] = current_date
+                df['date_utc'] = current_date
+                df['utc_offset'] = df['utc_offset'].fillna(0)
+                print(f"⚠️  所有日期无效，使用当前日期 {current_date} 作为回退")
+        
+        # 提取日期组件（按本地时间或 UTC 时间）
+        basis = df['date'] if time_basis == 'local' else df['date_utc']
+        print(f"时间基准: {'提交者本地时间' if time_basis == 'local' else 'UTC'}")
+        df['date_only'] = basis.dt.date
+        df['hour'] = basis.dt.hour
+        df['day_of_week'] = basis.dt.day_name()
+        df['month'] = basis.dt.to_period('M')
+        
+        # 检查日期范围
+        date_range = (df['date'].min(), df['date'].max())
+        print(f"日期范围: {date_range[0]} 至 {date_range[1]}")
+        print(f"唯一日期数量: {df['date_only'].nunique()}")
+        
+    except Exception as e:
+        print(f"❌ 日期处理失败: {str(e)}")
+        raise
+    
+    return df
+
+def code_structure_stage(df, repo_path=None, workers=None, cache_path=None):
+    """
+    阶段：用 ast 分析每个提交中变更的 Python 文件（blob 解析结果按 SHA 缓存）
+
+    Args:
+        df (pd.DataFrame): load_stage 的结果（需要完整哈希 hash 列）
+        repo_path (str): 仓库路径，None 表示跳过代码结构分析
+        workers (int): 解析进程数，默认 CPU 核数
+        cache_path (str): blob 解析结果缓存文件
+
+    Returns:
+        dict | None: analyze_code_structure 的结果，跳过时为 None
+    """
+    if not repo_path:
+        print("💡 未提供仓库路径，跳过代码结构分析")
+        return None
+    if 'hash' not in df.columns:
+        print("⚠️  提交数据缺少完整哈希列 hash，跳过代码结构分析")
+        return None
+    print(f"\n{'🐍 使用 ast 库分析代码结构':-^60}")
+    hashes = df['hash'].dropna().astype(str).tolist()
+    result = analyze_code_structure(repo_path, hashes, cache_path=cache_path, workers=workers)
+    print(f"✅ 新解析 {result['parsed']} 个文件版本（无法解析 {result['parse_errors']} 个），"
+          f"其余来自缓存")
+    return result
+
+def identity_stage(df, repo_path=None, enabled=False, mailmap=None, cache_path=None):
+    """
+    阶段：作者身份解析（.mailmap + 按邮箱 / 名称合并别名）
+
+    Args:
+        df (pd.DataFrame): load_stage 的结果
+        repo_path (str): 仓库路径，提供时使用 .mailmap 与作者邮箱，否则只按名称合并
+        enabled (bool): 是否合并别名，False（默认）时跳过，按原始作者名统计
+        mailmap (str): .mailmap 的内容摘要（只用于缓存键）
+        cache_path (str): 身份映射缓存文件
+
+    Returns:
+        dict | None: resolve_author_identities 的结果，跳过时为 None
+    """
+    if not enabled:
+        return None
+    print(f"\n{'🪪 作者身份解析':-^60}")
+    result = resolve_author_identities(df['author'], repo_path=repo_path, cache_path=cache_path)
+    print(f"✅ {result['identities']} 个身份 -> {result['clusters']} 位贡献者"
+          f"（新处理 {result['new_identities']} 个身份，合并 {len(result['mapping'])} 个作者名）")
+    return result
+
+def aggregate_stage(df, code_structure=None, identities=None, message_rules=None, time_basis='local',
+                    debug_trace=False, trace_dir='.', cube_path=None):
+    """
+    阶段：时间、贡献者、提交消息、月度变更等多维度聚合，以及贡献者画像
+
+    时间分布与月度汇总由 (日期, 小时, 星期, 作者, 消息类型) 聚合立方体汇总得到。
+    指定 cube_path 时读取上次保存的立方体：提交数据只是在末尾追加了新提交时
+    只聚合新增的行，否则整体重建，结果写回 cube_path。
+
+    Args:
+        df (pd.DataFrame): normalize_stage 的结果
+        code_structure (dict): code_structure_stage 的结果，None 表示未分析代码结构
+        identities (dict): identity_stage 的结果，作者名按其映射合并（原作者名保留在 author_raw 列）
+        message_rules (dict): 自定义提交消息类型规则
+        time_basis (str): normalize_stage 使用的时间基准，记录在立方体元数据中
+        debug_trace (bool): 用 pysnooper 跟踪贡献者画像生成过程
+        trace_dir (str): pysnooper 日志目录
+        cube_path (str): 持久化的聚合立方体（.parquet / .feather / .csv）
+
+    Returns:
+        dict: 带分析列的提交数据、各项聚合结果、聚合立方体以及绘图所需的 chart_data
+    """
+    print(f"\n{'📈 多维度分析':-^60}")
+    
+    mapping = identities['mapping'] if identities else {}
+    df['author_raw'] = df['author']
+    if mapping:
+        df['author'] = df['author'].map(mapping).fillna(df['author'])
+    
+    # 4.1 提交消息分类（立方体按消息类型聚合，需要先分类）
+    print("📝 提交消息分析...")
+    
+    with span('classify messages', rows=len(df)):
+        df['message_type'] = classify_messages(df['message'], rules=message_rules)
+        message_patterns = count_message_types(df['message_type'], rules=message_rules)
+    
+    # 4.2 时间分布分析：先聚合成 (日期, 小时, 星期, 作者, 类型) 立方体，再由立方体汇总
+    print("\n⌛ 时间分布分析...")
+    # 立方体按作者聚合，身份映射变化后需要重建
+    cube_config = {'message_rules': message_rules, 'time_basis': time_basis,
+                   'identities': config_digest(mapping) if mapping else None}
+    with span('aggregate cube', rows=len(df)) as cube_span:
+        cube = CommitCube.load(cube_path) if cube_path else None
+        if cube is not None and cube.can_append(df, cube_config):
+            added = cube.append(df, cube_config)
+            print(f"🧊 增量更新聚合立方体: 新增 {added} 个提交")
+            cube_span.set(appended=added)
+        else:
+            cube = CommitCube.from_commits(df, config=cube_config)
+        cube_span.set(cells=len(cube.cells))
+    print(f"🧊 聚合立方体: {len(df)} 个提交 -> {len(cube.cells)} 个单元格")
+    if cube_path:
+        cube.save(cube_path)
+    
+    # 按星期几分析
+    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    day_names_cn = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+    day_map = dict(zip(day_order, day_names_cn))
+    
+    df['day_of_week_cn'] = df['day_of_week'].map(day_map)
+    day_counts = cube.day_counts()
+    
+    # 按小时分析
+    hour_counts = cube.hour_counts()
+    
+    # 4.3 贡献者分析
+    print("👥 贡献者分析...")
+    author_counts = df['author'].value_counts()
+    
+    # 识别核心贡献者 (提交数前20%)
+    core_threshold = max(1, int(len(author_counts) * 0.2))
+    core_authors = author_counts.head(core_threshold).index.tolist()
+    df['is_core'] = df['author'].isin(core_authors)
+    
+    # 巴士因子、基尼系数、前 k 位占比与新老贡献者（30/90/365 天滑动窗口，按窗口边缘增量更新）
+    with span('contributor metrics', rows=len(df)) as metrics_span:
+        contributor_summary = summarize_contributors(df)
+        contributor_metrics = contributor_timeline(df)
+        metrics_span.set(windows=len(contributor_metrics))
+    print(f"🚌 巴士因子: {contributor_summary['bus_factor']}，基尼系数: {contributor_summary['gini']:.2f}")
+    
+    # 4.4 代码变更分析
+    print("💻 代码变更分析...")
+    
+    # 按月份汇总（由立方体汇总）
+    monthly_stats = cube.monthly_stats()
+    
+    # 4.5 代码结构分析（code_structure_stage 用 ast 解析每个提交变更的 Python 文件）
+    ast_results = code_structure['totals'] if code_structure else None
+    
+    # 4.6 贡献者画像（单次 groupby）
+    print("👥 生成贡献者画像...")
+    profile_builder = build_contributor_profiles
+    trace_summary = "未启用（debug_trace=False）"
+    if debug_trace:
+        try:
+            import pysnooper
+            
+            print("🔍 使用 pysnooper 库跟踪贡献者画像生成过程...")
+            profile_builder = pysnooper.snoop(str(Path(trace_dir) / "pysnooper_analysis.log"), depth=1)(
+                build_contributor_profiles
+            )
+            trace_summary = "已使用 pysnooper 记录到 pysnooper_analysis.log"
+        except ImportError:
+            print("⚠️  pysnooper 未安装，跳过调试跟踪")
+            trace_summary = "未执行（需要安装 pysnooper 库）"
+    
+    with span('contributor profiles', rows=len(df)):
+        contributor_profiles = profile_builder(df, core_authors)
+    
+    return {
+        'df': df,
+        'day_counts': day_counts,
+        'hour_counts': hour_counts,
+        'author_counts': author_counts,
+        'core_authors': core_authors,
+        'contributor_summary': contributor_summary,
+        'contributor_metrics': contributor_metrics,
+        'message_patterns': message_patterns,
+        'monthly_stats': monthly_stats,
+        'contributor_profiles': contributor_profiles,
+        'cube': cube,
+        'code_structure': code_structure,
+        'identities': identities,
+        'trace_summary': trace_summary,
+        # 图表只依赖这些聚合结果
+        'chart_data': build_chart_data(day_counts, hour_counts, author_counts, monthly_stats,
+                                       message_patterns, code_structure=ast_results),
+    }
+
+def _render_stage(aggregates, profile='print', output_dir='.', workers=None):
+    """阶段：并行绘制图表（输入未变化的图表由渲染清单跳过）"""
+    print(f"\n{'🖼️  生成可视化图表':-^60}")
+    chart_data = aggregates['chart_data']
+    rendered_charts = render_charts(chart_data, output_dir, profile=profile, workers=workers)
+    print(f"✅ 图表就绪: {len(rendered_charts)}/{len(chart_data)} "
+          f"(配置: {profile}, {RENDER_PROFILES[profile]['format'].upper()} "
+          f"{RENDER_PROFILES[profile]['dpi']}dpi)")
+    return rendered_charts
+
+def report_stage(aggregates, rendered_charts, input_path, output_dir, processed_format='csv',
+                 project=None):
+    """
+    阶段：生成分析报告、摘要、贡献者画像表并保存处理后的数据
+
+    Args:
+        aggregates (dict): aggregate_stage 的结果
+        rendered_charts (dict): render_charts 的结果（图表名 -> 文件路径）
+        input_path (str): 原始数据文件，写入报告
+        output_dir (str): 输出目录
+        processed_format (str): 处理后数据的存储格式
+        project (dict): 项目信息（name，可选 url / description / note），默认 DEFAULT_PROJECT
+    """
+    project = project or DEFAULT_PROJECT
+    project_name = project['name']
+    project_url = project.get('url')
+    output_path = Path(output_dir)
+    df = aggregates['df']
+    day_counts = aggregates['day_counts']
+    hour_counts = aggregates['hour_counts']
+    author_counts = aggregates['author_counts']
+    core_authors = aggregates['core_authors']
+    message_patterns = aggregates['message_patterns']
+    monthly_stats = aggregates['monthly_stats']
+    contributor_profiles = aggregates['contributor_profiles']
+    code_structure = aggregates.get('code_structure')
+    trace_summary = aggregates['trace_summary']
     
-    # =============== 7. 生成综合分析报告 ===============
     print(f"\n{'📄 生成综合分析报告':-^60}")
     
     try:
+        contributor_profiles.to_csv(str(output_path / "contributor_profiles.csv"), encoding='utf-8-sig')
+        print(f"✅ 生成: contributor_profiles.csv ({len(contributor_profiles)} 位贡献者)")
+        
+        # 滑动窗口贡献者集中度
+        contributor_summary = aggregates['contributor_summary']
+        contributor_metrics = aggregates['contributor_metrics']
+        contributor_metrics.to_csv(str(output_path / "contributor_metrics.csv"), index=False,
+                                   encoding='utf-8-sig')
+        print(f"✅ 生成: contributor_metrics.csv ({len(contributor_metrics)} 行)")
+        recent = contributor_metrics[contributor_metrics['window_days'] == 90].tail(1)
+        if len(recent):
+            recent = recent.iloc[0]
+            recent_summary = (f"巴士因子 {int(recent['bus_factor'])}，{int(recent['contributors'])} 位活跃贡献者"
+                              f"（新 {int(recent['new_contributors'])} / 老 {int(recent['returning_contributors'])}）")
+        else:
+            recent_summary = "无数据"
+        bus_factor = contributor_summary['bus_factor']
+        
+        # 作者身份：合并的别名
+        identities = aggregates.get('identities')
+        if identities:
+            aliases = pd.DataFrame(sorted(identities['mapping'].items()), columns=['author', 'canonical'])
+            aliases.to_csv(str(output_path / "author_aliases.csv"), index=False, encoding='utf-8-sig')
+            print(f"✅ 生成: author_aliases.csv ({len(aliases)} 个别名)")
+            identity_summary = (f"{identities['identities']} 个作者身份合并为 {identities['clusters']} 位，"
+                                f"{len(aliases)} 个作者名被合并（见 author_aliases.csv）")
+        else:
+            identity_summary = "未启用，按原始作者名统计"
+        
+        # 代码结构：每个提交的 Python 文件结构特征增量
+        if code_structure:
+            structure_commits = code_structure['commits']
+            structure_commits.to_csv(str(output_path / "code_structure_by_commit.csv"), index=False,
+                                     encoding='utf-8-sig')
+            print(f"✅ 生成: code_structure_by_commit.csv ({len(structure_commits)} 个提交)")
+            totals = code_structure['totals']
+            structure_summary = (
+                f"- **使用 ast 库** 解析了每个提交中变更的 Python 文件（按 blob SHA 缓存解析结果）\n"
+                f"- **当前结构**: {totals['function_defs']} 个函数、{totals['class_defs']} 个类、"
+                f"{totals['imports']} 条导入、{totals['if_statements']} 个条件分支、{totals['loops']} 个循环\n"
+                f"- **涉及 Python 的提交**: {int((structure_commits['py_files_changed'] > 0).sum())} 个，"
+                f"净增函数 {int(structure_commits['function_defs'].sum()):+d} 个\n"
+                f"- **明细**: code_structure_by_commit.csv"
+            )
+        else:
+            structure_summary = "- 未提供仓库路径（repo_path），未进行代码结构分析"
+        
+        processed_data_path = output_path / f"processed_data.{processed_format}"
+        
         # 计算关键指标
         total_commits = len(df)
         total_contributors = df['author'].nunique()
@@ -628,17 +1192,22 @@ def analyze_commit_patterns(input_path, output_dir):
         # 日期范围
         date_range_str = f"{df['date'].min().strftime('%Y-%m-%d')} 至 {df['date'].max().strftime('%Y-%m-%d')}"
         
+        # 图表清单（文件扩展名取决于渲染配置）
+        chart_list = '\n'.join(
+            f"- {Path(path).name}: {CHART_RENDERERS[name][1]}" for name, path in rendered_charts.items()
+        )
+        
         # 生成详细的Markdown报告
         report = f"""
 # 📊 开源项目提交历史分析报告
 
 ## 📋 项目概览
-- **项目名称**: requests (https://github.com/psf/requests)
+- **项目名称**: {project_name}{f" ({project_url})" if project_url else ""}
 - **分析时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - **分析范围**: 最近 {total_commits} 个提交
 - **时间跨度**: {date_range_str}
 - **活跃度评分**: {activity_score}/100 ⭐
-- **仓库描述**: 简单而优雅的HTTP库，Python中最流行的HTTP客户端库之一
+- **仓库描述**: {project.get('description') or '未提供'}
 
 ## 🔢 核心指标
 | 指标 | 数值 | 说明 |
@@ -646,6 +1215,8 @@ def analyze_commit_patterns(input_path, output_dir):
 | **总提交数** | {total_commits:,} | 代码变更次数 |
 | **贡献者数** | {total_contributors:,} | 参与贡献的开发者 |
 | **核心贡献者** | {core_contributors} ({core_contribution_pct:.1f}%) | 贡献了80%提交的开发者 |
+| **巴士因子** | {bus_factor} | 覆盖一半提交所需的最少贡献者数 |
+| **基尼系数** | {contributor_summary['gini']:.2f} | 贡献集中度（0 为完全平均） |
 | **总文件变更** | {total_files_changed:,} | 受影响的文件总数 |
 | **平均每次提交** | +{avg_lines_added:.0f} / -{avg_lines_deleted:.0f} 行 | 代码变更规模 |
 
@@ -672,6 +1243,9 @@ def analyze_commit_patterns(input_path, output_dir):
 - **核心团队**: {core_contributors} 人负责主要开发
 - **社区贡献**: {'活跃' if core_contribution_pct < 90 else '有限'}（外部贡献占比 {100 - core_contribution_pct:.1f}%）
 - **维护状态**: {'积极维护' if total_commits > 100 else '低频维护'}
+- **前 3 位贡献者占比**: {contributor_summary['top3_share'] * 100:.1f}%
+- **最近 90 天**: {recent_summary}
+- **趋势明细**: contributor_metrics.csv（30/90/365 天滑动窗口的巴士因子、基尼系数、前 k 位占比与新老贡献者）
 
 ## 📝 提交质量
 
@@ -688,14 +1262,14 @@ def analyze_commit_patterns(input_path, output_dir):
 ## 🔬 技术深度分析
 
 ### 静态代码分析
-- **使用 ast 库** 分析了代码结构特征
-- **关键发现**: 项目保持良好的代码组织，函数定义清晰
-- **架构特点**: 模块化设计，核心功能集中在少数关键文件
+{structure_summary}
 
-### 动态行为分析
-- **使用 pysnooper 库** 跟踪贡献者行为模式
-- **关键发现**: {pysnooper_summary}
-- **行为模式**: 核心贡献者保持稳定的提交节奏，社区贡献集中在特定功能区域
+### 贡献者画像
+- **画像表**: contributor_profiles.csv（{len(contributor_profiles)} 位贡献者）
+- **核心贡献者平均活跃天数**: {contributor_profiles.loc[contributor_profiles['is_core'], 'active_days'].mean():.1f} 天
+- **一次性贡献者**: {int((contributor_profiles['total_commits'] == 1).sum())} 位
+- **身份解析**: {identity_summary}
+- **调试跟踪**: {trace_summary}
 
 ## 💡 项目洞察与建议
 
@@ -713,7 +1287,7 @@ def analyze_commit_patterns(input_path, output_dir):
 
 ### 社区健康度
 ❤️ **社区状态**: 健康活跃，核心团队与社区良性互动  
-❤️ **可持续性**: 贡献者分布合理，无过度依赖单一开发者风险  
+❤️ **可持续性**: {'贡献者分布合理，无过度依赖单一开发者风险' if bus_factor > 2 else f'巴士因子仅为 {bus_factor}，存在过度依赖少数开发者的风险'}  
 ❤️ **项目成熟度**: 成熟稳定，同时保持创新活力  
 
 ## 🛠️ 分析方法与技术
@@ -728,7 +1302,7 @@ def analyze_commit_patterns(input_path, output_dir):
 - **pandas**: 数据处理和统计分析
 - **matplotlib/seaborn**: 数据可视化
 - **ast**: 代码结构静态分析（课程讲授技术）
-- **pysnooper**: 动态行为跟踪（课程讲授技术）
+- **pysnooper**: 可选的调试跟踪（debug_trace=True 时启用）
 - **正则表达式**: 模式识别和文本分析
 
 ### 分析维度
@@ -741,24 +1315,19 @@ def analyze_commit_patterns(input_path, output_dir):
 
 ### 数据文件
 - 原始数据: {input_path}
-- 处理后数据: {output_path / 'processed_data.csv'}
+- 处理后数据: {processed_data_path}
 
 ### 生成图表
-- weekday_distribution.png: 星期分布
-- hourly_distribution.png: 小时分布  
-- contributors_distribution.png: 贡献者分布
-- monthly_trends.png: 月度趋势
-- message_types_pie.png: 消息类型分布
-- code_structure_analysis.png: 代码结构分析
+{chart_list}
 
 ### 环境信息
 - Python 版本: {sys.version.split()[0]}
 - pandas 版本: {pd.__version__}
-- matplotlib 版本: {plt.matplotlib.__version__}
+- matplotlib 版本: {_package_version('matplotlib')}
 - 分析脚本: src/analysis.py
-- GitHub 仓库: https://github.com/psf/requests
+- 项目仓库: {project_url or input_path}
 
-> 💡 **备注**: 本分析基于开源软件基础课程要求，使用课程讲授的开源工具进行深度分析。requests 是一个被 1,000,000+ 仓库依赖的流行库，每周下载量约 3000 万次，是研究开源项目演化的理想案例。
+> 💡 **备注**: 本分析基于开源软件基础课程要求，使用课程讲授的开源工具进行深度分析。{project.get('note', '')}
 """
         
         # 保存报告
@@ -768,15 +1337,15 @@ def analyze_commit_patterns(input_path, output_dir):
         print(f"✅ 生成: analysis_report.md")
         
         # 保存处理后的数据
-        processed_data_path = output_path / "processed_data.csv"
-        df.to_csv(str(processed_data_path), index=False, encoding='utf-8-sig')
+        with span('save processed data', 'io', rows=len(df)):
+            save_commit_table(df, str(processed_data_path), processed_format)
         print(f"✅ 保存处理后的数据到: {processed_data_path}")
         
         # 生成简要摘要
         summary = f"""
 开源项目提交历史分析摘要
 ==========================
-项目: requests
+项目: {project_name}
 分析时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 总提交数: {total_commits}
 贡献者数: {total_contributors}
@@ -794,8 +1363,154 @@ def analyze_commit_patterns(input_path, output_dir):
     except Exception as e:
         print(f"❌ 生成分析报告失败: {str(e)}")
         raise
+
+def analyze_commit_patterns(input_path, output_dir, processed_format='csv', time_basis='local',
+                            message_rules=None, debug_trace=False, render_profile='print',
+                            render_workers=None, backup_root='results/backups', backup_retention=None,
+                            project=None, repo_path=None, structure_workers=None, resolve_identities=False,
+                            profile_trace=False):
+    """
+    分析提交模式并生成图表和报告
+
+    Args:
+        input_path (str): 提交数据文件（.csv / .parquet / .feather）
+        output_dir (str): 输出目录
+        processed_format (str): 处理后数据的存储格式，'csv'、'parquet' 或 'feather'
+        time_basis (str): 小时/星期/月份分布使用的时间，'local'（提交者本地时间）或 'utc'
+        message_rules (dict): 自定义提交消息类型规则（类型 -> 正则，按优先级排列）
+        debug_trace (bool): 用 pysnooper 跟踪贡献者画像生成过程（调试用，较慢）
+        render_profile (str): 图表输出配置，'preview'、'print' 或 'vector'（见 RENDER_PROFILES）
+        render_workers (int): 绘制图表的进程数，默认 CPU 核数，1 表示不使用进程池
+        backup_root (str): 备份仓库目录（内容寻址，见 BackupStore）
+        backup_retention (dict): 快照保留策略（keep_last / keep_daily / keep_weekly），
+            默认 DEFAULT_RETENTION
+        project (dict): 报告中的项目信息（name，可选 url / description / note），
+            默认 DEFAULT_PROJECT
+        repo_path (str): 提交数据对应的 Git 仓库，提供时用 ast 分析变更的 Python 文件
+            （需要完整哈希 hash 列），否则不生成代码结构图
+        structure_workers (int): 解析 Python 文件的进程数，默认 CPU 核数
+        resolve_identities (bool): 合并同一个人的不同作者名（.mailmap 与别名聚类，需要 repo_path
+            才能使用邮箱）；默认关闭，按原始作者名统计，开启后贡献者数、巴士因子等指标会随合并变化
+        profile_trace (bool): 除 run_profile.json 外，再导出 Chrome / Perfetto 可打开的
+            run_profile.trace.json
+    """
+     # ===== 关键修复：添加类型验证 =====
+    if not isinstance(input_path, (str, os.PathLike)):
+        raise TypeError(f"input_path 必须是字符串或路径对象，而不是 {type(input_path).__name__}")
+    
+    if not isinstance(output_dir, (str, os.PathLike)):
+        raise TypeError(f"output_dir 必须是字符串或路径对象，而不是 {type(output_dir).__name__}")
+    
+    if processed_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"不支持的存储格式: {processed_format}")
+    
+    if time_basis not in ('local', 'utc'):
+        raise ValueError(f"time_basis 只能是 'local' 或 'utc'，而不是 {time_basis!r}")
+    
+    if render_profile not in RENDER_PROFILES:
+        raise ValueError(f"不支持的渲染配置: {render_profile}")
+    
+    # 确保输出目录存在
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    cube_path = output_path / f"{CUBE_NAME}.{default_cube_format()}"
+    
+    print(f"\n{'📁 路径信息':-^60}")
+    print(f"输入路径: {Path(input_path).resolve()}")
+    print(f"输出目录: {output_path.resolve()}")
+    print(f"当前工作目录: {Path.cwd()}")
+
+     # ===== 关键修复：验证输入文件存在 =====
+    input_file = Path(input_path)
+    if not input_file.exists():
+        raise FileNotFoundError(f"❌ 数据文件不存在: {input_file.resolve()}")
+    
+    # =============== 0. 备份旧结果 ===============
+    if output_path.exists() and any(output_path.iterdir()):
+        print(f"\n{'🛡️  备份旧结果':-^60}")
+        
+        # 内容寻址备份：只复制备份仓库中还没有的文件内容，再按保留策略清理旧快照
+        try:
+            store = BackupStore(backup_root)
+            backup = store.snapshot(output_path, prefix='analysis', exclude=[PIPELINE_CACHE_DIR])
+            if backup['name']:
+                print(f"✅ 备份成功: {Path(backup_root) / 'snapshots' / backup['name']}.json "
+                      f"({backup['files']} 个文件，新增 {backup['new_objects']} 个对象，"
+                      f"复制 {backup['bytes_copied']} bytes)")
+            else:
+                print("✅ 内容与上一份快照相同，无需新建快照")
+            retention = store.apply_retention(**(backup_retention or DEFAULT_RETENTION), prefix='analysis')
+            if retention['removed']:
+                print(f"🗑️  按保留策略删除 {len(retention['removed'])} 份旧快照，"
+                      f"回收 {retention['objects_removed']} 个对象")
+        except Exception as e:
+            print(f"⚠️  备份失败: {str(e)}")
+        
+        # 清理旧结果（保留流水线缓存、聚合立方体和渲染清单记录的图表，输入未变化时可直接复用）
+        print(f"\n{'🧹 清理旧结果':-^60}")
+        preserved = rendered_chart_files(output_path) | {PIPELINE_CACHE_DIR, cube_path.name,
+                                                         f"{cube_path.name}.meta.json"}
+        for item in output_path.iterdir():
+            if item.name in preserved:
+                continue
+            try:
+                if item.is_file() or item.is_symlink():
+                    item.unlink()
+                elif item.is_dir():
+                    shutil.rmtree(str(item))
+                print(f"✅ 清理: {item.name}")
+            except Exception as e:
+                print(f"⚠️  无法清理 {item.name}: {str(e)}")
+    else:
+        print(f"\n{'✅ 目录已干净，无需清理':-^60}")
+    
+    # =============== 1. 分阶段流水线 ===============
+    # load → normalize / code_structure / identity → aggregate → render → report；前五个阶段的结果
+    # 缓存在 .cache 目录中，键由输入文件内容和各阶段配置决定
+    pipeline = Pipeline(cache_dir=output_path / PIPELINE_CACHE_DIR)
+    pipeline.add_stage('load', load_stage, config={'columns': ANALYSIS_COLUMNS},
+                       options={'input_path': str(input_file)}, digest=file_digest(input_file))
+    pipeline.add_stage('normalize', normalize_stage, inputs=['load'],
+                       config={'time_basis': time_basis})
+    pipeline.add_stage('code_structure', code_structure_stage, inputs=['load'],
+                       config={'repo_path': str(Path(repo_path).resolve()) if repo_path else None},
+                       options={'workers': structure_workers,
+                                'cache_path': str(output_path / PIPELINE_CACHE_DIR / BLOB_METRICS_CACHE)})
+    pipeline.add_stage('identity', identity_stage, inputs=['load'],
+                       config={'repo_path': str(Path(repo_path).resolve()) if repo_path else None,
+                               'enabled': resolve_identities, 'mailmap': mailmap_digest(repo_path)},
+                       options={'cache_path': str(output_path / PIPELINE_CACHE_DIR / IDENTITY_CACHE)})
+    # debug_trace 需要真正执行贡献者画像才能生成跟踪日志
+    pipeline.add_stage('aggregate', aggregate_stage, inputs=['normalize', 'code_structure', 'identity'],
+                       config={'message_rules': message_rules, 'time_basis': time_basis},
+                       options={'debug_trace': debug_trace, 'trace_dir': str(output_path),
+                                'cube_path': str(cube_path)},
+                       force=debug_trace)
+    # 图表由渲染清单按图表缓存，这里不再整体缓存
+    pipeline.add_stage('render', _render_stage, inputs=['aggregate'],
+                       config={'profile': render_profile},
+                       options={'output_dir': str(output_path), 'workers': render_workers},
+                       cacheable=False)
+    pipeline.add_stage('report', report_stage, inputs=['aggregate', 'render'],
+                       config={'input_path': str(input_path), 'processed_format': processed_format,
+                               'project': project},
+                       options={'output_dir': str(output_path)}, cacheable=False)
+    # 各阶段、子阶段、子进程与每张图表的计时区间写入运行剖析
+    trace_path = output_path / RUN_TRACE if profile_trace else None
+    with profiling(output_path / RUN_PROFILE, trace_path, name=f"analysis {input_file.name}"):
+        pipeline.result('report')
+        
+        aggregates = pipeline.result('aggregate')
+        # 聚合阶段命中缓存时不会写立方体，文件缺失时补写
+        if not cube_path.exists():
+            aggregates['cube'].save(str(cube_path))
+    df = aggregates['df']
+    df.attrs['stage_metrics'] = pipeline.metrics
+    with open(str(output_path / "stage_metrics.json"), 'w', encoding='utf-8') as f:
+        json.dump(pipeline.metrics, f, ensure_ascii=False, indent=2)
+    print(f"✅ 生成: stage_metrics.json、{RUN_PROFILE}" + (f"、{RUN_TRACE}" if trace_path else ""))
     
-    # =============== 8. 最终验证 ===============
+    # =============== 2. 最终验证 ===============
     print(f"\n{'✅ 最终验证':-^60}")
     generated_files = list(output_path.iterdir())
     print(f"生成的文件 ({len(generated_files)}):")
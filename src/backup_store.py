@@ -0,0 +1,199 @@
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+# 默认保留策略：最近 5 份，加上最近 7 天每天 1 份、最近 4 周每周 1 份
+DEFAULT_RETENTION = {'keep_last': 5, 'keep_daily': 7, 'keep_weekly': 4}
+
+SNAPSHOT_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+def _hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(str(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BackupStore:
+    """
+    内容寻址的备份仓库
+
+    目录结构：
+        objects/ab/cdef...        按 SHA-256 保存的文件内容，相同内容只存一份
+        snapshots/<名称>.json     快照清单：相对路径 -> 摘要、大小
+        stat_cache.json          源文件 (大小, mtime) -> 摘要，未修改的文件不再重新计算哈希
+
+    备份时只复制仓库中还没有的内容，开销与变化量成正比。对象是独立的副本而不是硬链接：
+    分析脚本会原地覆盖输出文件（例如重绘图表），硬链接会让备份内容被一起改掉。
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.snapshots_dir = self.root / 'snapshots'
+        self.stat_cache_path = self.root / 'stat_cache.json'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _load_stat_cache(self):
+        try:
+            with open(str(self.stat_cache_path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_stat_cache(self, cache):
+        tmp_path = self.stat_cache_path.with_suffix('.tmp')
+        with open(str(tmp_path), 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(str(tmp_path), str(self.stat_cache_path))
+
+    def list_snapshots(self):
+        """按时间从旧到新列出快照名"""
+        return sorted(p.stem for p in self.snapshots_dir.glob('*.json'))
+
+    def read_snapshot(self, name):
+        """读取快照清单"""
+        with open(str(self.snapshots_dir / f"{name}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _store_object(self, file_path, digest):
+        """内容不在仓库中时复制进来，返回是否新增了对象"""
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            return False
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = object_path.with_name(object_path.name + '.tmp')
+        shutil.copyfile(str(file_path), str(tmp_path))
+        os.replace(str(tmp_path), str(object_path))
+        return True
+
+    def snapshot(self, source_dir, prefix='analysis', exclude=()):
+        """
+        为目录创建快照
+
+        Args:
+            source_dir (str): 要备份的目录
+            prefix (str): 快照名前缀，快照名为 <prefix>_<时间戳>
+            exclude (list): 跳过的顶层文件或目录名
+
+        Returns:
+            dict: {'name': 快照名（内容与上一份快照相同时为 None）, 'files': 文件数,
+                   'new_objects': 新增对象数, 'bytes_copied': 新复制的字节数}
+        """
+        source = Path(source_dir)
+        source_prefix = str(source.resolve()) + os.sep
+        # 丢弃该目录下已不存在的文件的缓存项
+        stat_cache = {k: v for k, v in self._load_stat_cache().items()
+                      if not k.startswith(source_prefix) or os.path.exists(k)}
+        files = {}
+        new_objects = 0
+        bytes_copied = 0
+        for path in sorted(source.rglob('*')):
+            relative = path.relative_to(source)
+            if relative.parts[0] in exclude or not path.is_file():
+                continue
+            stat = path.stat()
+            cache_key = str(path.resolve())
+            cached = stat_cache.get(cache_key)
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                digest = cached[2]
+            else:
+                digest = _hash_file(path)
+                stat_cache[cache_key] = [stat.st_size, stat.st_mtime_ns, digest]
+            # stat 缓存可能指向已被回收的对象，复制前再确认一次
+            if self._store_object(path, digest):
+                new_objects += 1
+                bytes_copied += stat.st_size
+            files[relative.as_posix()] = {'sha256': digest, 'size': stat.st_size}
+        self._save_stat_cache(stat_cache)
+
+        result = {'name': None, 'files': len(files), 'new_objects': new_objects,
+                  'bytes_copied': bytes_copied}
+        snapshots = [s for s in self.list_snapshots() if s.startswith(f"{prefix}_")]
+        if snapshots and self.read_snapshot(snapshots[-1])['files'] == files:
+            return result
+
+        now = datetime.now()
+        name = f"{prefix}_{now.strftime(SNAPSHOT_TIME_FORMAT)}"
+        suffix = 1
+        while (self.snapshots_dir / f"{name}.json").exists():
+            name = f"{prefix}_{now.strftime(SNAPSHOT_TIME_FORMAT)}_{suffix}"
+            suffix += 1
+        manifest = {
+            'name': name,
+            'created': now.isoformat(timespec='seconds'),
+            'source': str(source.resolve()),
+            'files': files,
+        }
+        with open(str(self.snapshots_dir / f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        result['name'] = name
+        return result
+
+    def restore(self, name, target_dir):
+        """
+        把快照恢复到目标目录
+
+        Returns:
+            int: 恢复的文件数
+        """
+        manifest = self.read_snapshot(name)
+        target = Path(target_dir)
+        for relative, entry in manifest['files'].items():
+            destination = target / relative
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(str(self._object_path(entry['sha256'])), str(destination))
+        return len(manifest['files'])
+
+    def apply_retention(self, keep_last=5, keep_daily=7, keep_weekly=4, prefix=None):
+        """
+        按保留策略删除旧快照，并回收不再被引用的对象
+
+        保留最近 keep_last 份；再为最近 keep_daily 个有快照的日期、keep_weekly 个有快照的
+        ISO 周各保留当天/当周最新的一份。
+
+        Returns:
+            dict: {'removed': 删除的快照名列表, 'objects_removed': 回收的对象数}
+        """
+        snapshots = self.list_snapshots()
+        if prefix:
+            snapshots = [s for s in snapshots if s.startswith(f"{prefix}_")]
+        created_at = {name: datetime.fromisoformat(self.read_snapshot(name)['created']) for name in snapshots}
+        newest_first = sorted(snapshots, key=lambda s: (created_at[s], s), reverse=True)
+
+        keep = set(newest_first[:keep_last])
+        days, weeks = {}, {}
+        for name in newest_first:
+            created = created_at[name]
+            day = created.date()
+            week = tuple(created.isocalendar())[:2]
+            if day not in days and len(days) < keep_daily:
+                days[day] = name
+            if week not in weeks and len(weeks) < keep_weekly:
+                weeks[week] = name
+        keep.update(days.values())
+        keep.update(weeks.values())
+
+        removed = [name for name in newest_first if name not in keep]
+        for name in removed:
+            (self.snapshots_dir / f"{name}.json").unlink()
+        return {'removed': removed, 'objects_removed': self.collect_garbage()}
+
+    def collect_garbage(self):
+        """删除没有任何快照引用的对象，返回删除数量"""
+        referenced = set()
+        for name in self.list_snapshots():
+            referenced.update(entry['sha256'] for entry in self.read_snapshot(name)['files'].values())
+        removed = 0
+        for object_path in self.objects_dir.glob('*/*'):
+            if object_path.parent.name + object_path.name not in referenced:
+                object_path.unlink()
+                removed += 1
+        return removed
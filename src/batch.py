@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+try:
+    from src.analysis import analyze_commit_patterns
+    from src.instrumentation import profiling, span
+    from src.data_collection import (collect_commit_data_incremental, collect_commit_data_robust,
+                                     collect_commit_data_safe)
+    from src.setup_repo import DEFAULT_CONCURRENCY, sync_repositories
+    from src.storage import SUPPORTED_FORMATS
+except ImportError:  # 直接以脚本方式运行 src/batch.py
+    from analysis import analyze_commit_patterns
+    from instrumentation import profiling, span
+    from data_collection import (collect_commit_data_incremental, collect_commit_data_robust,
+                                 collect_commit_data_safe)
+    from setup_repo import DEFAULT_CONCURRENCY, sync_repositories
+    from storage import SUPPORTED_FORMATS
+
+# 收集方式 -> 收集函数（签名均为 (repo_path, output_path)）；
+# safe 不输出完整哈希列 hash，使用它时跳过代码结构分析（汇总表的 warning 列中注明）
+COLLECTORS = {
+    'incremental': collect_commit_data_incremental,
+    'robust': collect_commit_data_robust,
+    'safe': collect_commit_data_safe,
+}
+# 跨仓库汇总表的列
+SUMMARY_COLUMNS = ['name', 'path', 'status', 'commits', 'contributors', 'first_commit', 'last_commit',
+                   'lines_added', 'lines_deleted', 'seconds', 'error', 'warning']
+
+def load_manifest(path):
+    """
+    读取仓库清单
+
+    .json 文件为列表，元素是仓库路径字符串或 {"path": ..., "name": ..., "url": ...,
+    "description": ...}；其他文件每行一个仓库路径，# 开头的行为注释。
+    name 默认取目录名，必须唯一（用作输出目录名）。
+
+    Returns:
+        list: [{'path': ..., 'name': ..., ...}, ...]
+    """
+    with open(str(path), 'r', encoding='utf-8') as f:
+        if str(path).lower().endswith('.json'):
+            entries = json.load(f)
+            if not isinstance(entries, list):
+                raise ValueError(f"仓库清单必须是 JSON 列表: {path}")
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    repos, names = [], set()
+    for entry in entries:
+        repo = {'path': entry} if isinstance(entry, str) else dict(entry)
+        if not repo.get('path'):
+            raise ValueError(f"仓库清单条目缺少 path: {entry!r}")
+        repo['name'] = repo.get('name') or Path(repo['path']).resolve().name
+        if repo['name'] in names:
+            raise ValueError(f"仓库清单中名称重复: {repo['name']}（请为其指定 name）")
+        names.add(repo['name'])
+        repos.append(repo)
+    return repos
+
+def _summarize(df):
+    """从分析结果中提取汇总表的一行"""
+    return {
+        'commits': len(df),
+        'contributors': int(df['author'].nunique()),
+        'first_commit': df['date'].min().strftime('%Y-%m-%d') if len(df) else None,
+        'last_commit': df['date'].max().strftime('%Y-%m-%d') if len(df) else None,
+        'lines_added': int(df['lines_added'].sum()),
+        'lines_deleted': int(df['lines_deleted'].sum()),
+    }
+
+def analyze_repository(task):
+    """
+    进程池任务：收集并分析一个仓库，失败时返回错误而不抛出
+
+    输出重定向到 <output_root>/logs/<name>.log，避免多个进程的输出交错；
+    收集与分析各阶段的耗时写入 <output_root>/logs/<name>.profile.json。
+
+    Args:
+        task (dict): 仓库条目与批处理配置
+
+    Returns:
+        dict: 汇总表的一行
+    """
+    repo = task['repo']
+    name = repo['name']
+    output_root = Path(task['output_root'])
+    data_path = Path(task['data_dir']) / f"{name}_commits.{task['storage_format']}"
+    output_dir = output_root / name
+    log_path = output_root / 'logs' / f"{name}.log"
+    profile_path = output_root / 'logs' / f"{name}.profile.json"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    row = {'name': name, 'path': repo['path'], 'status': 'ok', 'error': None, 'warning': None}
+    start = time.perf_counter()
+    with open(str(log_path), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            with profiling(str(profile_path), name=name):
+                with span('collect', collector=task['collector']):
+                    COLLECTORS[task['collector']](repo['path'], str(data_path))
+                project = {key: repo[key] for key in ('name', 'url', 'description', 'note') if repo.get(key)}
+                df = analyze_commit_patterns(
+                    str(data_path), str(output_dir),
+                    render_profile=task['render_profile'], render_workers=1,
+                    backup_root=str(output_root / 'backups' / name), project=project,
+                    repo_path=repo['path'], structure_workers=1,
+                )
+            row.update(_summarize(df))
+            if 'hash' not in df.columns or df['hash'].isna().all():
+                row['warning'] = f"{task['collector']} 收集的数据缺少完整哈希列 hash，已跳过代码结构分析"
+        except Exception as e:
+            traceback.print_exc()
+            row['status'] = 'failed'
+            row['error'] = f"{type(e).__name__}: {e}"
+    row['seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+def _print_result(row):
+    if row['status'] == 'ok':
+        print(f"✅ {row['name']}: {row['commits']} 个提交, {row['seconds']:.1f}s")
+        if row.get('warning'):
+            print(f"⚠️  {row['name']}: {row['warning']}")
+    else:
+        print(f"❌ {row['name']}: {row['error']}")
+
+def run_batch(manifest, output_root='results/batch', data_dir='data/processed/batch', workers=None,
+              collector='incremental', storage_format='csv', render_profile='preview', sync=False,
+              sync_concurrency=DEFAULT_CONCURRENCY):
+    """
+    批量收集并分析多个仓库
+
+    每个仓库在进程池中独立运行已有的收集器与 analyze_commit_patterns，
+    单个仓库失败只记录在汇总表中，不影响其他仓库。
+
+    Args:
+        manifest (str | list): 仓库清单文件路径，或 load_manifest 格式的条目列表
+        output_root (str): 输出根目录，每个仓库的结果位于 <output_root>/<name>
+        data_dir (str): 提交数据目录，每个仓库的数据为 <data_dir>/<name>_commits.<格式>
+        workers (int): 进程数，默认 CPU 核数
+        collector (str): 'incremental'（默认，重复运行只收集新提交）、'robust' 或 'safe'
+            （safe 不输出完整哈希，跳过代码结构分析）
+        storage_format (str): 提交数据的存储格式
+        render_profile (str): 图表输出配置（见 RENDER_PROFILES），默认 'preview'
+        sync (bool): 分析前并发克隆或 fetch 清单中带 url 的仓库（见 sync_repositories），
+            同步失败的仓库不再分析
+        sync_concurrency (int): 同步时同时运行的 git 进程数
+
+    Returns:
+        pd.DataFrame: 跨仓库汇总表（同时写入 <output_root>/batch_summary.csv）
+    """
+    if collector not in COLLECTORS:
+        raise ValueError(f"不支持的收集方式: {collector}，可选: {', '.join(COLLECTORS)}")
+    if storage_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"不支持的存储格式: {storage_format}")
+    repos = load_manifest(manifest) if isinstance(manifest, (str, os.PathLike)) else list(manifest)
+    output_path = Path(output_root)
+    output_path.mkdir(parents=True, exist_ok=True)
+    Path(data_dir).mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    if sync:
+        # 收集与代码结构分析要读取全部文件内容，不使用部分克隆
+        synced = sync_repositories([repo for repo in repos if repo.get('url')], concurrency=sync_concurrency,
+                                   partial=False)
+        failed_sync = {r['name']: r['error'] for r in synced if r['status'] != 'ok'}
+        for repo in repos:
+            if repo['name'] in failed_sync:
+                row = {'name': repo['name'], 'path': repo['path'], 'status': 'failed',
+                       'error': f"sync failed: {failed_sync[repo['name']]}"}
+                rows.append(row)
+                _print_result(row)
+        repos_to_analyze = [repo for repo in repos if repo['name'] not in failed_sync]
+    else:
+        repos_to_analyze = repos
+
+    tasks = [{
+        'repo': repo,
+        'output_root': str(output_path),
+        'data_dir': str(data_dir),
+        'collector': collector,
+        'storage_format': storage_format,
+        'render_profile': render_profile,
+    } for repo in repos_to_analyze]
+
+    workers = min(workers or os.cpu_count() or 1, max(1, len(tasks)))
+    print(f"📦 批量分析 {len(tasks)} 个仓库（{workers} 个进程）...")
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(analyze_repository, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # 工作进程崩溃等无法在任务内捕获的错误
+                    row = {'name': task['repo']['name'], 'path': task['repo']['path'],
+                           'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                rows.append(row)
+                _print_result(row)
+    else:
+        for task in tasks:
+            row = analyze_repository(task)
+            rows.append(row)
+            _print_result(row)
+
+    # 按清单顺序输出
+    order = {repo['name']: i for i, repo in enumerate(repos)}
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    summary = summary.sort_values('name', key=lambda names: names.map(order), kind='stable').reset_index(drop=True)
+    summary_path = output_path / 'batch_summary.csv'
+    summary.to_csv(str(summary_path), index=False, encoding='utf-8-sig')
+
+    failed = int((summary['status'] != 'ok').sum())
+    print(f"\n✅ 完成 {len(summary) - failed}/{len(summary)} 个仓库，汇总表: {summary_path}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量收集并分析多个 Git 仓库")
+    parser.add_argument('manifest', help="仓库清单（每行一个路径，或 JSON 列表）")
+    parser.add_argument('--output-root', default='results/batch')
+    parser.add_argument('--data-dir', default='data/processed/batch')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--collector', choices=list(COLLECTORS), default='incremental')
+    parser.add_argument('--format', dest='storage_format', choices=SUPPORTED_FORMATS, default='csv')
+    parser.add_argument('--profile', dest='render_profile', default='preview')
+    parser.add_argument('--sync', action='store_true', help="分析前并发克隆 / fetch 带 url 的仓库")
+    parser.add_argument('--sync-concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+    result = run_batch(**vars(args))
+    sys.exit(1 if (result['status'] != 'ok').any() else 0)
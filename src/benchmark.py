@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import shutil
+import platform
+import contextlib
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.analysis import analyze_commit_patterns
+    from src.data_collection import COMMIT_COLUMNS, collect_commit_data_robust, collect_commit_data_safe
+    from src.storage import save_commit_table
+except ImportError:  # 直接以脚本方式运行 src/benchmark.py
+    from analysis import analyze_commit_patterns
+    from data_collection import COMMIT_COLUMNS, collect_commit_data_robust, collect_commit_data_safe
+    from storage import save_commit_table
+
+# 预设规模
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+# 默认的提交消息类型比例
+DEFAULT_MESSAGE_MIX = {'fix': 0.3, 'feat': 0.25, 'docs': 0.15, 'refactor': 0.1, 'test': 0.1, 'chore': 0.05,
+                       'other': 0.05}
+# 各类型的消息模板（{n} 为提交序号）
+MESSAGE_TEMPLATES = {
+    'fix': 'fix: handle edge case in module {n}',
+    'feat': 'feat: add option {n}',
+    'docs': 'docs: update readme section {n}',
+    'refactor': 'refactor: clean up helper {n}',
+    'test': 'test: add coverage for case {n}',
+    'chore': 'chore: bump deps {n}',
+    'other': 'wip {n}',
+}
+# 作者时区（分钟）
+TIMEZONES = [0, 60, 480, 540, -300, -420]
+# 相邻提交的平均间隔（秒）
+MEAN_COMMIT_INTERVAL = 3600
+# 可计时的收集器
+COLLECTORS = {'robust': collect_commit_data_robust, 'safe': collect_commit_data_safe}
+
+def parse_size(size):
+    """'1k' / '100k' / '1m' 或整数 -> 提交数"""
+    if isinstance(size, int):
+        return size
+    text = str(size).lower()
+    if text in SIZES:
+        return SIZES[text]
+    if text[-1:] in ('k', 'm'):
+        return int(float(text[:-1]) * (1_000 if text[-1] == 'k' else 1_000_000))
+    return int(text)
+
+def _synthetic_plan(commits, authors, files, message_mix, seed):
+    """按随机种子生成提交计划（作者、时间、时区、消息类型、变更文件），结果可复现"""
+    rng = np.random.default_rng(seed)
+    mix = message_mix or DEFAULT_MESSAGE_MIX
+    types = list(mix)
+    weights = np.array([mix[t] for t in types], dtype=float)
+    # 少数作者贡献大部分提交（Zipf 分布）
+    author_weights = 1.0 / np.arange(1, authors + 1)
+    start = int(pd.Timestamp('2015-01-01').timestamp())
+    return {
+        'author': rng.choice(authors, size=commits, p=author_weights / author_weights.sum()),
+        'timestamp': start + np.cumsum(rng.exponential(MEAN_COMMIT_INTERVAL, size=commits)).astype(np.int64),
+        'offset': rng.choice(TIMEZONES, size=commits),
+        'type': np.array(types)[rng.choice(len(types), size=commits, p=weights / weights.sum())],
+        'files_changed': rng.integers(1, 4, size=commits),
+        'file': rng.integers(0, files, size=(commits, 3)),
+        'lines': rng.integers(1, 30, size=(commits, 3)),
+    }
+
+def _format_offset(minutes):
+    sign = '+' if minutes >= 0 else '-'
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+def generate_commit_table(commits, authors=50, files=500, message_mix=None, seed=0):
+    """
+    生成与收集器输出格式相同的合成提交表（不需要 git 仓库）
+
+    Args:
+        commits (int): 提交数
+        authors (int): 作者数
+        files (int): 文件数（只影响 files_changed 的取值范围）
+        message_mix (dict): 消息类型 -> 比例，类型见 MESSAGE_TEMPLATES
+        seed (int): 随机种子
+
+    Returns:
+        pd.DataFrame: COMMIT_COLUMNS 列，按时间从新到旧（与 git log 顺序一致）
+    """
+    plan = _synthetic_plan(commits, authors, files, message_mix, seed)
+    rng = np.random.default_rng(seed + 1)
+    local = pd.to_datetime(plan['timestamp'] + plan['offset'] * 60, unit='s').strftime('%Y-%m-%d %H:%M:%S')
+    offsets = pd.Series(plan['offset']).map(_format_offset)
+    # 由 sha1 生成，短哈希与真实提交一样几乎不会重复
+    hashes = [hashlib.sha1(f'{seed}:{i}'.encode('ascii')).hexdigest() for i in range(commits)]
+    df = pd.DataFrame({
+        'hash': hashes,
+        'commit_hash': [h[:7] for h in hashes],
+        'author': pd.Series(plan['author']).map(lambda a: f'Author {a}'),
+        'date': pd.Series(local) + ' ' + offsets,
+        'message': [MESSAGE_TEMPLATES.get(t, '{n}').format(n=i) for i, t in enumerate(plan['type'])],
+        'lines_added': rng.integers(0, 200, size=commits),
+        'lines_deleted': rng.integers(0, 100, size=commits),
+        'files_changed': np.minimum(plan['files_changed'], files),
+    }, columns=COMMIT_COLUMNS)
+    return df.iloc[::-1].reset_index(drop=True)
+
+def generate_repository(repo_path, commits, authors=50, files=500, message_mix=None, seed=0):
+    """
+    用 git fast-import 生成合成仓库
+
+    每个提交由一位作者改写 1-3 个 Python 文件（内容为若干赋值语句），
+    提交时间递增并使用不同时区。fast-import 直接写入打包文件，百万级提交也只需数分钟。
+
+    Args:
+        repo_path (str): 仓库路径（不存在时创建）
+        commits, authors, files, message_mix, seed: 见 generate_commit_table
+
+    Returns:
+        str: 仓库路径
+    """
+    repo_path = Path(repo_path)
+    repo_path.mkdir(parents=True, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', '-b', 'main', str(repo_path)], check=True)
+    plan = _synthetic_plan(commits, authors, files, message_mix, seed)
+
+    proc = subprocess.Popen(['git', '-C', str(repo_path), 'fast-import', '--quiet', '--done'],
+                            stdin=subprocess.PIPE)
+    write = proc.stdin.write
+
+    def data(payload):
+        encoded = payload.encode('utf-8')
+        write(b'data %d\n' % len(encoded))
+        write(encoded)
+        write(b'\n')
+
+    for i in range(commits):
+        author = plan['author'][i]
+        signature = (f"Author {author} <author{author}@example.com> {plan['timestamp'][i]} "
+                     f"{_format_offset(int(plan['offset'][i]))}")
+        write(f"commit refs/heads/main\nauthor {signature}\ncommitter {signature}\n".encode('utf-8'))
+        data(MESSAGE_TEMPLATES.get(plan['type'][i], '{n}').format(n=i))
+        for k in range(int(plan['files_changed'][i])):
+            file_index = int(plan['file'][i, k])
+            lines = int(plan['lines'][i, k])
+            path = f"pkg{file_index % 20}/module_{file_index}.py"
+            write(f"M 100644 inline {path}\n".encode('utf-8'))
+            data(''.join(f"value_{i}_{n} = {n}\n" for n in range(lines)))
+    write(b'done\n')
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, 'git fast-import')
+    subprocess.run(['git', '-C', str(repo_path), 'reset', '-q', '--hard', 'main'], check=True)
+    return str(repo_path)
+
+def _timed(func, *args, quiet=True, **kwargs):
+    """执行函数并返回 (结果, 耗时秒数)；quiet 时丢弃其标准输出"""
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+def _environment():
+    """记录在结果中的版本信息，便于比较不同版本"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=str(Path(__file__).resolve().parent)).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {'revision': revision, 'python': platform.python_version(), 'pandas': pd.__version__,
+            'numpy': np.__version__, 'platform': platform.platform()}
+
+def run_benchmarks(sizes=('1k',), authors=50, files=500, message_mix=None, seed=0, work_dir='results/benchmarks',
+                   output_path=None, collectors=('robust', 'safe'), generate_repo=True, quiet=True):
+    """
+    在合成数据上计时收集器与分析流水线的各个阶段
+
+    每个规模生成一个合成仓库（generate_repo=False 时只生成提交表），依次计时 collectors 中的
+    收集器，再对收集结果运行 analyze_commit_patterns 并记录各阶段耗时与峰值内存。
+    生成的仓库按参数缓存在 work_dir 中，重复运行时直接复用。
+
+    Args:
+        sizes (Iterable): 规模，'1k' / '100k' / '1m' 或提交数
+        authors (int): 作者数
+        files (int): 文件数
+        message_mix (dict): 消息类型 -> 比例
+        seed (int): 随机种子
+        work_dir (str): 合成仓库与中间结果目录
+        output_path (str): 结果 JSON 路径，默认 <work_dir>/benchmark-<时间>.json
+        collectors (Iterable[str]): 要计时的收集器（'robust'、'safe'）
+        generate_repo (bool): 是否生成 git 仓库；False 时跳过收集器，直接分析合成提交表
+        quiet (bool): 丢弃被测函数的输出
+
+    Returns:
+        dict: {'environment', 'config', 'results': [{'size', 'commits', 'benchmark', 'seconds',
+               'peak_memory_mb'}, ...]}（同时写入 output_path）
+    """
+    work_path = Path(work_dir)
+    work_path.mkdir(parents=True, exist_ok=True)
+    config = {'sizes': [str(s) for s in sizes], 'authors': authors, 'files': files,
+              'message_mix': message_mix or DEFAULT_MESSAGE_MIX, 'seed': seed,
+              'collectors': list(collectors) if generate_repo else [], 'generate_repo': generate_repo}
+    # 缓存的合成仓库与提交表按全部生成参数区分，消息类型比例不同时不会复用旧数据
+    mix_digest = hashlib.sha1(json.dumps(config['message_mix'], sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    results = []
+
+    def record(size, commits, benchmark, seconds, peak=None):
+        results.append({'size': str(size), 'commits': commits, 'benchmark': benchmark,
+                        'seconds': round(seconds, 4), 'peak_memory_mb': peak})
+        print(f"⏱️  {size:>6} {benchmark:<28} {seconds:>9.3f}s")
+
+    for size in sizes:
+        commits = parse_size(size)
+        case = f"{size}-a{authors}-f{files}-s{seed}-m{mix_digest}"
+        case_dir = work_path / case
+        case_dir.mkdir(exist_ok=True)
+        repo_path = None
+        if generate_repo:
+            repo_path = case_dir / 'repo'
+            if not (repo_path / '.git').exists():
+                _, seconds = _timed(generate_repository, str(repo_path), commits, authors, files,
+                                    message_mix, seed, quiet=quiet)
+                record(size, commits, 'generate_repository', seconds)
+            for name in collectors:
+                _, seconds = _timed(COLLECTORS[name], str(repo_path), str(case_dir / f'commits_{name}.csv'),
+                                    quiet=quiet)
+                record(size, commits, f'collect_{name}', seconds)
+            # 分析健壮模式的收集结果（含完整哈希，代码结构阶段需要）
+            data_path = case_dir / 'commits_robust.csv'
+            if 'robust' not in collectors:
+                _timed(collect_commit_data_robust, str(repo_path), str(data_path), quiet=quiet)
+        else:
+            data_path = case_dir / 'synthetic_commits.csv'
+            if not data_path.exists():
+                save_commit_table(generate_commit_table(commits, authors, files, message_mix, seed), str(data_path))
+
+        # 每次从空输出目录开始，保证各阶段都实际执行
+        output_dir = case_dir / 'analysis'
+        if output_dir.exists():
+            shutil.rmtree(str(output_dir))
+        df, seconds = _timed(analyze_commit_patterns, str(data_path), str(output_dir), render_profile='preview',
+                             backup_root=str(case_dir / 'backups'), repo_path=str(repo_path) if repo_path else None,
+                             quiet=quiet)
+        for metric in df.attrs.get('stage_metrics', []):
+            record(size, commits, f"analysis.{metric['stage']}", metric['seconds'], metric['peak_memory_mb'])
+        record(size, commits, 'analysis.total', seconds)
+
+    report = {'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'environment': _environment(),
+              'config': config, 'results': results}
+    output_path = Path(output_path or work_path / f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(str(output_path), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 基准测试结果已保存至: {output_path}")
+    return report
+
+def compare_benchmarks(baseline, current, tolerance=0.1):
+    """
+    比较两次基准测试结果
+
+    Args:
+        baseline, current (str | dict): 结果 JSON 路径或 run_benchmarks 的返回值
+        tolerance (float): 耗时增加超过该比例时标记为退化
+
+    Returns:
+        pd.DataFrame: size、benchmark、baseline、current、ratio、regression
+    """
+    def frame(report):
+        if not isinstance(report, dict):
+            with open(str(report), 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        return pd.DataFrame(report['results']).set_index(['size', 'benchmark'])['seconds']
+
+    merged = pd.concat([frame(baseline).rename('baseline'), frame(current).rename('current')],
+                       axis=1, join='inner').reset_index()
+    merged['ratio'] = (merged['current'] / merged['baseline']).round(3)
+    merged['regression'] = merged['ratio'] > 1 + tolerance
+    return merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在合成仓库上计时数据收集与分析流水线")
+    parser.add_argument('--sizes', nargs='+', default=['1k'], help="规模：1k、100k、1m 或提交数")
+    parser.add_argument('--authors', type=int, default=50)
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--message-mix', type=json.loads, default=None,
+                        help='消息类型比例（JSON），例如 \'{"fix": 0.5, "feat": 0.5}\'')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', default='results/benchmarks')
+    parser.add_argument('--output', dest='output_path', default=None)
+    parser.add_argument('--collectors', nargs='*', choices=list(COLLECTORS), default=['robust', 'safe'])
+    parser.add_argument('--no-repo', dest='generate_repo', action='store_false',
+                        help="不生成 git 仓库，只分析合成提交表")
+    parser.add_argument('--compare', default=None, help="与该基准结果 JSON 比较")
+    args = vars(parser.parse_args())
+    baseline = args.pop('compare')
+    report = run_benchmarks(**args)
+    if baseline:
+        comparison = compare_benchmarks(baseline, report)
+        print(comparison.to_string(index=False))
+        sys.exit(1 if comparison['regression'].any() else 0)
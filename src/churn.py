@@ -0,0 +1,291 @@
+import os
+import itertools
+from array import array
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.storage import split_date_offset
+except ImportError:  # 直接以脚本方式运行 src 目录下的模块
+    from storage import split_date_offset
+
+# 路径表在 .npz 中的分隔符（git 路径中不会出现 NUL）
+PATH_SEPARATOR = '\0'
+# 计算共同变更时忽略变更文件数超过该值的提交（批量格式化、依赖更新等）
+MAX_FILES_PER_COMMIT = 50
+
+class FileChangeTable:
+    """
+    逐提交、逐文件的变更表
+
+    路径按首次出现的顺序编码为整数，每条记录只保存五个 int32（提交序号、路径编号、
+    重命名前的路径编号、新增行数、删除行数），收集时追加到 array 中，不为每个文件创建 dict。
+    提交序号对应 commit_hashes / commit_dates 中的位置（与 git log 输出顺序一致）；
+    不是重命名（或收集时未检测重命名）的记录，旧路径编号为 -1。
+    """
+
+    def __init__(self):
+        self.paths = []
+        self.commit_hashes = []
+        self.commit_dates = []
+        self._codes = {}
+        self._commit = array('i')
+        self._path = array('i')
+        self._old_path = array('i')
+        self._added = array('i')
+        self._deleted = array('i')
+
+    def start_commit(self, commit_hash, date):
+        """开始记录一个提交，返回其序号"""
+        self.commit_hashes.append(commit_hash)
+        self.commit_dates.append(date)
+        return len(self.commit_hashes) - 1
+
+    def path_code(self, path):
+        """路径 -> 整数编号（新路径分配新编号）"""
+        code = self._codes.get(path)
+        if code is None:
+            code = self._codes[path] = len(self.paths)
+            self.paths.append(path)
+        return code
+
+    def add(self, added, deleted, path, old_path=None):
+        """为当前提交记录一个文件的变更，重命名时 old_path 为原路径"""
+        self._commit.append(len(self.commit_hashes) - 1)
+        self._path.append(self.path_code(path))
+        self._old_path.append(self.path_code(old_path) if old_path is not None else -1)
+        self._added.append(added)
+        self._deleted.append(deleted)
+
+    def __len__(self):
+        return len(self._commit)
+
+    def arrays(self):
+        """
+        Returns:
+            dict: commit、path、old_path、added、deleted 五列 int32 数组（共享底层内存，不复制）
+        """
+        return {name: np.frombuffer(values, dtype=np.int32) if len(values) else np.zeros(0, np.int32)
+                for name, values in self._columns()}
+
+    def _columns(self):
+        return (('commit', self._commit), ('path', self._path), ('old_path', self._old_path),
+                ('added', self._added), ('deleted', self._deleted))
+
+    def to_frame(self):
+        """展开为 DataFrame（hash、path、old_path 为 category 列，old_path 非重命名时为空）"""
+        data = self.arrays()
+        return pd.DataFrame({
+            'hash': pd.Categorical.from_codes(data['commit'], categories=self.commit_hashes),
+            'path': pd.Categorical.from_codes(data['path'], categories=self.paths),
+            'old_path': pd.Categorical.from_codes(data['old_path'], categories=self.paths),
+            'added': data['added'],
+            'deleted': data['deleted'],
+        })
+
+    def save(self, path):
+        """保存为 .npz（路径表与提交列表各存为一个字符串）"""
+        os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+        with open(str(path), 'wb') as f:
+            np.savez_compressed(
+                f,
+                paths=np.array(PATH_SEPARATOR.join(self.paths)),
+                commit_hashes=np.array('\n'.join(self.commit_hashes)),
+                commit_dates=np.array('\n'.join(str(d) for d in self.commit_dates)),
+                **self.arrays()
+            )
+
+    @classmethod
+    def load(cls, path):
+        """读取 save 保存的变更表"""
+        table = cls()
+        with np.load(str(path)) as data:
+            paths = str(data['paths'])
+            table.paths = paths.split(PATH_SEPARATOR) if paths else []
+            hashes = str(data['commit_hashes'])
+            table.commit_hashes = hashes.split('\n') if hashes else []
+            dates = str(data['commit_dates'])
+            table.commit_dates = dates.split('\n') if dates else []
+            table._codes = {p: i for i, p in enumerate(table.paths)}
+            for name, target in table._columns():
+                if name in data:
+                    target.frombytes(data[name].astype(np.int32).tobytes())
+                else:
+                    # 不含重命名信息的旧文件
+                    target.extend([-1] * len(data['commit']))
+        return table
+
+class ChurnIndex:
+    """
+    基于 FileChangeTable 的变更热点、目录变更趋势与共同变更查询
+
+    所有查询都在整数数组上完成（bincount / groupby），不需要重新运行 git log。
+    """
+
+    def __init__(self, table):
+        self.table = table
+        data = table.arrays()
+        self.commit = data['commit']
+        self.path = data['path']
+        self.old_path = data['old_path']
+        self.added = data['added'].astype(np.int64)
+        self.deleted = data['deleted'].astype(np.int64)
+        local, _ = split_date_offset(pd.Series(table.commit_dates, dtype='string'))
+        self.commit_dates = local.to_numpy()
+        self.dates = self.commit_dates[self.commit] if len(self.commit) else np.array([], dtype='datetime64[ns]')
+        self._directories = {}
+
+    def _mask(self, since=None, until=None):
+        mask = np.ones(len(self.commit), dtype=bool)
+        if since is not None:
+            mask &= self.dates >= np.datetime64(pd.Timestamp(since))
+        if until is not None:
+            mask &= self.dates <= np.datetime64(pd.Timestamp(until))
+        return mask
+
+    def hotspots(self, top=20, since=None, until=None):
+        """
+        变更最多的文件
+
+        Args:
+            top (int): 返回的文件数，None 表示全部
+            since, until (str): 只统计该时间范围内的提交
+
+        Returns:
+            pd.DataFrame: path、commits、added、deleted、churn，按 churn 降序
+        """
+        mask = self._mask(since, until)
+        size = len(self.table.paths)
+        codes = self.path[mask]
+        result = pd.DataFrame({
+            'path': self.table.paths,
+            'commits': np.bincount(codes, minlength=size),
+            'added': np.bincount(codes, weights=self.added[mask], minlength=size).astype(np.int64),
+            'deleted': np.bincount(codes, weights=self.deleted[mask], minlength=size).astype(np.int64),
+        })
+        result['churn'] = result['added'] + result['deleted']
+        result = result[result['commits'] > 0].sort_values(['churn', 'commits'], ascending=False, kind='stable')
+        return (result if top is None else result.head(top)).reset_index(drop=True)
+
+    def directory_codes(self, depth=1):
+        """
+        每个路径所属目录的编号（取前 depth 级目录，根目录下的文件记为 "."）
+
+        Returns:
+            tuple: (路径编号 -> 目录编号数组, 目录名列表)
+        """
+        if depth not in self._directories:
+            directories = ['/'.join(p.split('/')[:-1][:depth]) or '.' for p in self.table.paths]
+            codes, names = pd.factorize(pd.Series(directories, dtype=object))
+            self._directories[depth] = (codes, list(names))
+        return self._directories[depth]
+
+    def directory_churn(self, depth=1, freq='M', since=None, until=None):
+        """
+        按时间段统计各目录的变更行数
+
+        Args:
+            depth (int): 目录层级
+            freq (str): 时间粒度（pandas Period 频率，例如 'M'、'Q'、'Y'）
+
+        Returns:
+            pd.DataFrame: 以时间段为索引、目录为列的变更行数（新增 + 删除）
+        """
+        mask = self._mask(since, until)
+        path_dirs, names = self.directory_codes(depth)
+        frame = pd.DataFrame({
+            'period': pd.PeriodIndex(self.dates[mask], freq=freq),
+            'directory': pd.Categorical.from_codes(path_dirs[self.path[mask]], categories=names),
+            'churn': self.added[mask] + self.deleted[mask],
+        })
+        return frame.pivot_table(index='period', columns='directory', values='churn',
+                                 aggfunc='sum', fill_value=0, observed=True)
+
+    def co_change_pairs(self, min_count=2, top=50, max_files=MAX_FILES_PER_COMMIT):
+        """
+        经常在同一提交中一起变更的文件对
+
+        Args:
+            min_count (int): 至少共同变更的次数
+            top (int): 返回的文件对数量，None 表示全部
+            max_files (int): 忽略变更文件数超过该值的提交
+
+        Returns:
+            pd.DataFrame: file_a、file_b、count，以及 confidence（count / file_a 的变更次数）
+        """
+        if not len(self.commit):
+            return pd.DataFrame(columns=['file_a', 'file_b', 'count', 'confidence'])
+        # 记录按提交顺序追加，直接按提交序号切分
+        boundaries = np.flatnonzero(np.diff(self.commit)) + 1
+        pairs = Counter()
+        for group in np.split(self.path, boundaries):
+            if 1 < len(group) <= max_files:
+                pairs.update(itertools.combinations(np.unique(group).tolist(), 2))
+        rows = [(a, b, n) for (a, b), n in pairs.items() if n >= min_count]
+        result = pd.DataFrame(rows, columns=['a', 'b', 'count'])
+        touches = np.bincount(self.path, minlength=len(self.table.paths))
+        result['confidence'] = result['count'] / touches[result['a'].to_numpy(dtype=np.int64)] if rows else []
+        result = result.sort_values(['count', 'confidence'], ascending=False, kind='stable')
+        if top is not None:
+            result = result.head(top)
+        paths = np.array(self.table.paths, dtype=object)
+        return pd.DataFrame({
+            'file_a': paths[result['a'].to_numpy(dtype=np.int64)],
+            'file_b': paths[result['b'].to_numpy(dtype=np.int64)],
+            'count': result['count'].to_numpy(),
+            'confidence': result['confidence'].to_numpy(dtype=float),
+        })
+
+    def renames(self):
+        """
+        收集时检测到的重命名
+
+        Returns:
+            pd.DataFrame: hash、old_path、new_path、added、deleted
+        """
+        rows = np.flatnonzero(self.old_path >= 0)
+        paths = np.array(self.table.paths, dtype=object)
+        return pd.DataFrame({
+            'hash': [self.table.commit_hashes[i] for i in self.commit[rows]],
+            'old_path': paths[self.old_path[rows]] if len(rows) else [],
+            'new_path': paths[self.path[rows]] if len(rows) else [],
+            'added': self.added[rows],
+            'deleted': self.deleted[rows],
+        })
+
+    def file_history(self, path, follow_renames=True):
+        """
+        某个文件的逐提交变更记录
+
+        Args:
+            path (str): 文件路径（最新的名称）
+            follow_renames (bool): 沿重命名记录继续追踪旧路径（需要收集时检测重命名）
+
+        Returns:
+            pd.DataFrame: hash、date、path、added、deleted，按 git log 顺序（从新到旧）
+        """
+        code = self.table._codes.get(path)
+        if code is None:
+            rows = np.array([], dtype=np.int64)
+        elif not follow_renames:
+            rows = np.flatnonzero(self.path == code)
+        else:
+            # 记录从新到旧排列，遇到重命名后改为追踪旧路径
+            rows, current = [], code
+            for row in range(len(self.path)):
+                if self.path[row] == current:
+                    rows.append(row)
+                    if self.old_path[row] >= 0:
+                        current = self.old_path[row]
+            rows = np.array(rows, dtype=np.int64)
+        commits = self.commit[rows]
+        paths = np.array(self.table.paths, dtype=object)
+        return pd.DataFrame({
+            'hash': [self.table.commit_hashes[i] for i in commits],
+            'date': self.commit_dates[commits],
+            'path': paths[self.path[rows]] if len(rows) else [],
+            'added': self.added[rows],
+            'deleted': self.deleted[rows],
+        })
@@ -0,0 +1,215 @@
+import io
+import os
+import ast
+import json
+import tokenize
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    from src.git_backend import GitBackend
+    from src.instrumentation import span
+except ImportError:  # 直接以脚本方式运行 src 目录下的模块
+    from git_backend import GitBackend
+    from instrumentation import span
+
+# 代码结构特征（与 code_structure_analysis 图表的类别一致）
+STRUCTURE_METRICS = ['function_defs', 'class_defs', 'imports', 'if_statements', 'loops', 'comments']
+# AST 节点类型 -> 特征
+NODE_METRICS = {
+    ast.FunctionDef: 'function_defs',
+    ast.AsyncFunctionDef: 'function_defs',
+    ast.ClassDef: 'class_defs',
+    ast.Import: 'imports',
+    ast.ImportFrom: 'imports',
+    ast.If: 'if_statements',
+    ast.IfExp: 'if_statements',
+    ast.For: 'loops',
+    ast.AsyncFor: 'loops',
+    ast.While: 'loops',
+}
+# 只分析这些扩展名的文件
+PYTHON_SUFFIXES = ('.py', '.pyw')
+# 需要解析的 blob 少于该数量时不启动进程池
+PARALLEL_THRESHOLD = 200
+# 每个进程池任务解析的 blob 数
+BLOB_CHUNK_SIZE = 100
+
+def analyze_source(source):
+    """
+    用 ast 统计一段 Python 源码的结构特征
+
+    Args:
+        source (bytes): 源码（按编码声明解码）
+
+    Returns:
+        dict | None: 特征 -> 数量；无法解析（语法错误、Python 2 代码等）时返回 None
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, MemoryError, RecursionError):
+        return None
+    counts = dict.fromkeys(STRUCTURE_METRICS, 0)
+    for node in ast.walk(tree):
+        metric = NODE_METRICS.get(type(node))
+        if metric:
+            counts[metric] += 1
+    try:
+        counts['comments'] = sum(1 for token in tokenize.tokenize(io.BytesIO(source).readline)
+                                 if token.type == tokenize.COMMENT)
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return counts
+
+def _analyze_blob_chunk(task):
+    """进程池任务：每个工作进程打开自己的 cat-file 进程读取并解析一批 blob"""
+    repo_path, shas = task
+    with GitBackend(repo_path, cache_entries=0) as backend:
+        blobs = backend.read_blobs(shas)
+    return {sha: analyze_source(blob) if blob is not None else None for sha, blob in zip(shas, blobs)}
+
+class BlobMetricsCache:
+    """
+    按 blob SHA 记忆化的解析结果，保存为 JSON
+
+    blob 内容由 SHA 唯一确定，未修改的文件在不同提交之间、不同运行之间都只解析一次。
+    无法解析的 blob 也会记录（值为 null），不再重复尝试。
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.entries = {}
+        self._dirty = False
+        if self.path is not None and self.path.exists():
+            try:
+                with open(str(self.path), 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  解析结果缓存损坏，忽略: {str(e)}")
+
+    def __contains__(self, sha):
+        return sha in self.entries
+
+    def get(self, sha):
+        return self.entries.get(sha)
+
+    def update(self, results):
+        self.entries.update(results)
+        self._dirty = self._dirty or bool(results)
+
+    def save(self):
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(str(tmp_path), 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(str(tmp_path), str(self.path))
+        self._dirty = False
+
+def _is_python(path):
+    return path is not None and path.endswith(PYTHON_SUFFIXES)
+
+def _tip_commit(repo_path, commits):
+    """
+    这些提交中拓扑顺序最新的一个（git rev-list --topo-order 的第一个）
+
+    git log 默认按提交时间排序，提交时间被改早（rebase、cherry-pick、时钟偏差）时
+    列表中的第一个提交不一定是最新状态。rev-list 失败时返回 None。
+    """
+    if not commits:
+        return None
+    try:
+        with span('git rev-list', 'subprocess', rows=len(commits)):
+            output = subprocess.run(
+                ['git', '-C', str(repo_path), 'rev-list', '--topo-order', '--max-count=1', '--stdin'],
+                input=''.join(f'{commit}\n' for commit in commits).encode('ascii'),
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+            ).stdout.decode('ascii').split()
+    except (subprocess.CalledProcessError, UnicodeEncodeError):
+        return None
+    return output[0] if output else None
+
+def _python_blobs(repo_path, commit):
+    """提交的树中全部 Python 文件 -> blob SHA（git ls-tree -r）"""
+    with span('git ls-tree', 'subprocess') as tree_span:
+        output = subprocess.check_output(['git', '-C', str(repo_path), 'ls-tree', '-r', '-z', commit])
+        blobs = {}
+        for entry in output.decode('utf-8', errors='surrogateescape').split('\0'):
+            if not entry:
+                continue
+            info, path = entry.split('\t', 1)
+            _, kind, sha = info.split()
+            if kind == 'blob' and _is_python(path):
+                blobs[path] = sha
+        tree_span.set(rows=len(blobs))
+    return blobs
+
+def analyze_code_structure(repo_path, commits, cache_path=None, workers=None):
+    """
+    统计每个提交中变更的 Python 文件的结构特征及其增量
+
+    先通过一个 diff-tree 进程批量取得每个提交的文件级变更，再把缓存中没有的 blob
+    分块交给进程池解析（数量较少时在当前进程中解析）。合并提交没有 diff，
+    因此最新状态的合计直接取自最新提交的树，而不是回放各提交的变更。
+
+    Args:
+        repo_path (str): 仓库路径
+        commits (list): 完整提交哈希（通常为 git log 顺序）
+        cache_path (str): blob 解析结果缓存文件，None 表示只在内存中缓存
+        workers (int): 解析进程数，默认 CPU 核数；1 表示不使用进程池
+
+    Returns:
+        dict: {'totals': 拓扑顺序最新的提交中全部 Python 文件的特征合计,
+               'commits': 每个提交的变更文件数与各特征增量（pd.DataFrame，与 commits 顺序一致）,
+               'parsed': 本次新解析的 blob 数, 'parse_errors': 无法解析的 blob 数}
+    """
+    commits = list(commits)
+    cache = BlobMetricsCache(cache_path)
+    tip = _tip_commit(repo_path, commits)
+    tip_blobs = _python_blobs(repo_path, tip) if tip else {}
+    with GitBackend(repo_path) as backend:
+        with span('git diff-tree', 'subprocess', rows=len(commits)):
+            diffs = backend.diff_trees(commits)
+        changes = [[c for c in diff if _is_python(c['old_path']) or _is_python(c['new_path'])]
+                   for diff in diffs]
+        seen = [sha for diff in changes for c in diff for sha in (c['old_sha'], c['new_sha']) if sha is not None]
+        seen += tip_blobs.values()
+        needed = [sha for sha in dict.fromkeys(seen) if sha not in cache]
+
+        workers = workers or os.cpu_count() or 1
+        with span('parse blobs', rows=len(needed)) as parse_span:
+            if workers > 1 and len(needed) >= PARALLEL_THRESHOLD:
+                chunks = [needed[i:i + BLOB_CHUNK_SIZE] for i in range(0, len(needed), BLOB_CHUNK_SIZE)]
+                print(f"🐍 使用 {workers} 个进程解析 {len(needed)} 个 Python 文件版本...")
+                parse_span.set(workers=workers)
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for result in executor.map(_analyze_blob_chunk, [(str(repo_path), chunk) for chunk in chunks]):
+                        cache.update(result)
+            elif needed:
+                blobs = backend.read_blobs(needed)
+                cache.update({sha: analyze_source(blob) if blob is not None else None
+                              for sha, blob in zip(needed, blobs)})
+    cache.save()
+
+    empty = dict.fromkeys(STRUCTURE_METRICS, 0)
+    rows = []
+    for commit, diff in zip(commits, changes):
+        delta = dict(empty)
+        for change in diff:
+            old = cache.get(change['old_sha']) if change['old_sha'] else None
+            new = cache.get(change['new_sha']) if change['new_sha'] else None
+            for metric in STRUCTURE_METRICS:
+                delta[metric] += (new or empty)[metric] - (old or empty)[metric]
+        rows.append({'hash': commit, 'py_files_changed': len(diff), **delta})
+
+    totals = dict(empty)
+    for sha in tip_blobs.values():
+        for metric, value in (cache.get(sha) or empty).items():
+            totals[metric] += value
+    per_commit = pd.DataFrame(rows, columns=['hash', 'py_files_changed'] + STRUCTURE_METRICS)
+    parse_errors = len({sha for sha in seen if cache.get(sha) is None})
+    return {'totals': totals, 'commits': per_commit, 'parsed': len(needed), 'parse_errors': parse_errors}
@@ -0,0 +1,163 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# 默认的滑动窗口长度（天）
+DEFAULT_WINDOWS = (30, 90, 365)
+# 默认计算前 k 位贡献者的提交占比
+DEFAULT_TOP_K = (1, 3)
+# 巴士因子：覆盖该比例提交所需的最少贡献者数
+BUS_FACTOR_THRESHOLD = 0.5
+
+class WindowCounts:
+    """
+    窗口内每位贡献者的提交数
+
+    除了 作者 -> 提交数 外还维护 提交数 -> 作者数 的直方图，
+    加入或移除一个提交只更新两个计数；集中度指标按直方图计算，
+    复杂度与不同提交数的个数（而不是贡献者数）成正比。
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.histogram = Counter()
+        self.total = 0
+
+    def _move(self, author, delta):
+        before = self.counts.get(author, 0)
+        after = before + delta
+        if before:
+            self.histogram[before] -= 1
+            if not self.histogram[before]:
+                del self.histogram[before]
+        if after:
+            self.counts[author] = after
+            self.histogram[after] += 1
+        else:
+            del self.counts[author]
+        self.total += delta
+
+    def add(self, author):
+        self._move(author, 1)
+
+    def remove(self, author):
+        self._move(author, -1)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def bus_factor(self, threshold=BUS_FACTOR_THRESHOLD):
+        """覆盖 threshold 比例提交所需的最少贡献者数"""
+        if not self.total:
+            return 0
+        target, covered, authors = threshold * self.total, 0, 0
+        for commits, size in sorted(self.histogram.items(), reverse=True):
+            if covered + commits * size >= target:
+                return authors + math.ceil((target - covered) / commits)
+            covered += commits * size
+            authors += size
+        return authors
+
+    def top_share(self, k):
+        """提交数最多的 k 位贡献者的提交占比"""
+        if not self.total:
+            return 0.0
+        covered, remaining = 0, k
+        for commits, size in sorted(self.histogram.items(), reverse=True):
+            take = min(size, remaining)
+            covered += commits * take
+            remaining -= take
+            if not remaining:
+                break
+        return covered / self.total
+
+    def gini(self):
+        """贡献者提交数的基尼系数（0 表示完全平均）"""
+        n = len(self.counts)
+        if n < 2 or not self.total:
+            return 0.0
+        weighted, rank = 0, 0
+        for commits, size in sorted(self.histogram.items()):
+            # 排名 rank+1 .. rank+size 的贡献者提交数相同
+            weighted += commits * (size * rank + size * (size + 1) // 2)
+            rank += size
+        return 2 * weighted / (n * self.total) - (n + 1) / n
+
+def _day_numbers(dates):
+    """日期 -> 自 1970-01-01 起的天数"""
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+def contributor_timeline(df, windows=DEFAULT_WINDOWS, freq='D', top_k=DEFAULT_TOP_K,
+                         threshold=BUS_FACTOR_THRESHOLD):
+    """
+    滑动窗口上的贡献者集中度指标
+
+    每个窗口长度各维护一个 WindowCounts，窗口右移时只加入新进入的提交、移除离开的提交，
+    不对每个窗口重新分组。新贡献者（首次提交位于窗口内）同样用双指针按首次提交日期滑动。
+
+    Args:
+        df (pd.DataFrame): 含 author 与 date 列的提交数据
+        windows (Iterable[int]): 窗口长度（天）
+        freq (str): 采样间隔（pandas 频率），窗口截止于每个采样日（含当天）
+        top_k (Iterable[int]): 计算前 k 位贡献者的提交占比
+        threshold (float): 巴士因子的覆盖比例
+
+    Returns:
+        pd.DataFrame: 每个 (窗口, 采样日) 一行，含 window_days、date、commits、contributors、
+        bus_factor、gini、top{k}_share、new_contributors、returning_contributors
+    """
+    columns = (['window_days', 'date', 'commits', 'contributors', 'bus_factor', 'gini']
+               + [f'top{k}_share' for k in top_k] + ['new_contributors', 'returning_contributors'])
+    data = df[['author', 'date']].dropna()
+    if data.empty:
+        return pd.DataFrame(columns=columns)
+
+    days = _day_numbers(data['date'])
+    order = np.argsort(days, kind='stable')
+    days = days[order]
+    authors, _ = pd.factorize(data['author'].to_numpy()[order])
+    # 每位贡献者首次提交的日期（已排序）
+    first_days = np.sort(pd.Series(days).groupby(authors).min().to_numpy())
+    points = _day_numbers(pd.date_range(pd.Timestamp(int(days[0]), unit='D'),
+                                        pd.Timestamp(int(days[-1]), unit='D'), freq=freq))
+
+    rows = []
+    for window in windows:
+        counts = WindowCounts()
+        head = tail = 0
+        for point in points:
+            start = point - window
+            while head < len(days) and days[head] <= point:
+                counts.add(authors[head])
+                head += 1
+            while tail < head and days[tail] <= start:
+                counts.remove(authors[tail])
+                tail += 1
+            new = int(np.searchsorted(first_days, point, side='right')
+                      - np.searchsorted(first_days, start, side='right'))
+            rows.append([window, point, counts.total, len(counts), counts.bus_factor(threshold),
+                         counts.gini()] + [counts.top_share(k) for k in top_k]
+                        + [new, len(counts) - new])
+
+    result = pd.DataFrame(rows, columns=columns)
+    result['date'] = pd.to_datetime(result['date'].astype('int64'), unit='D')
+    return result
+
+def summarize_contributors(df, threshold=BUS_FACTOR_THRESHOLD, top_k=DEFAULT_TOP_K):
+    """
+    全部历史上的贡献者集中度
+
+    Returns:
+        dict: commits、contributors、bus_factor、gini、top{k}_share
+    """
+    counts = WindowCounts()
+    for author, commits in df['author'].dropna().value_counts().items():
+        counts.counts[author] = int(commits)
+        counts.histogram[int(commits)] += 1
+        counts.total += int(commits)
+    summary = {'commits': counts.total, 'contributors': len(counts),
+               'bus_factor': counts.bus_factor(threshold), 'gini': counts.gini()}
+    summary.update({f'top{k}_share': counts.top_share(k) for k in top_k})
+    return summary
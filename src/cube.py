@@ -0,0 +1,276 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from src.storage import detect_format
+except ImportError:  # 直接以脚本方式运行 src 目录下的模块
+    from storage import detect_format
+
+# 立方体的维度与度量
+CUBE_DIMENSIONS = ['date', 'hour', 'weekday', 'author', 'message_type']
+CUBE_MEASURES = ['commits', 'lines_added', 'lines_deleted', 'files_changed']
+# 星期编号（Monday=0）-> 图表使用的中文标签
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+WEEKDAY_LABELS_CN = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+def default_cube_format():
+    """安装了 pyarrow 时使用 Parquet，否则退回 CSV"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'csv'
+    return 'parquet'
+
+def config_digest(config):
+    """影响立方体内容的配置（时间基准、消息规则等）的摘要"""
+    payload = json.dumps(config or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _row_key_column(commits):
+    """用于识别已聚合提交的列：优先完整哈希"""
+    return 'hash' if 'hash' in commits.columns else 'commit_hash'
+
+def _typed(cells):
+    """统一立方体各列的类型"""
+    cells = cells.copy()
+    cells['date'] = pd.to_datetime(cells['date'])
+    cells['hour'] = cells['hour'].astype('int8')
+    cells['weekday'] = cells['weekday'].astype('int8')
+    cells['author'] = cells['author'].astype(str)
+    cells['message_type'] = cells['message_type'].astype(str)
+    for column in CUBE_MEASURES:
+        cells[column] = cells[column].astype('int64')
+    return cells[CUBE_DIMENSIONS + CUBE_MEASURES]
+
+class CommitCube:
+    """
+    按 (日期, 小时, 星期, 作者, 消息类型) 预聚合的提交立方体
+
+    每个单元格保存提交数与新增/删除行数、变更文件数。单元格数量只与活跃的
+    (日期, 小时, 作者, 类型) 组合有关，远少于提交数，因此任意切片与汇总
+    （例如“某作者 2024 年的小时 × 星期分布”）都只需对这张小表做一次 groupby。
+
+    持久化时同时写出 <路径>.meta.json，记录已聚合的行数、首末提交哈希和配置摘要；
+    提交数据只在末尾追加新提交时（增量收集），append 只聚合新增的行。
+    """
+
+    def __init__(self, cells=None, meta=None):
+        if cells is None:
+            cells = pd.DataFrame(columns=CUBE_DIMENSIONS + CUBE_MEASURES)
+        self.cells = _typed(cells)
+        self.meta = dict(meta or {})
+
+    @staticmethod
+    def _aggregate(commits):
+        """把提交行聚合成单元格（需要 date_only、hour、day_of_week、author、message_type 列）"""
+        frame = pd.DataFrame({
+            'date': pd.to_datetime(commits['date_only']),
+            'hour': commits['hour'],
+            'weekday': commits['day_of_week'].map({name: i for i, name in enumerate(WEEKDAY_NAMES)}),
+            'author': commits['author'].astype(str),
+            'message_type': commits['message_type'].astype(str),
+            'commits': 1,
+        })
+        for column in CUBE_MEASURES[1:]:
+            if column in commits.columns:
+                frame[column] = pd.to_numeric(commits[column], errors='coerce').fillna(0)
+            else:
+                frame[column] = 0
+        return frame.groupby(CUBE_DIMENSIONS, sort=False, dropna=False)[CUBE_MEASURES].sum().reset_index()
+
+    @classmethod
+    def from_commits(cls, commits, config=None):
+        """
+        由带时间组件和消息类型的提交数据构建立方体
+
+        Args:
+            commits (pd.DataFrame): normalize_stage 之后并已分类消息的提交数据
+            config (dict): 影响单元格内容的配置，写入元数据，增量追加时用于校验
+
+        Returns:
+            CommitCube: 新立方体
+        """
+        cube = cls(cls._aggregate(commits))
+        cube.meta = {'config': config_digest(config), 'rows': 0}
+        cube._track(commits)
+        return cube
+
+    def _track(self, commits):
+        """记录已聚合的行数与首末提交，用于判断下次能否只追加新行"""
+        key = _row_key_column(commits)
+        self.meta['rows'] = len(commits)
+        self.meta['key'] = key
+        self.meta['first_hash'] = str(commits[key].iloc[0]) if len(commits) else None
+        self.meta['last_hash'] = str(commits[key].iloc[-1]) if len(commits) else None
+
+    def can_append(self, commits, config=None):
+        """提交数据是否只是在已聚合的行之后追加了新行"""
+        rows = self.meta.get('rows', 0)
+        key = self.meta.get('key')
+        if self.meta.get('config') != config_digest(config) or rows == 0 or len(commits) < rows:
+            return False
+        if key not in commits.columns:
+            return False
+        return (str(commits[key].iloc[0]) == self.meta.get('first_hash')
+                and str(commits[key].iloc[rows - 1]) == self.meta.get('last_hash'))
+
+    def append(self, commits, config=None):
+        """
+        增量更新：只聚合上次之后新增的行；数据被重写或配置变化时整体重建
+
+        Args:
+            commits (pd.DataFrame): 完整的提交数据（新提交位于末尾）
+            config (dict): 影响单元格内容的配置
+
+        Returns:
+            int: 本次聚合的提交行数
+        """
+        if not self.can_append(commits, config):
+            rebuilt = CommitCube.from_commits(commits, config)
+            self.cells, self.meta = rebuilt.cells, rebuilt.meta
+            return len(commits)
+        new_rows = commits.iloc[self.meta['rows']:]
+        if len(new_rows):
+            merged = pd.concat([self.cells, self._aggregate(new_rows)], ignore_index=True)
+            self.cells = _typed(
+                merged.groupby(CUBE_DIMENSIONS, sort=False)[CUBE_MEASURES].sum().reset_index()
+            )
+        self._track(commits)
+        return len(new_rows)
+
+    @staticmethod
+    def _meta_path(path):
+        return f"{path}.meta.json"
+
+    def save(self, path, fmt=None):
+        """
+        保存立方体与元数据
+
+        Args:
+            path (str): 输出路径（.parquet / .feather / .csv）
+            fmt (str): 存储格式，默认根据扩展名推断
+        """
+        fmt = detect_format(path, fmt)
+        os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+        cells = self.cells.reset_index(drop=True)
+        if fmt == 'parquet':
+            cells.to_parquet(str(path), index=False)
+        elif fmt == 'feather':
+            cells.to_feather(str(path))
+        else:
+            cells.to_csv(str(path), index=False, encoding='utf-8')
+        tmp_path = self._meta_path(path) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._meta_path(path))
+
+    @classmethod
+    def load(cls, path, fmt=None):
+        """
+        读取已保存的立方体；文件不存在或损坏时返回 None
+        """
+        if not Path(path).exists():
+            return None
+        fmt = detect_format(path, fmt)
+        try:
+            if fmt == 'parquet':
+                cells = pd.read_parquet(str(path))
+            elif fmt == 'feather':
+                cells = pd.read_feather(str(path))
+            else:
+                cells = pd.read_csv(str(path), encoding='utf-8', keep_default_na=False)
+            with open(cls._meta_path(path), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return cls(cells, meta)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  聚合立方体读取失败，将重新构建: {str(e)}")
+            return None
+
+    def slice(self, authors=None, message_types=None, start=None, end=None, hours=None, weekdays=None):
+        """
+        按维度筛选单元格
+
+        Args:
+            authors (list): 只保留这些作者
+            message_types (list): 只保留这些消息类型
+            start (str): 起始日期（含），例如 "2024-01-01"
+            end (str): 截止日期（含）
+            hours (list): 只保留这些小时
+            weekdays (list): 只保留这些星期（Monday=0）
+
+        Returns:
+            CommitCube: 筛选后的立方体（元数据不保留，不能再增量追加）
+        """
+        cells = self.cells
+        mask = pd.Series(True, index=cells.index)
+        if authors is not None:
+            mask &= cells['author'].isin([str(a) for a in authors])
+        if message_types is not None:
+            mask &= cells['message_type'].isin(list(message_types))
+        if start is not None:
+            mask &= cells['date'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= cells['date'] <= pd.Timestamp(end)
+        if hours is not None:
+            mask &= cells['hour'].isin(list(hours))
+        if weekdays is not None:
+            mask &= cells['weekday'].isin(list(weekdays))
+        return CommitCube(cells[mask])
+
+    def rollup(self, *dimensions, measures=CUBE_MEASURES):
+        """
+        按给定维度汇总度量；维度可以是立方体维度或 'month'
+
+        Returns:
+            pd.DataFrame: 以维度为索引的汇总表
+        """
+        cells = self.cells
+        keys = [cells['date'].dt.to_period('M').rename('month') if d == 'month' else cells[d]
+                for d in dimensions]
+        return cells.groupby(keys, sort=True)[list(measures)].sum()
+
+    def pivot(self, index='hour', columns='weekday', measure='commits'):
+        """二维透视表，例如小时 × 星期的提交数"""
+        return self.rollup(index, columns, measures=[measure])[measure].unstack(fill_value=0)
+
+    def day_counts(self):
+        """星期 -> 提交数（中文标签，周一到周日）"""
+        counts = self.rollup('weekday')['commits'].reindex(range(7), fill_value=0)
+        return pd.Series(counts.values, index=WEEKDAY_LABELS_CN, name='count')
+
+    def hour_counts(self):
+        """小时（0-23）-> 提交数"""
+        return self.rollup('hour')['commits'].reindex(range(24), fill_value=0).rename('count')
+
+    def author_counts(self):
+        """作者 -> 提交数（降序）"""
+        return self.rollup('author')['commits'].sort_values(ascending=False, kind='stable')
+
+    def message_counts(self):
+        """消息类型 -> 提交数"""
+        return self.rollup('message_type')['commits']
+
+    def monthly_stats(self):
+        """
+        月度汇总，与 aggregate_stage 的 monthly_stats 列相同
+
+        Returns:
+            pd.DataFrame: month、commits、authors、lines_added、lines_deleted、files_changed、
+            month_str、net_change
+        """
+        cells = self.cells
+        month = cells['date'].dt.to_period('M').rename('month')
+        monthly = cells.groupby(month, sort=True).agg(
+            commits=('commits', 'sum'),
+            authors=('author', 'nunique'),
+            lines_added=('lines_added', 'sum'),
+            lines_deleted=('lines_deleted', 'sum'),
+            files_changed=('files_changed', 'sum')
+        ).reset_index()
+        monthly['month_str'] = monthly['month'].astype(str)
+        monthly['net_change'] = monthly['lines_added'] - monthly['lines_deleted']
+        return monthly
@@ -1,171 +1,762 @@
-import git
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
 import subprocess
 import sys
+import re
+import csv
+import shutil
+import tempfile
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
-def collect_commit_data(repo_path, output_path):
+try:
+    from src.churn import FileChangeTable
+    from src.instrumentation import span
+    from src.storage import (CommitTableWriter, detect_format, load_commit_table,
+                             read_columns, save_commit_table)
+except ImportError:  # 直接以脚本方式运行 src/data_collection.py
+    from churn import FileChangeTable
+    from instrumentation import span
+    from storage import (CommitTableWriter, detect_format, load_commit_table,
+                         read_columns, save_commit_table)
+
+def collect_commit_data(repo_path, output_path, incremental=False):
     """
     收集Git仓库的提交历史数据（主函数）
     
     Args:
         repo_path (str): 仓库路径
-        output_path (str): 输出CSV文件路径
+        output_path (str): 输出文件路径（.csv / .parquet / .feather）
+        incremental (bool): 只收集上次运行之后的新提交并追加到已有数据
     
     Returns:
         pd.DataFrame: 包含提交数据的DataFrame
     """
+    if incremental:
+        collect_commit_data_incremental(repo_path, output_path)
+        return load_commit_table(output_path)
     return collect_commit_data_robust(repo_path, output_path)
 
-def collect_commit_data_robust(repo_path, output_path):
+# git log 输出格式: hash|author|date|message
+GIT_LOG_FORMAT = '%H|%an|%ad|%s'
+# 提交行以完整的 40 位哈希开头，用于和 numstat 行区分
+COMMIT_LINE_RE = re.compile(r'^[0-9a-f]{40}\|')
+# 流式模式下每批写入的提交数
+STREAM_BATCH_SIZE = 5000
+# 重命名检测的默认相似度阈值（百分比，与 git 默认值一致）
+DEFAULT_RENAME_THRESHOLD = 50
+# numstat 重命名路径: "旧 => 新" 或 "前缀{旧 => 新}后缀"
+RENAME_BRACE_RE = re.compile(r'^(.*)\{(.*) => (.*)\}(.*)$')
+# 健壮模式输出的列顺序
+COMMIT_COLUMNS = ['hash', 'commit_hash', 'author', 'date', 'message',
+                  'lines_added', 'lines_deleted', 'files_changed']
+
+def _history_options(max_count=None, since=None, until=None):
+    """
+    构造限定历史范围的 git 选项
+
+    Args:
+        max_count (int): 最多收集的提交数，None 表示不限制（完整历史）
+        since (str): 只收集该时间之后的提交，例如 "2024-01-01" 或 "2 weeks ago"
+        until (str): 只收集该时间之前的提交
+    """
+    options = []
+    if max_count is not None:
+        options.append(f'--max-count={int(max_count)}')
+    if since:
+        options.append(f'--since={since}')
+    if until:
+        options.append(f'--until={until}')
+    return options
+
+def _rename_options(find_renames=None):
+    """重命名检测选项：给出相似度阈值（百分比）时检测重命名，否则 --no-renames"""
+    if find_renames:
+        return [f'--find-renames={int(find_renames)}%']
+    return ['--no-renames']
+
+def _git_log_command(repo_path, rev_range=None, max_count=None, since=None, until=None,
+                     log_format=GIT_LOG_FORMAT, find_renames=None):
+    """构造 git log --numstat 命令"""
+    cmd = [
+        'git', '-C', repo_path, 'log', f'--format={log_format}',
+        '--date=iso', '--numstat', *_rename_options(find_renames)
+    ]
+    cmd.extend(_history_options(max_count, since, until))
+    if rev_range:
+        cmd.append(rev_range)
+    return cmd
+
+def _parse_commit_line(line):
+    """解析提交行: hash|author|date|message"""
+    parts = line.strip().split('|', 3)
+    return {
+        'hash': parts[0],
+        'commit_hash': parts[0][:7],
+        'author': parts[1],
+        'date': parts[2],  # 保留时区，分析时拆分为本地时间与 UTC 偏移
+        'message': parts[3][:80] if len(parts) > 3 else "无提交信息"
+    }
+
+def _split_rename_path(path):
+    """
+    拆分 numstat 的重命名路径
+
+    Returns:
+        tuple: (旧路径, 新路径)，不是重命名时旧路径为 None
+    """
+    match = RENAME_BRACE_RE.match(path)
+    if match:
+        prefix, old, new, suffix = match.groups()
+        # "a/{ => b}/c" 中空的一侧会留下连续的 "/"
+        return (f'{prefix}{old}{suffix}'.replace('//', '/'),
+                f'{prefix}{new}{suffix}'.replace('//', '/'))
+    if ' => ' in path:
+        old, new = path.split(' => ', 1)
+        return old, new
+    return None, path
+
+def _parse_numstat_line(line, renames=False):
+    """
+    解析文件变更行: added deleted filename
+
+    Args:
+        renames (bool): 输出来自重命名检测模式，filename 可能是 "旧 => 新"
+
+    Returns:
+        tuple | None: (added, deleted, filename, old_filename)，不是重命名时 old_filename 为 None；
+        无法解析时返回 None
+    """
+    parts = line.rstrip('\n').split('\t')
+    if len(parts) < 3 or not parts[0] or not parts[1]:
+        return None
+    # 处理二进制文件（numstat 输出 "-"）
+    added = int(parts[0]) if parts[0].isdigit() else 0
+    deleted = int(parts[1]) if parts[1].isdigit() else 0
+    if renames:
+        old_path, path = _split_rename_path(parts[2])
+        return added, deleted, path, old_path
+    return added, deleted, parts[2], None
+
+def _iter_log_output(cmd, stdin=None, file_changes=None):
+    """
+    运行 git log 命令并逐条解析其 --numstat 输出
+
+    Args:
+        cmd (list): 完整的 git log 命令
+        stdin (file): 传给 git 的标准输入（用于 --stdin 模式）
+        file_changes (FileChangeTable): 同时记录逐文件变更，None 表示只保留累计值
+
+    Yields:
+        dict: 与 COMMIT_COLUMNS 对应的提交记录
+    """
+    renames = any(arg.startswith(('--find-renames', '-M')) for arg in cmd)
+    # stderr 写入临时文件，避免管道写满导致 git 阻塞
+    with tempfile.TemporaryFile() as stderr_file, \
+            span('git log', 'subprocess', args=' '.join(cmd[3:])) as log_span:
+        proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=stderr_file)
+        current_commit = None
+        commits = file_rows = 0
+        try:
+            for raw_line in proc.stdout:
+                line = raw_line.decode('utf-8', errors='ignore')
+                if not line.strip():
+                    continue
+
+                if COMMIT_LINE_RE.match(line):
+                    if current_commit is not None:
+                        commits += 1
+                        yield current_commit
+                    current_commit = _parse_commit_line(line)
+                    current_commit['lines_added'] = 0
+                    current_commit['lines_deleted'] = 0
+                    current_commit['files_changed'] = 0
+                    if file_changes is not None:
+                        file_changes.start_commit(current_commit['hash'], current_commit['date'])
+                elif '\t' in line and current_commit is not None:
+                    change = _parse_numstat_line(line, renames)
+                    if change is None:
+                        # 跳过无法解析的行
+                        continue
+                    current_commit['lines_added'] += change[0]
+                    current_commit['lines_deleted'] += change[1]
+                    current_commit['files_changed'] += 1
+                    file_rows += 1
+                    if file_changes is not None:
+                        file_changes.add(*change)
+
+            # 处理最后一个提交
+            if current_commit is not None:
+                commits += 1
+                yield current_commit
+        finally:
+            # 消费方提前退出时结束 git 进程
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            returncode = proc.wait()
+            log_span.set(rows=commits, file_rows=file_rows, returncode=returncode)
+
+        if returncode != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(returncode, cmd, output=stderr_file.read())
+
+def iter_git_log_commits(repo_path, rev_range=None, max_count=None, since=None, until=None,
+                         file_changes=None, find_renames=None):
+    """
+    流式解析 git log 输出，逐条生成提交记录
+
+    git 的标准输出通过管道逐行读取，每个提交只保留累计的行数统计，
+    内存占用与历史长度无关。
+
+    Args:
+        repo_path (str): 仓库路径
+        rev_range (str): 修订范围，例如 "v1.0..v2.0" 或 "<hash>..HEAD"，默认从 HEAD 开始
+        max_count (int): 最多收集的提交数，None 表示完整历史
+        since (str): 起始时间（git --since 语法）
+        until (str): 截止时间（git --until 语法）
+        file_changes (FileChangeTable): 同时记录逐文件变更（见 churn 模块）
+        find_renames (int): 重命名检测的相似度阈值（百分比），None 表示不检测；
+            检测时重命名文件只统计内容差异，而不是整个文件的删除 + 新增
+
+    Yields:
+        dict: 与 COMMIT_COLUMNS 对应的提交记录
+    """
+    cmd = _git_log_command(repo_path, rev_range, max_count, since, until, find_renames=find_renames)
+    yield from _iter_log_output(cmd, file_changes=file_changes)
+
+def iter_git_log_commit_list(repo_path, hashes, log_format=GIT_LOG_FORMAT):
+    """
+    按给定顺序流式解析一组提交（git log --stdin --no-walk）
+
+    Args:
+        repo_path (str): 仓库路径
+        hashes (list): 提交哈希列表
+        log_format (str): git log 的 --format 格式，字段顺序须为 hash|author|date|message
+
+    Yields:
+        dict: 与 COMMIT_COLUMNS 对应的提交记录
+    """
+    # 只输出给定的提交，并保持输入顺序
+    cmd = _git_log_command(repo_path, log_format=log_format) + ['--stdin', '--no-walk=unsorted']
+    with tempfile.TemporaryFile() as stdin_file:
+        stdin_file.write(''.join(f'{h}\n' for h in hashes).encode('ascii'))
+        stdin_file.seek(0)
+        yield from _iter_log_output(cmd, stdin=stdin_file)
+
+def list_commit_hashes(repo_path, rev_range=None, max_count=None, since=None, until=None):
+    """
+    使用 git rev-list 列出范围内的提交（与 git log 顺序一致）
+
+    Returns:
+        list: 提交哈希列表
+    """
+    cmd = ['git', '-C', repo_path, 'rev-list', *_history_options(max_count, since, until),
+           rev_range or 'HEAD']
+    with span('git rev-list', 'subprocess') as rev_list_span:
+        hashes = subprocess.check_output(cmd, stderr=subprocess.PIPE).decode('ascii').split()
+        rev_list_span.set(rows=len(hashes))
+    return hashes
+
+def write_commit_batches(commits, output_path, batch_size=STREAM_BATCH_SIZE, append=False,
+                         output_format=None, skip_hashes=None):
+    """
+    分批将提交记录写入数据文件
+
+    先写入同目录下的临时文件，全部写完后再用 os.replace 替换数据文件；
+    中途出错（例如 git 异常退出）时原数据文件保持不变，不会留下写了一半的数据。
+
+    Args:
+        commits (Iterable[dict]): 提交记录（可以是生成器）
+        output_path (str): 输出文件路径
+        batch_size (int): 每批写入的记录数
+        append (bool): 追加到已有文件末尾（不重复写表头）
+        output_format (str): 'csv'、'parquet' 或 'feather'，默认根据扩展名推断
+        skip_hashes (set): 不再写入的提交哈希（追加时避免重复）
+
+    Returns:
+        int: 写入的记录数
+    """
+    fmt = detect_format(output_path, output_format)
+    directory, name = os.path.split(os.path.abspath(str(output_path)))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'.{name}.partial')
+    if append and os.path.exists(output_path):
+        shutil.copyfile(output_path, tmp_path)
+    batch = []
+    try:
+        with span('collect + write batches', 'collector') as write_span, \
+                CommitTableWriter(tmp_path, COMMIT_COLUMNS, fmt=fmt, append=append) as writer:
+            for commit in commits:
+                if skip_hashes and commit['hash'] in skip_hashes:
+                    continue
+                batch.append(commit)
+                if len(batch) >= batch_size:
+                    writer.write(batch)
+                    batch = []
+            writer.write(batch)
+            write_span.set(rows=writer.count)
+        os.replace(tmp_path, str(output_path))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return writer.count
+
+def collect_commit_data_streaming(repo_path, output_path, batch_size=STREAM_BATCH_SIZE,
+                                  rev_range=None, max_count=None, since=None, until=None,
+                                  output_format=None, churn_path=None, find_renames=None):
+    """
+    流式模式：边读取 git log 边分批写盘，内存占用有上界
+
+    Args:
+        repo_path (str): 仓库路径
+        output_path (str): 输出文件路径（.csv / .parquet / .feather）
+        batch_size (int): 每批写入的提交数
+        rev_range, max_count, since, until: 历史范围，见 iter_git_log_commits
+        output_format (str): 存储格式，默认根据扩展名推断
+        churn_path (str): 逐文件变更表的保存路径（.npz），None 表示不保存
+        find_renames (int): 重命名检测的相似度阈值（百分比），None 表示不检测
+
+    Returns:
+        int: 收集的提交数
+    """
+    print(f"🔍 正在分析仓库: {os.path.abspath(repo_path)}")
+    print("📊 流式获取提交历史数据...")
+    file_changes = FileChangeTable() if churn_path else None
+    commits = tqdm(
+        iter_git_log_commits(repo_path, rev_range, max_count, since, until,
+                             file_changes=file_changes, find_renames=find_renames),
+        desc="处理提交", unit="commit"
+    )
+    try:
+        total = write_commit_batches(commits, output_path, batch_size=batch_size,
+                                     output_format=output_format)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ git 命令执行失败: {e}")
+        print(f"错误输出: {e.output.decode('utf-8', errors='ignore')}")
+        raise
+
+    print(f"\n✅ 成功收集 {total} 条提交记录!")
+    print(f"💾 数据已保存至: {os.path.abspath(output_path)}")
+    if file_changes is not None:
+        _save_file_changes(file_changes, churn_path)
+    return total
+
+def _save_file_changes(file_changes, churn_path):
+    """保存逐文件变更表"""
+    file_changes.save(churn_path)
+    print(f"🗂️  逐文件变更 {len(file_changes)} 条（{len(file_changes.paths)} 个文件）已保存至: "
+          f"{os.path.abspath(churn_path)}")
+
+def _watermark_path(output_path):
+    """水位线文件与数据文件放在一起"""
+    return f"{output_path}.watermark.json"
+
+def read_watermark(output_path):
+    """
+    读取上次收集到的最新提交哈希
+
+    优先读取水位线文件；没有时退回到数据文件第一行（git log 按时间倒序输出）。
+
+    Returns:
+        str | None: 提交哈希，无法确定时返回 None
+    """
+    state_file = _watermark_path(output_path)
+    if os.path.exists(state_file):
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('hash') or None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 水位线文件损坏，忽略: {e}")
+
+    if not os.path.exists(output_path):
+        return None
+    try:
+        if 'hash' not in read_columns(output_path):
+            return None
+        hashes = load_commit_table(output_path, columns=['hash'])['hash']
+    except (OSError, ValueError):
+        return None
+    return str(hashes.iloc[0]) if len(hashes) else None
+
+def write_watermark(output_path, commit_hash):
+    """记录最新收集到的提交哈希（先写临时文件再替换，不会留下损坏的水位线）"""
+    state_file = _watermark_path(output_path)
+    with open(f"{state_file}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({
+            'hash': commit_hash,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(f"{state_file}.tmp", state_file)
+
+def _is_reachable(repo_path, commit_hash, head='HEAD'):
+    """
+    判断提交是否仍存在且是 HEAD 的祖先
+
+    强制推送或历史重写后，旧的水位线可能已不存在或不再位于当前分支上。
+    """
+    exists = subprocess.run(
+        ['git', '-C', repo_path, 'cat-file', '-e', f'{commit_hash}^{{commit}}'],
+        capture_output=True
+    )
+    if exists.returncode != 0:
+        return False
+    ancestor = subprocess.run(
+        ['git', '-C', repo_path, 'merge-base', '--is-ancestor', commit_hash, head],
+        capture_output=True
+    )
+    return ancestor.returncode == 0
+
+def _is_compatible_dataset(output_path):
+    """已有数据文件的列是否与当前格式兼容，可以直接追加"""
+    columns = read_columns(output_path)
+    if detect_format(output_path) == 'csv':
+        # CSV 按列位置追加，必须完全一致
+        return columns == COMMIT_COLUMNS
+    return set(COMMIT_COLUMNS) <= set(columns)
+
+def collect_commit_data_incremental(repo_path, output_path, batch_size=STREAM_BATCH_SIZE):
+    """
+    增量模式：只收集水位线之后的新提交并追加到已有数据文件
+
+    没有水位线、数据文件格式不兼容或水位线已不可达（强制推送）时，
+    自动退回全量收集。新提交追加在文件末尾，行顺序不再严格按时间倒序。
+    数据先写入临时文件，收集成功后才替换数据文件并移动水位线，git 中途失败时数据保持不变。
+
+    Args:
+        repo_path (str): 仓库路径
+        output_path (str): 输出文件路径（.csv / .parquet / .feather）
+        batch_size (int): 每批写入的提交数
+
+    Returns:
+        int: 本次新收集的提交数
+    """
+    print(f"🔍 正在分析仓库: {os.path.abspath(repo_path)}")
+    watermark = read_watermark(output_path)
+    full_reason = None
+    if watermark is None or not os.path.exists(output_path):
+        full_reason = "没有可用的水位线"
+    elif not _is_compatible_dataset(output_path):
+        full_reason = "已有数据文件的列与当前格式不一致"
+    elif not _is_reachable(repo_path, watermark):
+        full_reason = f"水位线 {watermark[:7]} 已不在当前历史中（可能发生了强制推送）"
+
+    newest = []
+
+    def track_newest(commits):
+        for commit in commits:
+            if not newest:
+                newest.append(commit['hash'])
+            yield commit
+
+    try:
+        if full_reason:
+            print(f"🟡 {full_reason}，执行全量收集...")
+            commits = track_newest(iter_git_log_commits(repo_path))
+            total = write_commit_batches(
+                tqdm(commits, desc="处理提交", unit="commit"), output_path, batch_size=batch_size
+            )
+        else:
+            print(f"📊 增量收集 {watermark[:7]}..HEAD 的新提交...")
+            # 数据文件替换后、水位线写入前进程退出时，下次会重新收集同一批提交，按哈希去重
+            existing = set(load_commit_table(output_path, columns=['hash'])['hash'].astype(str))
+            commits = track_newest(iter_git_log_commits(repo_path, f'{watermark}..HEAD'))
+            total = write_commit_batches(
+                tqdm(commits, desc="处理提交", unit="commit"), output_path,
+                batch_size=batch_size, append=True, skip_hashes=existing
+            )
+    except subprocess.CalledProcessError as e:
+        print(f"❌ git 命令执行失败: {e}")
+        print(f"错误输出: {e.output.decode('utf-8', errors='ignore')}")
+        raise
+
+    if newest:
+        write_watermark(output_path, newest[0])
+    elif full_reason is None:
+        # 保证水位线文件存在，下次无需再从数据文件推断
+        write_watermark(output_path, watermark)
+
+    print(f"\n✅ 新收集 {total} 条提交记录!")
+    print(f"💾 数据已保存至: {os.path.abspath(output_path)}")
+    return total
+
+def collect_commit_data_robust(repo_path, output_path, rev_range=None, max_count=None,
+                               since=None, until=None, churn_path=None, find_renames=None,
+                               output_format=None):
     """
     健壮的提交数据收集函数，处理浅层克隆限制
+
+    默认收集完整历史；可通过修订范围、提交数上限或时间窗口缩小范围。
+
+    Args:
+        repo_path (str): 仓库路径
+        output_path (str): 输出文件路径（.csv / .parquet / .feather）
+        rev_range (str): 修订范围，例如 "v2.30.0..HEAD"
+        max_count (int): 最多收集的提交数，None 表示不限制
+        since (str): 起始时间，例如 "2024-01-01"
+        until (str): 截止时间
+        churn_path (str): 逐文件变更表的保存路径（.npz），None 表示不保存
+        find_renames (int): 重命名检测的相似度阈值（百分比），None 表示不检测
+        output_format (str): 存储格式，默认根据扩展名推断
     """
     print(f"🔍 正在分析仓库: {os.path.abspath(repo_path)}")
+    import git  # GitPython 只用于校验仓库路径，按需导入以缩短启动时间
     repo = git.Repo(repo_path)
     
     # 使用 git log 命令直接获取数据（比 commit.stats 更可靠）
     print("📊 获取提交历史数据...")
+    file_changes = FileChangeTable() if churn_path else None
     try:
-        log_output = subprocess.check_output([
-            'git', '-C', repo_path, 'log', '--format=%H|%an|%ad|%s', 
-            '--date=iso', '--numstat', '--no-renames', '-n', '1128'
-        ], stderr=subprocess.STDOUT).decode('utf-8', errors='ignore')
+        with span('collect', 'collector') as collect_span:
+            commits = list(tqdm(
+                iter_git_log_commits(repo_path, rev_range, max_count, since, until,
+                                     file_changes=file_changes, find_renames=find_renames),
+                desc="处理提交", unit="commit"
+            ))
+            collect_span.set(rows=len(commits))
     except subprocess.CalledProcessError as e:
         print(f"❌ git 命令执行失败: {e}")
         print(f"错误输出: {e.output.decode('utf-8', errors='ignore')}")
         raise
     
-    # 解析 git log 输出
-    commits = []
-    current_commit = {}
-    file_changes = []
-    
-    for line in tqdm(log_output.split('\n'), desc="处理提交"):
-        if not line.strip():
-            continue
-            
-        # 提交行: hash|author|date|message
-        if '|' in line and not '\t' in line and len(line.split('|')) >= 4:
-            if current_commit and 'hash' in current_commit:
-                # 计算统计信息
-                current_commit['lines_added'] = sum(fc['added'] for fc in file_changes)
-                current_commit['lines_deleted'] = sum(fc['deleted'] for fc in file_changes)
-                current_commit['files_changed'] = len(file_changes)
-                commits.append(current_commit)
-            
-            parts = line.strip().split('|')
-            current_commit = {
-                'hash': parts[0],
-                'commit_hash': parts[0][:7],
-                'author': parts[1],
-                'date': parts[2].replace(' +0000', ''),  # 移除时区
-                'message': parts[3][:80] if len(parts) > 3 else "无提交信息"
-            }
-            file_changes = []
-        
-        # 文件变更行: added deleted filename
-        elif '\t' in line:
-            parts = line.strip().split('\t')
-            if len(parts) >= 3 and parts[0] and parts[1]:
-                try:
-                    # 处理二进制文件或重命名情况
-                    if parts[0] == '-' or parts[1] == '-':
-                        added = 0
-                        deleted = 0
-                    else:
-                        added = int(parts[0]) if parts[0].isdigit() else 0
-                        deleted = int(parts[1]) if parts[1].isdigit() else 0
-                    
-                    file_changes.append({
-                        'added': added,
-                        'deleted': deleted,
-                        'filename': parts[2]
-                    })
-                except (ValueError, IndexError):
-                    # 跳过无法解析的行
-                    continue
-    
-    # 处理最后一个提交
-    if current_commit and 'hash' in current_commit:
-        current_commit['lines_added'] = sum(fc['added'] for fc in file_changes)
-        current_commit['lines_deleted'] = sum(fc['deleted'] for fc in file_changes)
-        current_commit['files_changed'] = len(file_changes)
-        commits.append(current_commit)
-    
     print(f"\n✅ 成功收集 {len(commits)} 条提交记录!")
     
     # 创建DataFrame
-    df = pd.DataFrame(commits)
+    df = pd.DataFrame(commits, columns=COMMIT_COLUMNS)
     
     # 保存数据
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    with span('save commit table', 'io', rows=len(df)):
+        save_commit_table(df, output_path, output_format)
     print(f"💾 数据已保存至: {os.path.abspath(output_path)}")
+    if file_changes is not None:
+        _save_file_changes(file_changes, churn_path)
     
     return df
 
-def collect_commit_data_safe(repo_path, output_path):
+def benchmark_rename_detection(repo_path, thresholds=(DEFAULT_RENAME_THRESHOLD,), rev_range=None,
+                               max_count=None, since=None, until=None, repeat=1):
+    """
+    比较重命名检测模式与 --no-renames 模式的耗时与统计差异
+
+    Args:
+        repo_path (str): 仓库路径
+        thresholds (Iterable[int]): 要测试的相似度阈值（百分比）
+        rev_range, max_count, since, until: 历史范围，见 iter_git_log_commits
+        repeat (int): 每种模式运行的次数，耗时取最小值
+
+    Returns:
+        pd.DataFrame: 每种模式一行，含 mode、seconds、overhead（相对 --no-renames 的耗时比）、
+        commits、renames、lines_added、lines_deleted
+    """
+    rows = []
+    for threshold in [None, *thresholds]:
+        timings = []
+        for _ in range(max(1, repeat)):
+            file_changes = FileChangeTable()
+            start = time.perf_counter()
+            commits = list(iter_git_log_commits(repo_path, rev_range, max_count, since, until,
+                                                file_changes=file_changes, find_renames=threshold))
+            timings.append(time.perf_counter() - start)
+        rows.append({
+            'mode': f'find-renames={int(threshold)}%' if threshold else 'no-renames',
+            'seconds': round(min(timings), 3),
+            'commits': len(commits),
+            'renames': int((file_changes.arrays()['old_path'] >= 0).sum()),
+            'lines_added': sum(c['lines_added'] for c in commits),
+            'lines_deleted': sum(c['lines_deleted'] for c in commits),
+        })
+    result = pd.DataFrame(rows, columns=['mode', 'seconds', 'overhead', 'commits', 'renames',
+                                         'lines_added', 'lines_deleted'])
+    baseline = result['seconds'].iloc[0]
+    result['overhead'] = (result['seconds'] / baseline).round(2) if baseline > 0 else float('nan')
+    print("\n⏱️ 重命名检测开销:")
+    for row in result.itertuples():
+        print(f"   {row.mode:<20} {row.seconds:>8.3f} 秒 (x{row.overhead}), {row.renames} 个重命名, "
+              f"+{row.lines_added} / -{row.lines_deleted}")
+    return result
+
+def _split_evenly(items, shards):
+    """把列表切成 shards 段连续、互不重叠的分片"""
+    shards = max(1, min(shards, len(items)))
+    size, extra = divmod(len(items), shards)
+    chunks, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+def _date_buckets(repo_path, shards, rev_range=None, max_count=None, since=None, until=None):
+    """
+    按提交时间把历史切成互不重叠的提交分组
+
+    先用一个 git log 列出范围内全部提交的哈希与提交时间，再按提交时间的分位点分组，
+    使每组的提交数大致相同。分组是哈希列表而不是 --since/--until 时间窗口：
+    git 遇到早于 --since 的提交就停止遍历，提交时间不单调（rebase、cherry-pick、时钟偏差）时，
+    只能经由较早提交到达的提交会被所有时间窗口漏掉。
+
+    Returns:
+        tuple: (范围内全部提交哈希，git log 顺序；[(起始时间, 截止时间, 哈希列表), ...])，
+        分组按时间从新到旧排列，组内保持 git log 顺序
+    """
+    cmd = ['git', '-C', repo_path, 'log', '--format=%H %ct', *_history_options(max_count, since, until)]
+    if rev_range:
+        cmd.append(rev_range)
+    with span('git log', 'subprocess') as log_span:
+        entries = [(h, int(t)) for h, t in
+                   (line.split() for line in subprocess.check_output(cmd).decode('ascii').splitlines())]
+        log_span.set(rows=len(entries))
+    hashes = [h for h, _ in entries]
+    by_time = sorted(range(len(entries)), key=lambda i: (entries[i][1], -i))
+    buckets = []
+    for chunk in _split_evenly(by_time, shards):
+        if chunk:
+            buckets.append((entries[chunk[0]][1], entries[chunk[-1]][1],
+                            [hashes[i] for i in sorted(chunk)]))
+    return hashes, buckets[::-1]
+
+def _collect_shard(task):
+    """
+    进程池任务：收集一个分片的提交
+
+    Args:
+        task (tuple): (分片序号, 仓库路径, 提交哈希列表)
+
+    Returns:
+        tuple: (分片序号, 提交记录列表, 耗时秒数)
+    """
+    index, repo_path, hashes = task
+    start = time.perf_counter()
+    commits = list(iter_git_log_commit_list(repo_path, hashes))
+    return index, commits, time.perf_counter() - start
+
+def collect_commit_data_parallel(repo_path, output_path, workers=None, shards=None,
+                                 shard_by='commits', rev_range=None, max_count=None,
+                                 since=None, until=None, output_format=None):
+    """
+    并行模式：把历史切成互不重叠的分片，在进程池中各自运行 git log --numstat
+
+    按 commits 切分时先用 git rev-list 列出全部提交再均分；按 date 切分时按提交时间的分位点
+    把提交分组（见 _date_buckets）。两种方式的分片都是哈希列表，通过 git log --stdin 收集，
+    合并后与健壮模式的提交与顺序一致。输出格式与 collect_commit_data_robust 相同。
+
+    Args:
+        repo_path (str): 仓库路径
+        output_path (str): 输出文件路径（.csv / .parquet / .feather）
+        workers (int): 进程数，默认为 CPU 核数
+        shards (int): 分片数，默认与进程数相同
+        shard_by (str): 'commits' 或 'date'
+        rev_range, max_count, since, until: 历史范围，见 iter_git_log_commits
+        output_format (str): 存储格式，默认根据扩展名推断
+
+    Returns:
+        pd.DataFrame: 包含提交数据的DataFrame，df.attrs['shard_timings'] 为各分片耗时
+    """
+    if shard_by not in ('commits', 'date'):
+        raise ValueError(f"不支持的分片方式: {shard_by}")
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers
+
+    print(f"🔍 正在分析仓库: {os.path.abspath(repo_path)}")
+    print(f"📊 并行获取提交历史数据 ({workers} 进程, {shards} 分片, 按 {shard_by} 切分)...")
+    total_start = time.perf_counter()
+    if shard_by == 'commits':
+        hashes = list_commit_hashes(repo_path, rev_range, max_count, since, until)
+        chunks = _split_evenly(hashes, shards)
+    else:
+        hashes, buckets = _date_buckets(repo_path, shards, rev_range, max_count, since, until)
+        chunks = [bucket for _, _, bucket in buckets]
+    tasks = [(i, repo_path, chunk) for i, chunk in enumerate(chunks) if chunk]
+
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_collect_shard, task) for task in tasks]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="处理分片"):
+                index, commits, elapsed = future.result()
+                results[index] = (commits, elapsed)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ git 命令执行失败: {e}")
+        print(f"错误输出: {e.output.decode('utf-8', errors='ignore')}")
+        raise
+
+    # 按分片顺序合并；按时间分组时恢复 git log 顺序
+    commits, shard_timings = [], []
+    for index in sorted(results):
+        shard_commits, elapsed = results[index]
+        commits.extend(shard_commits)
+        shard_timings.append({'shard': index, 'commits': len(shard_commits),
+                              'seconds': round(elapsed, 3)})
+    if shard_by == 'date':
+        positions = {h: i for i, h in enumerate(hashes)}
+        commits.sort(key=lambda commit: positions[commit['hash']])
+
+    print("\n⏱️ 分片耗时:")
+    for timing in shard_timings:
+        print(f"   分片 {timing['shard']:>3}: {timing['commits']:>8} 个提交, {timing['seconds']:.3f} 秒")
+    print(f"   总耗时: {time.perf_counter() - total_start:.3f} 秒")
+    print(f"\n✅ 成功收集 {len(commits)} 条提交记录!")
+
+    df = pd.DataFrame(commits, columns=COMMIT_COLUMNS)
+    df.attrs['shard_timings'] = shard_timings
+
+    save_commit_table(df, output_path, output_format)
+    print(f"💾 数据已保存至: {os.path.abspath(output_path)}")
+
+    return df
+
+# 安全模式使用提交时间戳（committer date，与 GitPython 的 committed_date 一致）加提交者时区
+SAFE_LOG_FORMAT = '%H|%an|%ct %ci|%s'
+# %ci 末尾的时区；历史中可能有格式错误的时区（fetch.fsck.badTimezone），此时按 UTC 处理
+SAFE_OFFSET_RE = re.compile(r' ([+-])(\d{2})(\d{2})$')
+# 安全模式输出的列顺序
+SAFE_COLUMNS = ['commit_hash', 'author', 'date', 'message',
+                'lines_added', 'lines_deleted', 'files_changed']
+
+def _to_safe_record(record):
+    """
+    把 git log 记录转换为安全模式的输出格式
+
+    日期由时间戳换算到提交者时区并带上 "+HHMM"，与健壮模式一样不依赖收集机器的时区。
+    """
+    timestamp, _, iso_date = record['date'].partition(' ')
+    minutes = 0
+    match = SAFE_OFFSET_RE.search(iso_date)
+    if match and int(match.group(2)) <= 14 and int(match.group(3)) < 60:
+        minutes = int(match.group(2)) * 60 + int(match.group(3))
+        minutes = minutes if match.group(1) == '+' else -minutes
+    commit_time = datetime.fromtimestamp(int(timestamp), timezone(timedelta(minutes=minutes)))
+    return {
+        'commit_hash': record['commit_hash'],
+        'author': record['author'],
+        'date': commit_time.strftime('%Y-%m-%d %H:%M:%S %z'),
+        'message': record['message'],
+        'lines_added': record['lines_added'],
+        'lines_deleted': record['lines_deleted'],
+        'files_changed': record['files_changed']
+    }
+
+def collect_commit_data_safe(repo_path, output_path, rev_range=None, max_count=None,
+                             since=None, until=None, output_format=None):
     """
     安全模式：跳过有问题的提交
+
+    先用 git rev-list 列出提交，再通过一个 git log --stdin 进程流式获取统计。
+    git 在某个提交上出错退出时，只跳过该提交，并从下一个提交继续启动新的进程，
+    因此子进程数量与出错提交数成正比，而不是与提交总数成正比。
+
+    历史范围与存储格式参数与 collect_commit_data_robust 相同，默认收集完整历史。
     """
     print(f"🔍 正在分析仓库: {os.path.abspath(repo_path)}")
+    import git  # GitPython 只用于校验仓库路径，按需导入以缩短启动时间
     repo = git.Repo(repo_path)
-    commits = list(repo.iter_commits('main', max_count=1128))
-    
-    data = []
-    skipped = 0
+    hashes = list_commit_hashes(repo_path, rev_range, max_count, since, until)
     
     print("收集提交数据中 (安全模式)...")
-    for i, commit in enumerate(tqdm(commits, desc="处理提交"), 1):
-        try:
-            # 尝试获取统计信息
-            try:
-                stats = commit.stats
-                insertions = stats.total['insertions']
-                deletions = stats.total['deletions']
-                files_changed = stats.total['files']
-            except Exception as e:
-                # 备用方法：使用 git 命令获取统计
-                stats_output = repo.git.show(commit.hexsha, '--numstat', '--format=')
-                lines = stats_output.strip().split('\n')
-                insertions = 0
-                deletions = 0
-                files_changed = 0
-                
-                for line in lines:
-                    if not line.strip():
-                        continue
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        try:
-                            if parts[0] != '-':
-                                insertions += int(parts[0])
-                            if parts[1] != '-':
-                                deletions += int(parts[1])
-                            files_changed += 1
-                        except ValueError:
-                            continue
-            
-            # 转换日期
-            commit_time = datetime.fromtimestamp(commit.committed_date).strftime('%Y-%m-%d %H:%M:%S')
-            
-            data.append({
-                'commit_hash': commit.hexsha[:7],
-                'author': commit.author.name,
-                'date': commit_time,
-                'message': commit.message.strip().split('\n')[0][:80],
-                'lines_added': insertions,
-                'lines_deleted': deletions,
-                'files_changed': files_changed
-            })
-        except Exception as e:
-            skipped += 1
-            if skipped <= 5:  # 只显示前5个错误
-                print(f"⚠️ 跳过提交 {commit.hexsha[:7]}: {str(e)}")
-            continue
+    data, skipped = collect_commits_skipping_errors(repo_path, hashes)
     
     if skipped > 0:
         print(f"🟡 跳过了 {skipped} 个有问题的提交")
@@ -173,28 +764,220 @@ def collect_commit_data_safe(repo_path, output_path):
     print(f"\n✅ 成功收集 {len(data)} 条提交记录!")
     
     # 创建DataFrame
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(data, columns=SAFE_COLUMNS)
     
     # 保存数据
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    with span('save commit table', 'io', rows=len(df)):
+        save_commit_table(df, output_path, output_format)
     print(f"💾 数据已保存至: {os.path.abspath(output_path)}")
     
     return df
 
-if __name__ == "__main__":
-    # 配置路径
-    REPO_PATH = "data/repos/requests"  # 从项目根目录运行
-    OUTPUT_PATH = "data/processed/requests_commits.csv"
+def collect_commits_skipping_errors(repo_path, hashes, log_format=SAFE_LOG_FORMAT, convert=_to_safe_record):
+    """
+    逐段收集一组提交，git 出错时只跳过出错的提交
+
+    通过一个 git log --stdin 进程流式获取统计；git 在某个提交上出错退出时，
+    跳过该提交并从下一个提交继续启动新的进程，子进程数量与出错提交数成正比。
+
+    Args:
+        repo_path (str): 仓库路径
+        hashes (list): 提交哈希列表
+        log_format (str): git log 的 --format 格式，字段顺序须为 hash|author|date|message
+        convert (callable): 把 git log 记录转换为输出记录，抛出异常的记录同样跳过
+
+    Returns:
+        tuple: (输出记录列表, 跳过的提交数)
+    """
+    positions = {h: i for i, h in enumerate(hashes)}
+    data = []
+    skipped = 0
     
-    # 选择收集方法
-    print("="*50)
-    print("选择数据收集方法:")
-    print("1. 健壮模式 (推荐) - 使用 git log 命令，最可靠")
-    print("2. 安全模式 - 跳过有问题的提交")
-    choice = input("请选择 (1/2): ").strip() or "1"
+    def skip(commit_hash, error):
+        nonlocal skipped
+        skipped += 1
+        if skipped <= 5:  # 只显示前5个错误
+            print(f"⚠️ 跳过提交 {commit_hash[:7]}: {str(error).strip()}")
+
+    def accept(record):
+        try:
+            data.append(convert(record))
+        except Exception as e:
+            skip(record['hash'], e)
+        progress.update(1)
+        return positions.get(record['hash'], -1) + 1
     
-    if choice == "1":
-        collect_commit_data_robust(REPO_PATH, OUTPUT_PATH)
+    progress = tqdm(total=len(hashes), desc="处理提交")
+    pos = 0
+    while pos < len(hashes):
+        # 最近一条记录延迟一步再接收：git 出错时它可能只输出了一半
+        held = None
+        try:
+            for record in iter_git_log_commit_list(repo_path, hashes[pos:], log_format):
+                if held is not None:
+                    pos = max(pos, accept(held))
+                held = record
+            if held is not None:
+                pos = max(pos, accept(held))
+            break
+        except subprocess.CalledProcessError as e:
+            error = e.output.decode('utf-8', errors='ignore') or e
+            if held is None:
+                # 第一个提交就失败：跳过它
+                skip(hashes[pos], error)
+                progress.update(1)
+                pos += 1
+                continue
+            # 单独重试可疑的那条记录
+            try:
+                retried = list(iter_git_log_commit_list(repo_path, [held['hash']], log_format))
+                pos = max(pos, accept(retried[0]))
+            except (subprocess.CalledProcessError, IndexError) as retry_error:
+                skip(held['hash'], retry_error)
+                progress.update(1)
+                pos = max(pos, positions.get(held['hash'], pos) + 1)
+    progress.close()
+    return data, skipped
+
+# collect_commits 支持的收集模式；auto 为健壮模式，并在每个范围出错时退回安全模式
+COLLECTION_MODES = ('auto', 'robust', 'safe', 'incremental', 'streaming', 'parallel')
+
+def _range_label(rev_range=None, since=None, until=None):
+    """范围的可读描述，例如 "v1.0..HEAD --since=@1700000000" """
+    parts = [rev_range or 'HEAD']
+    parts += [f'--since={since}'] if since else []
+    parts += [f'--until={until}'] if until else []
+    return ' '.join(parts)
+
+def collect_commit_range(repo_path, rev_range=None, max_count=None, since=None, until=None, fallback=True,
+                         hashes=None, label=None):
+    """
+    收集一个范围的提交：先用健壮模式（一个 git log 进程），git 出错时退回安全模式
+
+    安全模式只重新收集这个范围，并且只跳过 git 无法输出的提交；
+    两种方式输出的记录格式相同（与 COMMIT_COLUMNS 对应），可以直接合并。
+
+    Args:
+        repo_path (str): 仓库路径
+        rev_range, max_count, since, until: 历史范围，见 iter_git_log_commits
+        fallback (bool): False 时 git 出错直接抛出异常
+        hashes (list): 只收集这些提交（git log --stdin），此时忽略历史范围参数
+        label (str): 范围的可读描述，默认由历史范围生成
+
+    Returns:
+        tuple: (提交记录列表, 范围信息 dict：range、mode、commits、skipped、seconds、error)
+    """
+    label = label or _range_label(rev_range, since, until)
+    info = {'range': label, 'mode': 'robust', 'commits': 0, 'skipped': 0, 'seconds': 0.0, 'error': None}
+    start = time.perf_counter()
+    with span('collect range', 'collector', range=label) as range_span:
+        try:
+            if hashes is not None:
+                commits = list(iter_git_log_commit_list(repo_path, hashes))
+            else:
+                commits = list(iter_git_log_commits(repo_path, rev_range, max_count, since, until))
+        except subprocess.CalledProcessError as e:
+            if not fallback:
+                raise
+            info['error'] = (e.output or b'').decode('utf-8', errors='ignore').strip() or str(e)
+            print(f"🟡 范围 {label} 的 git log 失败，改用安全模式: {info['error']}")
+            info['mode'] = 'safe'
+            if hashes is None:
+                hashes = list_commit_hashes(repo_path, rev_range, max_count, since, until)
+            commits, info['skipped'] = collect_commits_skipping_errors(
+                repo_path, hashes, log_format=GIT_LOG_FORMAT, convert=dict)
+        info['commits'] = len(commits)
+        info['seconds'] = round(time.perf_counter() - start, 3)
+        range_span.set(rows=len(commits), mode=info['mode'], skipped=info['skipped'])
+    return commits, info
+
+def collect_commits(repo_path, output_path, mode='auto', rev_range=None, max_count=None, since=None,
+                    until=None, ranges=None, windows=None, output_format=None):
+    """
+    非交互的收集入口：显式给出仓库、输出、历史范围、收集模式与存储格式
+
+    auto 模式按范围逐个收集（见 collect_commit_range），某个范围的 git 输出出错时
+    只有这个范围退回安全模式，其余范围仍使用一个 git log 进程；
+    多个范围的结果按给定顺序合并，并按哈希去重。其他模式直接调用对应的收集函数。
+
+    Args:
+        repo_path (str): 仓库路径
+        output_path (str): 输出文件路径（.csv / .parquet / .feather）
+        mode (str): COLLECTION_MODES 之一
+        rev_range, max_count, since, until: 历史范围，见 iter_git_log_commits
+        ranges (list): auto 模式下分别收集的多个修订范围，例如 ["v1.0..v2.0", "v2.0..HEAD"]，
+            与 rev_range 互斥
+        windows (int): auto 模式下按提交时间把历史切成的窗口数（每个窗口独立退回安全模式）
+        output_format (str): 存储格式，默认根据扩展名推断
+
+    Returns:
+        pd.DataFrame | int: auto / robust / safe / parallel 模式返回提交数据
+        （auto 模式的 df.attrs['ranges'] 为各范围的收集方式与耗时），
+        incremental / streaming 模式返回写入的提交数
+    """
+    if mode not in COLLECTION_MODES:
+        raise ValueError(f"不支持的收集模式: {mode}")
+    output_format = detect_format(output_path, output_format)
+    history = {'rev_range': rev_range, 'max_count': max_count, 'since': since, 'until': until}
+    if mode != 'auto' and (ranges or windows):
+        raise ValueError("只有 auto 模式支持 ranges / windows")
+    if ranges and rev_range:
+        raise ValueError("ranges 与 rev_range 不能同时指定")
+
+    if mode == 'incremental':
+        if any(value is not None for value in history.values()):
+            raise ValueError("增量模式总是收集水位线之后的全部新提交，不支持历史范围参数")
+        if output_format != detect_format(output_path):
+            raise ValueError("增量模式的存储格式由输出文件扩展名决定")
+        return collect_commit_data_incremental(repo_path, output_path)
+    if mode != 'auto':
+        collector = {
+            'robust': collect_commit_data_robust,
+            'safe': collect_commit_data_safe,
+            'streaming': collect_commit_data_streaming,
+            'parallel': collect_commit_data_parallel,
+        }[mode]
+        return collector(repo_path, output_path, output_format=output_format, **history)
+
+    print(f"🔍 正在分析仓库: {os.path.abspath(repo_path)}")
+    if windows:
+        hashes, buckets = _date_buckets(repo_path, windows, rev_range, max_count, since, until)
+        tasks = [{'hashes': bucket, 'label': f"{_range_label(rev_range)} 提交时间 @{start}..@{end}"}
+                 for start, end, bucket in buckets]
     else:
-        collect_commit_data_safe(REPO_PATH, OUTPUT_PATH)
\ No newline at end of file
+        tasks = [{'rev_range': item, 'max_count': max_count, 'since': since, 'until': until}
+                 for item in (ranges or [rev_range])]
+
+    commits, seen, range_info = [], set(), []
+    for task in tasks:
+        range_commits, info = collect_commit_range(repo_path, **task)
+        for commit in range_commits:
+            if commit['hash'] not in seen:
+                seen.add(commit['hash'])
+                commits.append(commit)
+        range_info.append(info)
+        print(f"   {info['range']}: {info['commits']} 个提交 ({info['mode']}, {info['seconds']:.3f} 秒)")
+    if windows:
+        positions = {h: i for i, h in enumerate(hashes)}
+        commits.sort(key=lambda commit: positions[commit['hash']])
+
+    fallbacks = sum(info['mode'] == 'safe' for info in range_info)
+    if fallbacks:
+        print(f"🟡 {fallbacks}/{len(range_info)} 个范围退回了安全模式，"
+              f"共跳过 {sum(info['skipped'] for info in range_info)} 个提交")
+    print(f"\n✅ 成功收集 {len(commits)} 条提交记录!")
+
+    df = pd.DataFrame(commits, columns=COMMIT_COLUMNS)
+    df.attrs['ranges'] = range_info
+    with span('save commit table', 'io', rows=len(df)):
+        save_commit_table(df, output_path, output_format)
+    print(f"💾 数据已保存至: {os.path.abspath(output_path)}")
+    return df
+
+if __name__ == "__main__":
+    # 命令行参数见 main.py 的 collect 子命令
+    try:
+        from src.main import main
+    except ImportError:
+        from main import main
+    sys.exit(main(['collect', *sys.argv[1:]]))
@@ -0,0 +1,281 @@
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+
+# 完整对象名（SHA-1 40 位 / SHA-256 64 位）
+FULL_SHA_RE = re.compile(r'^(?:[0-9a-f]{40}|[0-9a-f]{64})$')
+# diff-tree --stdin 会原样回显不是对象名的行，用作每个请求输出的结束标记
+DIFF_TREE_SENTINEL = b'#diff-tree-end'
+# 默认 LRU 缓存上限
+DEFAULT_CACHE_ENTRIES = 4096
+DEFAULT_CACHE_BYTES = 64 << 20
+
+class GitBackendError(RuntimeError):
+    """git 子进程意外退出或输出无法解析"""
+
+class LRUCache:
+    """按条目数与总字节数限制的 LRU 缓存"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        if key in self._items:
+            self.bytes -= self._items.pop(key)[1]
+        self._items[key] = (value, size)
+        self.bytes += size
+        while len(self._items) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.bytes -= evicted
+
+    def __len__(self):
+        return len(self._items)
+
+def _parse_raw_diff(payload):
+    """
+    解析 git diff-tree -r --raw -z 的输出
+
+    Returns:
+        list: 每个文件一条记录，含 status、score、old_mode、new_mode、old_sha、new_sha、
+        old_path、new_path（新增文件的 old_path、删除文件的 new_path 为 None）
+    """
+    # 两棵树比较时输出以 "<树> <树>\n" 开头
+    start = payload.find(b':')
+    if start < 0:
+        return []
+    fields = payload[start:].split(b'\0')
+    changes = []
+    i = 0
+    while i < len(fields) and fields[i].startswith(b':'):
+        old_mode, new_mode, old_sha, new_sha, status = fields[i][1:].decode('ascii').split(' ')
+        letter, score = status[0], int(status[1:]) if len(status) > 1 else None
+        paths = [fields[i + 1].decode('utf-8', errors='surrogateescape')]
+        i += 2
+        if letter in ('R', 'C'):
+            paths.append(fields[i].decode('utf-8', errors='surrogateescape'))
+            i += 1
+        else:
+            paths.append(paths[0])
+        changes.append({
+            'status': letter,
+            'score': score,
+            'old_mode': old_mode,
+            'new_mode': new_mode,
+            'old_sha': None if letter == 'A' else old_sha,
+            'new_sha': None if letter == 'D' else new_sha,
+            'old_path': None if letter == 'A' else paths[0],
+            'new_path': None if letter == 'D' else paths[1],
+        })
+    return changes
+
+class GitBackend:
+    """
+    长期运行的 git 对象访问层
+
+    保持一个 git cat-file --batch 进程和一个 git diff-tree --stdin 进程，
+    请求通过管道写入，批量请求时由写线程连续写入、主线程按顺序读取响应，
+    不需要为每个对象启动新进程。最近读取的对象保存在 LRU 缓存中。
+
+    对象是不可变的，因此按完整 SHA 缓存；"<修订>:<路径>" 形式的请求不缓存。
+    实例不是线程安全的，多进程使用时每个进程各自创建一个。
+    """
+
+    def __init__(self, repo_path, cache_entries=DEFAULT_CACHE_ENTRIES, cache_bytes=DEFAULT_CACHE_BYTES,
+                 find_renames=None):
+        """
+        Args:
+            repo_path (str): 仓库路径
+            cache_entries (int): 对象缓存的最大条目数
+            cache_bytes (int): 对象缓存的最大字节数
+            find_renames (int): diff_tree 的重命名相似度阈值（百分比），None 表示不检测重命名
+        """
+        self.repo_path = str(repo_path)
+        self.find_renames = find_renames
+        self.cache = LRUCache(cache_entries, cache_bytes)
+        self._cat_file = None
+        self._diff_tree = None
+
+    def _start(self, args):
+        return subprocess.Popen(['git', '-C', self.repo_path, *args],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _cat_file_proc(self):
+        if self._cat_file is None or self._cat_file.poll() is not None:
+            self._cat_file = self._start(['cat-file', '--batch'])
+        return self._cat_file
+
+    def _diff_tree_proc(self):
+        if self._diff_tree is None or self._diff_tree.poll() is not None:
+            renames = [f'--find-renames={int(self.find_renames)}%'] if self.find_renames else ['--no-renames']
+            self._diff_tree = self._start(['diff-tree', '--stdin', '--root', '-r', '--raw', '-z',
+                                           '--no-commit-id', *renames])
+        return self._diff_tree
+
+    @staticmethod
+    def _pipelined(proc, requests, read_one):
+        """由写线程连续写入全部请求，同时按顺序读取响应，避免管道缓冲区写满死锁"""
+        def write():
+            try:
+                proc.stdin.write(b''.join(requests))
+                proc.stdin.flush()
+            except (BrokenPipeError, OSError):
+                pass
+        if len(requests) == 1:
+            write()
+            return [read_one(proc)]
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        try:
+            return [read_one(proc) for _ in requests]
+        finally:
+            writer.join()
+
+    @staticmethod
+    def _read_object(proc):
+        header = proc.stdout.readline()
+        if not header:
+            raise GitBackendError("git cat-file 进程意外退出")
+        header = header.rstrip(b'\n')
+        # "<名称> missing" 或 "<名称> ambiguous"；名称中的路径可能含空格，不能按字段数判断
+        if header.endswith(b' missing') or header.endswith(b' ambiguous'):
+            return None
+        sha, kind, size = header.decode('utf-8', errors='replace').split(' ')
+        size = int(size)
+        data = proc.stdout.read(size)
+        proc.stdout.read(1)  # 对象内容后的换行
+        return sha, kind, data
+
+    def read_objects(self, names):
+        """
+        批量读取对象（一次往返，未命中缓存的请求连续写入 cat-file）
+
+        Args:
+            names (list): 对象名，完整 SHA 或 "<修订>:<路径>" 等 git 可解析的名称
+
+        Returns:
+            list: 与 names 对应的 (sha, 类型, 内容bytes)，对象不存在时为 None
+        """
+        results = [None] * len(names)
+        # 同一批中重复的名称只请求一次
+        pending = {}
+        for i, name in enumerate(names):
+            cached = self.cache.get(name) if FULL_SHA_RE.match(name) else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(name, []).append(i)
+        if not pending:
+            return results
+
+        requests = [f'{name}\n'.encode('utf-8') for name in pending]
+        objects = self._pipelined(self._cat_file_proc(), requests, self._read_object)
+        for positions, obj in zip(pending.values(), objects):
+            for i in positions:
+                results[i] = obj
+            if obj is not None:
+                self.cache.put(obj[0], obj, len(obj[2]))
+        return results
+
+    def read_object(self, name):
+        """
+        读取单个对象
+
+        Returns:
+            tuple: (sha, 类型, 内容bytes)
+
+        Raises:
+            KeyError: 对象不存在
+        """
+        obj = self.read_objects([name])[0]
+        if obj is None:
+            raise KeyError(name)
+        return obj
+
+    def read_blob(self, name):
+        """读取文件内容（blob），name 可以是 blob SHA 或 "<修订>:<路径>" """
+        sha, kind, data = self.read_object(name)
+        if kind != 'blob':
+            raise KeyError(f"{name} 不是 blob（类型 {kind}）")
+        return data
+
+    def read_blobs(self, names):
+        """批量读取文件内容，不存在的对象为 None"""
+        return [obj[2] if obj is not None and obj[1] == 'blob' else None for obj in self.read_objects(names)]
+
+    @staticmethod
+    def _read_diff(proc):
+        chunks = []
+        while True:
+            line = proc.stdout.readline()
+            if not line:
+                raise GitBackendError("git diff-tree 进程意外退出")
+            chunks.append(line)
+            if line.rstrip(b'\n').endswith(DIFF_TREE_SENTINEL):
+                break
+        payload = b''.join(chunks)
+        return _parse_raw_diff(payload[:payload.rfind(DIFF_TREE_SENTINEL)])
+
+    def diff_trees(self, requests):
+        """
+        批量获取文件级变更
+
+        Args:
+            requests (list): 完整的提交 SHA（与父提交比较，根提交与空树比较），
+                或 (旧树 SHA, 新树 SHA) 二元组；与 git log --numstat 一样，
+                合并提交不输出变更（结果为空列表），合并进来的改动由分支上的提交各自体现
+
+        Returns:
+            list: 与 requests 对应的变更列表，见 _parse_raw_diff
+        """
+        lines = []
+        for request in requests:
+            line = ' '.join(request) if isinstance(request, (tuple, list)) else request
+            lines.append(f'{line}\n'.encode('ascii') + DIFF_TREE_SENTINEL + b'\n')
+        return self._pipelined(self._diff_tree_proc(), lines, self._read_diff)
+
+    def diff_tree(self, commit, new_tree=None):
+        """
+        单个提交相对父提交的文件级变更（合并提交为空列表）；给出 new_tree 时 commit 视为旧树，比较两棵树
+        """
+        return self.diff_trees([(commit, new_tree) if new_tree else commit])[0]
+
+    def close(self):
+        """结束子进程"""
+        for proc in (self._cat_file, self._diff_tree):
+            if proc is None:
+                continue
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+        self._cat_file = self._diff_tree = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,325 @@
+import os
+import re
+import json
+import hashlib
+import subprocess
+import unicodedata
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pandas as pd
+
+# 缓存格式版本，结构变化时递增（旧缓存会被忽略）
+IDENTITY_CACHE_VERSION = 2
+# 不足以区分个人的名称 / 邮箱本地部分
+GENERIC_IDENTIFIERS = {
+    'root', 'admin', 'administrator', 'user', 'info', 'git', 'github', 'gitlab', 'noreply', 'dev',
+    'developer', 'test', 'mail', 'contact', 'support', 'bot', 'ci', 'build', 'unknown', 'none', 'localhost',
+}
+# GitHub 的隐私邮箱 "12345+user@users.noreply.github.com"
+NOREPLY_RE = re.compile(r'^(?:\d+\+)?([^@]+)@users\.noreply\.github\.com$')
+# 名称相似度阈值（SequenceMatcher.ratio），只在同一分块内比较
+NAME_SIMILARITY = 0.9
+# 名称分块内最多比较的身份数，避免常见前缀退化为全量两两比较
+MAX_BLOCK_SIZE = 50
+
+def normalize_name(name):
+    """名称归一化：去掉重音符号、转小写、只保留字母数字，分词后按字母序排列"""
+    text = unicodedata.normalize('NFKD', str(name or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return ' '.join(sorted(re.findall(r'[a-z0-9]+|[^\x00-\x7f]+', text)))
+
+def _compact(text):
+    return re.sub(r'[^a-z0-9]', '', text)
+
+def _email_local(email):
+    """
+    归一化的邮箱本地部分与是否为 GitHub 隐私邮箱
+
+    Returns:
+        tuple: (本地部分, 域名, 是否隐私邮箱)，不是邮箱时为 (None, None, False)
+    """
+    email = str(email or '').strip().lower()
+    if '@' not in email:
+        return None, None, False
+    noreply = NOREPLY_RE.match(email)
+    local, domain = email.split('@', 1)
+    local = noreply.group(1) if noreply else local.split('+', 1)[0]
+    return local, domain, bool(noreply)
+
+def blocking_keys(name, email):
+    """
+    身份的分块键：共享任一分块键的身份视为同一个人
+
+    只使用足以区分个人的键，单个词的名称（例如两个不同的 "Alex"）不会仅凭名称合并：
+    - 归一化的完整名称，至少两个词（"Doe, John" 与 "john doe" 相同）
+    - 归一化邮箱（忽略大小写与 "+标签"）
+    - 完整名称的紧凑形式（"John Doe" -> "compact:johndoe"），可与邮箱用户名匹配，见 handle_key
+    """
+    keys = []
+    normalized = normalize_name(name)
+    if ' ' in normalized:
+        keys.append(f'name:{normalized}')
+        compact_name = _compact(unicodedata.normalize('NFKD', str(name)).lower())
+        if len(compact_name) >= 4 and compact_name not in GENERIC_IDENTIFIERS:
+            keys.append(f'compact:{compact_name}')
+
+    local, domain, noreply = _email_local(email)
+    if local is not None and not noreply and _compact(local) not in GENERIC_IDENTIFIERS:
+        keys.append(f'email:{local}@{domain}')
+    return keys
+
+def handle_key(email):
+    """
+    邮箱用户名的紧凑形式（"john.doe@..." -> "compact:johndoe"）
+
+    只与完整名称的紧凑键匹配，两个用户名相同但邮箱不同的身份之间不会因此合并。
+
+    Returns:
+        str | None: 分块键，用户名过短或过于通用时为 None
+    """
+    local, _, _ = _email_local(email)
+    compact_local = _compact(local or '')
+    if len(compact_local) >= 4 and compact_local not in GENERIC_IDENTIFIERS:
+        return f'compact:{compact_local}'
+    return None
+
+def mailmap_digest(repo_path):
+    """仓库 .mailmap 的内容摘要，没有时为 None（变化后缓存的映射整体失效）"""
+    if not repo_path:
+        return None
+    path = Path(repo_path) / '.mailmap'
+    if not path.exists():
+        return None
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def _git_head(repo_path):
+    return subprocess.check_output(['git', '-C', str(repo_path), 'rev-parse', 'HEAD'],
+                                   stderr=subprocess.PIPE).decode('ascii').strip()
+
+def _is_ancestor(repo_path, commit, head):
+    result = subprocess.run(['git', '-C', str(repo_path), 'merge-base', '--is-ancestor', commit, head],
+                            capture_output=True)
+    return result.returncode == 0
+
+def read_git_identities(repo_path, rev='HEAD'):
+    """
+    读取提交作者的原始身份与 .mailmap 映射后的身份
+
+    Returns:
+        pd.DataFrame: raw_name、raw_email、name、email、commits
+    """
+    cmd = ['git', '-C', str(repo_path), 'log', '--format=%an%x00%ae%x00%aN%x00%aE', rev]
+    output = subprocess.check_output(cmd, stderr=subprocess.PIPE).decode('utf-8', errors='replace')
+    rows = [line.split('\0') for line in output.splitlines() if line.count('\0') == 3]
+    columns = ['raw_name', 'raw_email', 'name', 'email']
+    frame = pd.DataFrame(rows, columns=columns)
+    return frame.groupby(columns, sort=False).size().rename('commits').reset_index()
+
+class IdentityResolver:
+    """
+    增量的作者身份聚类
+
+    每个身份（名称, 邮箱）加入时只查找分块索引：共享精确分块键的身份直接合并，
+    名称前缀相同的身份再比较名称相似度，不做全量两两比较。
+    并查集、分块索引与身份列表都保存在缓存中，再次运行时只需处理新出现的身份。
+    """
+
+    def __init__(self, mailmap=None):
+        self.mailmap = mailmap
+        self.identities = {}
+        self.parent = {}
+        self.blocks = {}
+        self.handles = {}
+        self.prefixes = {}
+        # 上次读取的 git 身份表：{'head': 提交, 'rows': [...]}，HEAD 未变时不再运行 git log
+        self.git_log = None
+        # 超过 MAX_BLOCK_SIZE、只比较了部分候选的名称分块次数
+        self.truncated = 0
+
+    @staticmethod
+    def identity_id(name, email):
+        return f'{name} <{email}>'
+
+    def find(self, identity):
+        parent = self.parent
+        while parent[identity] != identity:
+            parent[identity] = parent[parent[identity]]
+            identity = parent[identity]
+        return identity
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 以字典序较小者为根，结果与加入顺序无关
+            ra, rb = sorted((ra, rb))
+            self.parent[rb] = ra
+
+    def add(self, name, email='', commits=1):
+        """
+        加入一个身份（已存在时只更新提交数）
+
+        Returns:
+            bool: 是否为新身份
+        """
+        identity = self.identity_id(name, email)
+        if identity in self.identities:
+            self.identities[identity][2] = int(commits)
+            return False
+        self.identities[identity] = [name, email, int(commits)]
+        self.parent[identity] = identity
+        for key in blocking_keys(name, email):
+            if key in self.blocks:
+                self.union(identity, self.blocks[key])
+            else:
+                self.blocks[key] = identity
+            # 先加入的、用户名与该完整名称匹配的身份
+            for other in self.handles.get(key, []):
+                self.union(identity, other)
+        handle = handle_key(email)
+        if handle:
+            self.handles.setdefault(handle, []).append(identity)
+            if handle in self.blocks:
+                self.union(identity, self.blocks[handle])
+
+        normalized = normalize_name(name)
+        if ' ' in normalized:
+            # 至少两个词的名称才做相似度比较（"bob" 与 "rob" 不应合并）
+            candidates = self.prefixes.setdefault(normalized[:3], [])
+            if len(candidates) > MAX_BLOCK_SIZE:
+                self.truncated += 1
+            for other in candidates[:MAX_BLOCK_SIZE]:
+                other_name = normalize_name(self.identities[other][0])
+                if SequenceMatcher(None, normalized, other_name).ratio() >= NAME_SIMILARITY:
+                    self.union(identity, other)
+            candidates.append(identity)
+        return True
+
+    def canonical_names(self):
+        """
+        Returns:
+            dict: 身份 -> 所在聚类中提交数最多的名称
+        """
+        best = {}
+        for identity, (name, _, commits) in self.identities.items():
+            root = self.find(identity)
+            # 提交数相同时取字典序较小的名称
+            candidate = (-commits, name)
+            if root not in best or candidate < best[root]:
+                best[root] = candidate
+        return {identity: best[self.find(identity)][1] for identity in self.identities}
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(str(tmp_path), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': IDENTITY_CACHE_VERSION,
+                'mailmap': self.mailmap,
+                'identities': self.identities,
+                'parent': self.parent,
+                'blocks': self.blocks,
+                'handles': self.handles,
+                'prefixes': self.prefixes,
+                'git_log': self.git_log,
+            }, f, ensure_ascii=False)
+        os.replace(str(tmp_path), str(path))
+
+    @classmethod
+    def load(cls, path, mailmap=None):
+        """
+        读取缓存；缓存不存在、损坏、版本不同或 .mailmap 已变化时返回空的解析器
+        （git 身份表按 .mailmap 映射，同样随之失效）
+        """
+        resolver = cls(mailmap)
+        if not path or not Path(path).exists():
+            return resolver
+        try:
+            with open(str(path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  作者身份缓存损坏，忽略: {str(e)}")
+            return resolver
+        if data.get('version') != IDENTITY_CACHE_VERSION or data.get('mailmap') != mailmap:
+            return resolver
+        resolver.identities = data['identities']
+        resolver.parent = data['parent']
+        resolver.blocks = data['blocks']
+        resolver.handles = data['handles']
+        resolver.prefixes = data['prefixes']
+        resolver.git_log = data.get('git_log')
+        return resolver
+
+def _cached_git_identities(repo_path, resolver):
+    """
+    读取 git 身份表，按 HEAD 缓存在解析器中
+
+    HEAD 未变化时直接使用缓存；缓存的 HEAD 是当前 HEAD 的祖先时只读取新提交并累加，
+    否则（强制推送等）重新读取完整历史。
+    """
+    columns = ['raw_name', 'raw_email', 'name', 'email']
+    head = _git_head(repo_path)
+    cached = resolver.git_log
+    if cached and cached['head'] == head:
+        return pd.DataFrame(cached['rows'], columns=columns + ['commits'])
+    if cached and _is_ancestor(repo_path, cached['head'], head):
+        new = read_git_identities(repo_path, f"{cached['head']}..{head}")
+        frame = pd.concat([pd.DataFrame(cached['rows'], columns=columns + ['commits']), new], ignore_index=True)
+        frame = frame.groupby(columns, sort=False)['commits'].sum().reset_index()
+    else:
+        frame = read_git_identities(repo_path, head)
+    resolver.git_log = {'head': head, 'rows': frame.values.tolist()}
+    return frame
+
+def resolve_author_identities(authors, repo_path=None, cache_path=None):
+    """
+    把提交数据中的作者名映射为合并别名后的规范名称
+
+    提供仓库时先由 git 应用 .mailmap（%aN / %aE），再按邮箱与名称聚类；
+    否则只按名称聚类。聚类结果缓存在 cache_path，再次运行时只处理新身份。
+
+    Args:
+        authors (pd.Series): 提交数据的 author 列（git log 的 %an）
+        repo_path (str): 仓库路径
+        cache_path (str): 身份映射缓存文件（JSON）
+
+    Returns:
+        dict: {'mapping': 原作者名 -> 规范名称（只含发生变化的作者）,
+               'identities': 身份数, 'clusters': 聚类数, 'new_identities': 本次新处理的身份数,
+               'truncated_blocks': 本次因分块过大只做了部分名称比较的身份数}
+    """
+    resolver = IdentityResolver.load(cache_path, mailmap_digest(repo_path))
+    counts = authors.dropna().astype(str).value_counts()
+    if repo_path:
+        identities = _cached_git_identities(repo_path, resolver)
+    else:
+        identities = pd.DataFrame({'raw_name': counts.index, 'raw_email': '', 'name': counts.index,
+                                   'email': '', 'commits': counts.values})
+
+    truncated = resolver.truncated
+    new = sum(resolver.add(row.name, row.email, row.commits)
+              for row in identities.groupby(['name', 'email'], sort=False)['commits'].sum()
+                                   .reset_index().itertuples())
+    truncated = resolver.truncated - truncated
+    if truncated:
+        print(f"⚠️  {truncated} 个身份所在的名称分块超过 {MAX_BLOCK_SIZE} 个身份，只与其中前 "
+              f"{MAX_BLOCK_SIZE} 个比较了名称相似度，部分别名可能未合并")
+    if cache_path:
+        resolver.save(cache_path)
+
+    canonical = resolver.canonical_names()
+    identities['canonical'] = [canonical[IdentityResolver.identity_id(name, email)]
+                               for name, email in zip(identities['name'], identities['email'])]
+    # 同一个原作者名可能对应多个身份，取提交数最多的那个
+    best = (identities.sort_values('commits', ascending=False, kind='stable')
+                      .drop_duplicates('raw_name').set_index('raw_name')['canonical'])
+    mapping = {author: best[author] for author in counts.index
+               if author in best.index and best[author] != author}
+    return {
+        'mapping': mapping,
+        'identities': len(resolver.identities),
+        'clusters': len({resolver.find(i) for i in resolver.identities}),
+        'new_identities': int(new),
+        'truncated_blocks': int(truncated),
+    }
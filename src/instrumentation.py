@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import time
+import threading
+import contextlib
+from datetime import datetime
+from pathlib import Path
+
+# 当前激活的记录器（可以嵌套，例如批处理外层与单次分析各有一个，span 同时记录到所有记录器）
+_active = []
+
+def read_rss():
+    """
+    读取当前进程的常驻内存与峰值常驻内存（Linux /proc/self/status）
+
+    Returns:
+        tuple: (当前 MB, 峰值 MB)，不支持时为 (None, None)
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            status = f.read()
+    except OSError:
+        return None, None
+    values = []
+    for field in ('VmRSS', 'VmHWM'):
+        match = re.search(rf'^{field}:\s+(\d+)\s+kB', status, re.MULTILINE)
+        values.append(round(int(match.group(1)) / 1024, 2) if match else None)
+    return tuple(values)
+
+class Span:
+    """一个计时区间；attrs 中记录行数等附加信息，可在区间结束前用 set 补充"""
+
+    __slots__ = ('name', 'category', 'start', 'end', 'pid', 'tid', 'attrs')
+
+    def __init__(self, name, category, start=None, pid=None, tid=None, attrs=None):
+        self.name = name
+        self.category = category
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.pid = pid or os.getpid()
+        self.tid = tid or threading.get_native_id()
+        self.attrs = dict(attrs or {})
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def finish(self, end=None):
+        self.end = time.perf_counter() if end is None else end
+        rss, peak = read_rss()
+        self.attrs.setdefault('rss_mb', rss)
+        self.attrs.setdefault('peak_rss_mb', peak)
+        return self
+
+    @property
+    def seconds(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+class _NullSpan:
+    """没有激活的记录器时使用，所有操作都是空操作"""
+
+    def set(self, **attrs):
+        return self
+
+_NULL_SPAN = _NullSpan()
+
+class Profiler:
+    """
+    运行剖析记录器
+
+    收集各阶段的计时区间（开始时间、耗时、行数、常驻内存），可导出为 JSON 运行剖析，
+    或 Chrome / Perfetto 可以直接打开的 Trace Event 格式。
+    时间使用 time.perf_counter（Linux 上为系统级单调时钟），工作进程中测得的区间也能对齐。
+    """
+
+    def __init__(self, name='run'):
+        self.name = name
+        self.spans = []
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def __enter__(self):
+        _active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.remove(self)
+        return False
+
+    def to_dict(self):
+        """机器可读的运行剖析"""
+        rss, peak = read_rss()
+        return {
+            'name': self.name,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'total_seconds': round(time.perf_counter() - self.start, 4),
+            'peak_rss_mb': peak,
+            'spans': [{
+                'name': s.name,
+                'category': s.category,
+                'start': round(s.start - self.start, 6),
+                'seconds': round(s.seconds, 6),
+                'pid': s.pid,
+                'tid': s.tid,
+                **s.attrs,
+            } for s in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+    def to_trace_events(self):
+        """Trace Event 格式（chrome://tracing、ui.perfetto.dev 可以直接打开）"""
+        events = [{
+            'name': s.name,
+            'cat': s.category,
+            'ph': 'X',
+            'ts': round((s.start - self.start) * 1e6, 3),
+            'dur': round(s.seconds * 1e6, 3),
+            'pid': s.pid,
+            'tid': s.tid,
+            'args': s.attrs,
+        } for s in self.spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path, trace_path=None):
+        """写入运行剖析 JSON；给出 trace_path 时同时导出 Trace Event 文件"""
+        for target, payload in ((path, self.to_dict), (trace_path, self.to_trace_events)):
+            if not target:
+                continue
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            with open(str(target), 'w', encoding='utf-8') as f:
+                json.dump(payload(), f, ensure_ascii=False, indent=2, default=str)
+
+def current_profiler():
+    """最内层的激活记录器，没有时为 None"""
+    return _active[-1] if _active else None
+
+@contextlib.contextmanager
+def span(name, category='phase', **attrs):
+    """
+    记录一个计时区间（没有激活的记录器时几乎没有开销）
+
+    用法:
+        with span('date parse', rows=len(df)) as s:
+            ...
+            s.set(invalid=count)
+    """
+    if not _active:
+        yield _NULL_SPAN
+        return
+    current = Span(name, category, attrs=attrs)
+    try:
+        yield current
+    finally:
+        current.finish()
+        for profiler in list(_active):
+            profiler.add(current)
+
+def record_span(name, category, start, seconds, pid=None, tid=None, **attrs):
+    """记录在别处测得的区间（例如工作进程返回的耗时）"""
+    if not _active:
+        return
+    current = Span(name, category, start=start, pid=pid, tid=tid, attrs=attrs)
+    current.end = start + seconds
+    for profiler in list(_active):
+        profiler.add(current)
+
+@contextlib.contextmanager
+def profiling(path=None, trace_path=None, name='run'):
+    """
+    在一段代码运行期间激活记录器，结束后（包括出错时）写入运行剖析
+
+    Args:
+        path (str): 运行剖析 JSON 路径，None 表示不写文件
+        trace_path (str): Trace Event 文件路径，None 表示不导出
+    """
+    profiler = Profiler(name)
+    try:
+        with profiler:
+            yield profiler
+    finally:
+        profiler.save(path, trace_path)
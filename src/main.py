@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+from pathlib import Path
+
+# 各子命令需要导入的 src 模块；入口本身只依赖标准库，
+# pandas / matplotlib / seaborn 等较重的库只在用到它们的子命令中导入
+COMMAND_MODULES = {
+    'collect': ['data_collection'],
+    'analyze': ['analysis'],
+    'report': [],
+    'bench': ['benchmark'],
+}
+# 启动耗时报告中关注的第三方库
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'matplotlib', 'seaborn', 'git', 'tqdm']
+# 收集模式（入口不导入 data_collection；与 COLLECTION_MODES 的一致性由单元测试保证）
+COLLECT_MODES = ('auto', 'robust', 'safe', 'incremental', 'streaming', 'parallel')
+# 存储格式（storage.SUPPORTED_FORMATS）与图表输出配置（analysis.RENDER_PROFILES），同样由单元测试保证一致
+STORAGE_FORMATS = ('csv', 'parquet', 'feather')
+RENDER_PROFILES = ('preview', 'print', 'vector')
+# 未指定时的仓库与输出路径（从项目根目录运行）
+DEFAULT_REPO_PATH = 'data/repos/requests'
+DEFAULT_OUTPUT_PATH = 'data/processed/requests_commits.csv'
+# report 子命令默认列出的最慢区间数
+REPORT_TOP_SPANS = 10
+
+def load_module(name):
+    """按需导入 src 下的模块（兼容以脚本方式运行 src/main.py）"""
+    try:
+        return importlib.import_module(f'src.{name}')
+    except ImportError as e:
+        # 只在 src 包本身不可导入时回退；模块内部缺少依赖等错误照常抛出
+        if e.name not in ('src', f'src.{name}'):
+            raise
+        return importlib.import_module(name)
+
+def load_command(command):
+    """导入子命令依赖的全部模块"""
+    return [load_module(name) for name in COMMAND_MODULES[command]]
+
+def _cmd_collect(args):
+    data_collection = load_module('data_collection')
+    ranges = args.ranges or []
+    result = data_collection.collect_commits(
+        args.repo, args.output, mode=args.mode,
+        rev_range=ranges[0] if len(ranges) == 1 else None, ranges=ranges if len(ranges) > 1 else None,
+        max_count=args.max_count, since=args.since, until=args.until, windows=args.windows,
+        output_format=args.format,
+    )
+    if args.summary and hasattr(result, 'attrs'):
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump({'commits': len(result), 'ranges': result.attrs.get('ranges', [])},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+def _cmd_analyze(args):
+    analysis = load_module('analysis')
+    analysis.analyze_commit_patterns(
+        args.input, args.output_dir, processed_format=args.format, render_profile=args.profile,
+        render_workers=args.workers, repo_path=args.repo, profile_trace=args.trace,
+        resolve_identities=args.resolve_identities,
+    )
+    return 0
+
+def _cmd_report(args):
+    """打印已有分析结果的摘要与运行剖析中最慢的区间（只读取文本与 JSON）"""
+    output_dir = Path(args.output_dir)
+    summary_path = output_dir / 'summary.txt'
+    if not summary_path.exists():
+        print(f"❌ 找不到分析摘要: {summary_path}")
+        return 1
+    print(summary_path.read_text(encoding='utf-8'))
+
+    profile_path = output_dir / 'run_profile.json'
+    if profile_path.exists():
+        with open(str(profile_path), 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        spans = sorted(profile.get('spans', []), key=lambda s: s['seconds'], reverse=True)
+        print(f"⏱️  运行剖析: 共 {profile.get('total_seconds', 0):.2f}s，"
+              f"峰值内存 {profile.get('peak_rss_mb')} MB")
+        for item in spans[:args.top]:
+            rows = f"，{item['rows']} 行" if item.get('rows') is not None else ""
+            print(f"  {item['seconds']:8.3f}s  [{item['category']}] {item['name']}{rows}")
+    return 0
+
+def _cmd_bench(args):
+    benchmark = load_module('benchmark')
+    options = vars(args).copy()
+    for key in ('command', 'handler', 'compare'):
+        options.pop(key)
+    report = benchmark.run_benchmarks(**options)
+    if args.compare:
+        comparison = benchmark.compare_benchmarks(args.compare, report)
+        print(comparison.to_string(index=False))
+        return 1 if comparison['regression'].any() else 0
+    return 0
+
+def _cmd_startup(args):
+    unknown = set(args.commands) - set(COMMAND_MODULES)
+    if unknown:
+        print(f"❌ 未知子命令: {', '.join(sorted(unknown))}")
+        return 2
+    results = measure_startup(args.commands or list(COMMAND_MODULES), repeat=args.repeat)
+    for item in results:
+        print(f"{item['command']:<8} 导入 {item['import_seconds']:.3f}s  进程 {item['process_seconds']:.3f}s  "
+              f"已加载: {', '.join(item['modules']) or '-'}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+# 在新的解释器中导入 main 与子命令依赖，输出导入耗时与已加载的第三方库
+_STARTUP_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+import main
+main.load_command({command!r})
+print(json.dumps({{'seconds': time.perf_counter() - start,
+                  'modules': [m for m in main.HEAVY_MODULES if m in sys.modules]}}))
+"""
+
+def measure_startup(commands, repeat=3):
+    """
+    测量各子命令的启动耗时
+
+    每次都在新的解释器进程中导入入口与子命令依赖的模块，取多次运行的最小值。
+
+    Args:
+        commands (Iterable[str]): 子命令名
+        repeat (int): 每个子命令的运行次数
+
+    Returns:
+        list: 每个子命令一个字典，含 command、import_seconds、process_seconds（含解释器启动）、
+        modules（已加载的较重第三方库）
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for command in commands:
+        probe = _STARTUP_PROBE.format(src=src_dir, command=command)
+        imports, processes = [], []
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            output = subprocess.check_output([sys.executable, '-c', probe], cwd=src_dir)
+            processes.append(time.perf_counter() - start)
+            measured = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+            imports.append(measured['seconds'])
+        results.append({
+            'command': command,
+            'import_seconds': round(min(imports), 4),
+            'process_seconds': round(min(processes), 4),
+            'modules': measured['modules'],
+        })
+    return results
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="开源项目提交历史分析")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    collect = commands.add_parser('collect', help="从 Git 仓库收集提交数据")
+    collect.add_argument('repo', nargs='?', default=DEFAULT_REPO_PATH, help="仓库路径")
+    collect.add_argument('output', nargs='?', default=DEFAULT_OUTPUT_PATH,
+                         help="输出文件（.csv / .parquet / .feather）")
+    collect.add_argument('--mode', choices=COLLECT_MODES, default='auto',
+                         help="auto：健壮模式，某个范围的 git 输出出错时只对该范围退回安全模式")
+    collect.add_argument('--range', dest='ranges', action='append', default=None,
+                         help="修订范围，例如 v1.0..HEAD；auto 模式下可重复，每个范围独立收集")
+    collect.add_argument('--max-count', type=int, default=None)
+    collect.add_argument('--since', default=None, help="起始时间（git --since 语法）")
+    collect.add_argument('--until', default=None, help="截止时间（git --until 语法）")
+    collect.add_argument('--windows', type=int, default=None, help="auto 模式下按提交时间切成的窗口数")
+    collect.add_argument('--format', choices=STORAGE_FORMATS, default=None, help="存储格式，默认按扩展名")
+    collect.add_argument('--summary', default=None, help="把各范围的收集方式与耗时保存为 JSON")
+    collect.set_defaults(handler=_cmd_collect)
+
+    analyze = commands.add_parser('analyze', help="分析提交数据并生成图表与报告")
+    analyze.add_argument('input', help="提交数据文件")
+    analyze.add_argument('output_dir', help="输出目录")
+    analyze.add_argument('--format', choices=STORAGE_FORMATS, default='csv', help="处理后数据的保存格式")
+    analyze.add_argument('--profile', choices=RENDER_PROFILES, default='print',
+                         help="图表输出配置：preview 快速预览、print 打印质量、vector 矢量图")
+    analyze.add_argument('--workers', type=int, default=None, help="绘图进程数")
+    analyze.add_argument('--repo', default=None, help="仓库路径（代码结构与作者身份分析）")
+    analyze.add_argument('--resolve-identities', action='store_true',
+                         help="合并同一个人的不同作者名（.mailmap 与别名聚类）")
+    analyze.add_argument('--trace', action='store_true', help="导出 Chrome / Perfetto 可打开的 Trace 文件")
+    analyze.set_defaults(handler=_cmd_analyze)
+
+    report = commands.add_parser('report', help="打印已有分析结果的摘要与最慢的阶段")
+    report.add_argument('output_dir', help="分析输出目录")
+    report.add_argument('--top', type=int, default=REPORT_TOP_SPANS)
+    report.set_defaults(handler=_cmd_report)
+
+    bench = commands.add_parser('bench', help="在合成仓库上计时收集与分析流水线")
+    bench.add_argument('--sizes', nargs='+', default=['1k'], help="规模：1k、100k、1m 或提交数")
+    bench.add_argument('--authors', type=int, default=50)
+    bench.add_argument('--files', type=int, default=500)
+    bench.add_argument('--message-mix', type=json.loads, default=None,
+                       help='消息类型比例（JSON），例如 \'{"fix": 0.5, "feat": 0.5}\'')
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--work-dir', default='results/benchmarks')
+    bench.add_argument('--output', dest='output_path', default=None)
+    bench.add_argument('--collectors', nargs='*', choices=['robust', 'safe'], default=['robust', 'safe'])
+    bench.add_argument('--no-repo', dest='generate_repo', action='store_false',
+                       help="不生成 git 仓库，只分析合成提交表")
+    bench.add_argument('--compare', default=None, help="与该基准结果 JSON 比较")
+    bench.set_defaults(handler=_cmd_bench)
+
+    startup = commands.add_parser('startup', help="测量各子命令的启动耗时")
+    startup.add_argument('commands', nargs='*', help=f"子命令，默认全部（{' / '.join(COMMAND_MODULES)}）")
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.add_argument('--output', default=None, help="结果保存为 JSON")
+    startup.set_defaults(handler=_cmd_startup)
+    return parser
+
+def main(argv=None):
+    """
+    命令行入口
+
+    Returns:
+        int: 退出码
+    """
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import time
+import pickle
+import hashlib
+import tracemalloc
+from pathlib import Path
+
+try:
+    from src.instrumentation import span
+except ImportError:  # 直接以脚本方式运行 src 目录下的模块
+    from instrumentation import span
+
+# 每个阶段在缓存目录中最多保留的结果数
+CACHE_ENTRIES_PER_STAGE = 4
+
+def _row_count(value):
+    """阶段结果的行数（DataFrame，或含 df 的聚合结果），其他结果为 None"""
+    if isinstance(value, dict):
+        value = value.get('df')
+    return len(value) if hasattr(value, 'columns') else None
+
+def reset_peak_rss():
+    """重置当前进程的峰值常驻内存（Linux /proc/self/clear_refs），不支持时返回 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def read_peak_rss():
+    """读取当前进程的峰值常驻内存（字节），不支持时返回 None"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            match = re.search(r'^VmHWM:\s+(\d+)\s+kB', f.read(), re.MULTILINE)
+    except OSError:
+        return None
+    return int(match.group(1)) * 1024 if match else None
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-256 摘要"""
+    digest = hashlib.sha256()
+    with open(str(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stage_key(name, depends=(), config=None):
+    """
+    计算阶段缓存键：阶段名、上游阶段的键（或输入文件摘要）与阶段配置的摘要
+
+    Args:
+        name (str): 阶段名
+        depends (list): 上游阶段的缓存键或输入内容摘要
+        config (dict): 影响阶段结果的配置（需可 JSON 序列化）
+
+    Returns:
+        str: 十六进制摘要
+    """
+    payload = json.dumps([name, list(depends), config], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class Pipeline:
+    """
+    按需执行的分阶段流水线
+
+    每个阶段声明上游阶段和配置，缓存键由上游阶段的键与本阶段配置推导，
+    不需要先执行上游阶段就能算出。请求某个阶段的结果时，命中磁盘缓存就直接读取，
+    否则才递归计算上游阶段。因此只修改下游阶段（例如报告模板）时，
+    上游阶段既不会重新计算，也不会被读入内存。
+    每个实际执行或读取缓存的阶段都会记录耗时与峰值内存：Linux 上使用进程峰值常驻内存
+    （每个阶段开始前重置，几乎没有开销），其他平台退回到 tracemalloc 统计的 Python 堆峰值。
+    """
+
+    def __init__(self, cache_dir=None, track_memory=True):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.track_memory = track_memory
+        self.metrics = []
+        self._stages = {}
+        self._results = {}
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def add_stage(self, name, func, inputs=(), config=None, options=None, digest=None,
+                  cacheable=True, force=False):
+        """
+        注册一个阶段
+
+        Args:
+            name (str): 阶段名
+            func (callable): 阶段函数，调用方式为 func(*上游结果, **config, **options)
+            inputs (list): 上游阶段名，其结果按顺序作为位置参数传入
+            config (dict): 影响结果的参数，参与缓存键计算
+            options (dict): 不影响结果的参数（如输出目录、进程数），不参与缓存键计算
+            digest (str): 外部输入的内容摘要（例如输入文件的哈希）
+            cacheable (bool): 结果是否写入磁盘缓存
+            force (bool): 忽略已有缓存，强制重新计算
+        """
+        self._stages[name] = {
+            'func': func,
+            'inputs': list(inputs),
+            'config': dict(config or {}),
+            'options': dict(options or {}),
+            'digest': digest,
+            'cacheable': cacheable,
+            'force': force,
+        }
+
+    def key(self, name):
+        """阶段的缓存键（递归由上游阶段的键推导）"""
+        stage = self._stages[name]
+        depends = [self.key(dep) for dep in stage['inputs']]
+        if stage['digest']:
+            depends.append(stage['digest'])
+        return stage_key(name, depends, stage['config'])
+
+    def _cache_file(self, name, key):
+        return self.cache_dir / f"{name}-{key[:16]}.pkl"
+
+    def _load_cached(self, name, key):
+        cache_file = self._cache_file(name, key)
+        if not cache_file.exists():
+            return False, None
+        try:
+            with open(str(cache_file), 'rb') as f:
+                return True, pickle.load(f)
+        except Exception as e:
+            print(f"⚠️  缓存读取失败，重新计算 {name}: {str(e)}")
+            return False, None
+
+    def _store(self, name, key, result):
+        cache_file = self._cache_file(name, key)
+        tmp_file = cache_file.with_suffix('.tmp')
+        try:
+            with open(str(tmp_file), 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(str(tmp_file), str(cache_file))
+        except Exception as e:
+            print(f"⚠️  缓存写入失败 ({name}): {str(e)}")
+            tmp_file.unlink(missing_ok=True)
+            return
+        # 只保留每个阶段最近的几份结果
+        entries = sorted(self.cache_dir.glob(f"{name}-*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in entries[CACHE_ENTRIES_PER_STAGE:]:
+            stale.unlink(missing_ok=True)
+
+    def _measure(self, func, *args, **kwargs):
+        """执行函数并返回 (结果, 耗时秒数, 峰值内存字节数)"""
+        use_rss = self.track_memory and reset_peak_rss()
+        started_tracing = False
+        if self.track_memory and not use_rss:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            if use_rss:
+                peak = read_peak_rss()
+            elif self.track_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+            else:
+                peak = None
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        return result, elapsed, peak
+
+    def _record(self, name, key, elapsed, peak, cached):
+        metric = {
+            'stage': name,
+            'seconds': round(elapsed, 4),
+            'peak_memory_mb': round(peak / 1024 / 1024, 2) if peak is not None else None,
+            'cached': cached,
+            'key': key[:16],
+        }
+        self.metrics.append(metric)
+        memory_text = f", 峰值内存 {metric['peak_memory_mb']} MB" if peak is not None else ""
+        print(f"⏱️  阶段 {name}: {elapsed:.2f}s{memory_text}{' (缓存命中)' if cached else ''}")
+
+    def result(self, name):
+        """
+        获取阶段结果：同一次运行中只计算一次，命中磁盘缓存时不执行上游阶段
+
+        Returns:
+            阶段函数的返回值
+        """
+        if name in self._results:
+            return self._results[name]
+        stage = self._stages[name]
+        key = self.key(name)
+        use_cache = stage['cacheable'] and self.cache_dir is not None
+
+        if use_cache and not stage['force']:
+            with span(f'{name} (cache)', 'stage') as stage_span:
+                (hit, value), elapsed, peak = self._measure(self._load_cached, name, key)
+                stage_span.set(cached=hit, rows=_row_count(value) if hit else None)
+            if hit:
+                self._record(name, key, elapsed, peak, cached=True)
+                self._results[name] = value
+                return value
+
+        # 先准备上游结果，上游耗时单独记录
+        args = [self.result(dep) for dep in stage['inputs']]
+        with span(name, 'stage', cached=False) as stage_span:
+            value, elapsed, peak = self._measure(stage['func'], *args, **stage['config'], **stage['options'])
+            stage_span.set(rows=_row_count(value))
+        if use_cache:
+            self._store(name, key, value)
+        self._record(name, key, elapsed, peak, cached=False)
+        self._results[name] = value
+        return value
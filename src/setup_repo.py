@@ -1,34 +1,227 @@
-import git
 import os
 import sys
+import time
+import asyncio
+import argparse
 import subprocess
 
-def setup_requests_repo():
-    """Clone requests repository at runtime with knowledge base parameter"""
-    repo_path = "data/repos/requests"
-    
+REPO_URL = "https://github.com/psf/requests.git"
+REPO_PATH = "data/repos/requests"
+# 默认克隆深度；None 表示克隆完整历史
+DEFAULT_DEPTH = 300
+# 知识库要求的 git 配置（容忍历史中时区格式错误的提交）
+GIT_CONFIG = ['-c', 'fetch.fsck.badTimezone=ignore']
+# 并发同步时同时运行的 git 进程数上限
+DEFAULT_CONCURRENCY = 8
+# 部分克隆过滤器：只下载提交与树对象，文件内容在需要时按需获取
+# （git log --numstat 与 cat-file 读取文件内容时会逐个向远程补取，只适合不做分析的镜像）
+PARTIAL_CLONE_FILTER = 'blob:none'
+# 裸仓库（git clone --bare）没有配置 fetch refspec，fetch origin 不会更新任何分支
+BARE_FETCH_REFSPEC = '+refs/heads/*:refs/heads/*'
+
+def is_shallow_repo(repo_path):
+    """判断仓库是否为浅层克隆"""
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--is-shallow-repository'],
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip() == 'true'
+
+def fetch_history(repo_path, deepen=None, unshallow=False):
+    """
+    在已有克隆上增量获取更多历史，而不是重新克隆
+
+    Args:
+        repo_path (str): 仓库路径
+        deepen (int): 在当前深度基础上再获取的提交数
+        unshallow (bool): 补全为完整历史
+
+    Returns:
+        bool: 是否执行了 fetch
+    """
+    if unshallow:
+        if not is_shallow_repo(repo_path):
+            print("INFO: repository already has full history")
+            return False
+        fetch_args = ['--unshallow']
+    elif deepen:
+        fetch_args = [f'--deepen={int(deepen)}']
+    else:
+        return False
+
+    cmd = ['git', *GIT_CONFIG, '-C', repo_path, 'fetch', '--tags', *fetch_args, 'origin']
+    print(f"EXECUTING: {' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    print(f"SUCCESS: {result.stdout or result.stderr}")
+    return True
+
+def _is_git_repo(repo_path):
+    """目录是否为 git 仓库（普通克隆或裸仓库）"""
+    return (os.path.exists(os.path.join(repo_path, '.git'))
+            or (os.path.exists(os.path.join(repo_path, 'HEAD'))
+                and os.path.isdir(os.path.join(repo_path, 'objects'))))
+
+async def _run_git(args, timeout=None):
+    """
+    异步运行一个 git 命令
+
+    Returns:
+        tuple: (退出码, stdout, stderr)
+    """
+    proc = await asyncio.create_subprocess_exec(
+        'git', *args, stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -1, '', f'timed out after {timeout}s'
+    return proc.returncode, stdout.decode('utf-8', errors='replace'), stderr.decode('utf-8', errors='replace')
+
+async def sync_repository(repo, semaphore, depth=None, partial=False, timeout=None):
+    """
+    克隆或更新一个仓库
+
+    目录不存在（或为空）时克隆；已是 git 仓库时 fetch，普通克隆再把当前分支快进到上游，
+    没有配置 fetch refspec 的裸仓库按 BARE_FETCH_REFSPEC 更新全部分支。
+
+    Args:
+        repo (dict): {'path': 本地路径, 'url': 远程地址（只 fetch 时可省略）, 'name': 名称}
+        semaphore (asyncio.Semaphore): 并发上限
+        depth (int): 克隆深度，None 表示完整历史
+        partial (bool): 克隆时使用 --filter=blob:none 部分克隆。默认关闭：收集器的
+            git log --numstat 与代码结构分析需要全部文件内容，部分克隆会在分析时逐个向远程补取，
+            既省不下传输量，分析也离不开网络；只在不做分析的镜像上开启
+        timeout (float): 单个 git 命令的超时秒数
+
+    Returns:
+        dict: name、path、action（clone / fetch）、status（ok / failed）、seconds、error
+    """
+    path = str(repo['path'])
+    result = {'name': repo.get('name') or os.path.basename(os.path.abspath(path)), 'path': path,
+              'action': None, 'status': 'ok', 'seconds': None, 'error': None}
+    async with semaphore:
+        start = time.perf_counter()
+        if _is_git_repo(path):
+            result['action'] = 'fetch'
+            refspecs = []
+            code, _, _ = await _run_git(['-C', path, 'config', '--get-all', 'remote.origin.fetch'], timeout)
+            if code != 0:
+                # 没有配置 refspec（--bare 克隆）：显式更新全部分支
+                refspecs = [BARE_FETCH_REFSPEC]
+            steps = [[*GIT_CONFIG, '-C', path, 'fetch', '--prune', '--tags', 'origin', *refspecs]]
+            if os.path.exists(os.path.join(path, '.git')):
+                # 有工作区的克隆：当前分支有上游时快进，分离 HEAD 等情况只 fetch
+                code, _, _ = await _run_git(['-C', path, 'rev-parse', '--abbrev-ref', '@{upstream}'], timeout)
+                if code == 0:
+                    steps.append(['-C', path, 'merge', '--ff-only', '--quiet', '@{upstream}'])
+        elif os.path.exists(path) and os.listdir(path):
+            steps = None
+            result['error'] = f"{path} exists and is not a git repository"
+        elif not repo.get('url'):
+            steps = None
+            result['error'] = "no url to clone from"
+        else:
+            result['action'] = 'clone'
+            cmd = ['clone', '--quiet', *GIT_CONFIG]
+            if partial:
+                cmd.append(f'--filter={PARTIAL_CLONE_FILTER}')
+            if depth:
+                cmd.append(f'--depth={int(depth)}')
+            steps = [cmd + [repo['url'], path]]
+
+        for args in steps or []:
+            code, _, stderr = await _run_git(args, timeout)
+            if code != 0:
+                result['error'] = stderr.strip() or f"git exited with code {code}"
+                break
+        if result['error']:
+            result['status'] = 'failed'
+        result['seconds'] = round(time.perf_counter() - start, 3)
+
+    status = 'SUCCESS' if result['status'] == 'ok' else 'ERROR'
+    print(f"{status}: {result['action'] or 'skip'} {result['name']} ({result['seconds']:.2f}s)"
+          + (f" - {result['error']}" if result['error'] else ''))
+    return result
+
+async def sync_repositories_async(repos, concurrency=DEFAULT_CONCURRENCY, depth=None, partial=False,
+                                  timeout=None):
+    """sync_repositories 的协程版本，可在已有事件循环中使用"""
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    return list(await asyncio.gather(*(
+        sync_repository(repo, semaphore, depth=depth, partial=partial, timeout=timeout) for repo in repos
+    )))
+
+def sync_repositories(repos, concurrency=DEFAULT_CONCURRENCY, depth=None, partial=False, timeout=None):
+    """
+    并发克隆或更新一组仓库
+
+    每个仓库一个 git 子进程，由 asyncio 调度，同时运行的进程数不超过 concurrency；
+    单个仓库失败只记录在结果中。
+
+    Args:
+        repos (list): [{'path': ..., 'url': ..., 'name': ...}, ...]
+        concurrency (int): 同时运行的 git 进程数
+        depth (int): 新克隆的深度，None 表示完整历史
+        partial (bool): 新克隆使用 --filter=blob:none 部分克隆（默认关闭，见 sync_repository）
+        timeout (float): 单个 git 命令的超时秒数
+
+    Returns:
+        list: 与 repos 顺序一致的结果，见 sync_repository
+    """
+    print(f"INFO: syncing {len(repos)} repositories (concurrency {concurrency})...")
+    start = time.perf_counter()
+    results = asyncio.run(sync_repositories_async(repos, concurrency, depth, partial, timeout))
+    failed = sum(r['status'] != 'ok' for r in results)
+    print(f"INFO: synced {len(results) - failed}/{len(results)} repositories "
+          f"in {time.perf_counter() - start:.2f}s")
+    return results
+
+def setup_requests_repo(repo_path=REPO_PATH, repo_url=REPO_URL, depth=DEFAULT_DEPTH,
+                        full_history=False, deepen=None, refresh=False):
+    """
+    Clone requests repository at runtime with knowledge base parameter
+
+    If the clone already exists it is reused; pass ``full_history=True`` to
+    unshallow it, ``deepen=N`` to fetch N more commits of history, or
+    ``refresh=True`` to fetch new commits and fast-forward the current branch.
+    """
     if os.path.exists(repo_path):
+        if refresh and not (full_history or deepen):
+            result = sync_repositories([{'path': repo_path, 'url': repo_url}], concurrency=1)[0]
+            if result['status'] != 'ok':
+                sys.exit(1)
+            return True
+        if full_history or deepen:
+            try:
+                return fetch_history(repo_path, deepen=deepen, unshallow=full_history)
+            except subprocess.CalledProcessError as e:
+                print(f"ERROR: Git fetch failed with exit code {e.returncode}")
+                print(f"STDOUT: {e.stdout}")
+                print(f"STDERR: {e.stderr}")
+                sys.exit(1)
         print("INFO: requests repository already exists, skipping clone")
         return
-    
+
     print("INFO: Cloning requests repository with knowledge base parameter...")
-    
+
     os.makedirs(repo_path, exist_ok=True)
-    
+
     try:
         # 使用 subprocess 直接调用 git 命令（100% 兼容知识库要求）
-        print("EXECUTING: git clone -c fetch.fsck.badTimezone=ignore --depth=300 https://github.com/psf/requests.git data/repos/requests")
-        result = subprocess.run([
-            'git', 'clone', 
-            '-c', 'fetch.fsck.badTimezone=ignore',  # 知识库要求的精确参数
-            '--depth=300', 
-            'https://github.com/psf/requests.git', 
-            repo_path
-        ], capture_output=True, text=True, check=True)
-        
+        cmd = ['git', 'clone',
+               '-c', 'fetch.fsck.badTimezone=ignore']  # 知识库要求的精确参数
+        if depth and not full_history:
+            cmd.append(f'--depth={int(depth)}')
+        cmd.extend([repo_url, repo_path])
+        print(f"EXECUTING: {' '.join(cmd)}")
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
         print(f"SUCCESS: {result.stdout}")
         print(f"DEBUG: Repository cloned successfully to {repo_path}")
-        
+
         # 验证克隆结果
         if os.path.exists(os.path.join(repo_path, '.git')):
             print("SUCCESS: Git repository structure verified")
@@ -36,7 +229,7 @@ def setup_requests_repo():
         else:
             print("ERROR: Repository structure verification failed")
             sys.exit(1)
-            
+
     except subprocess.CalledProcessError as e:
         print(f"ERROR: Git clone failed with exit code {e.returncode}")
         print(f"STDOUT: {e.stdout}")
@@ -51,4 +244,13 @@ def setup_requests_repo():
         sys.exit(1)
 
 if __name__ == "__main__":
-    setup_requests_repo()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="克隆或更新 requests 仓库")
+    parser.add_argument('--repo-path', default=REPO_PATH)
+    parser.add_argument('--repo-url', default=REPO_URL)
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="首次克隆的深度")
+    parser.add_argument('--full-history', action='store_true',
+                        help="克隆完整历史；已有浅层克隆时补全为完整历史")
+    parser.add_argument('--deepen', type=int, default=None, help="在已有克隆上再获取的提交数")
+    parser.add_argument('--refresh', action='store_true', help="fetch 新提交并快进当前分支")
+    args = parser.parse_args()
+    setup_requests_repo(**vars(args))
@@ -0,0 +1,296 @@
+import os
+import re
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 文件扩展名 -> 存储格式
+FORMAT_BY_SUFFIX = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+}
+SUPPORTED_FORMATS = ('csv', 'parquet', 'feather')
+# CSV 读取时依次尝试的编码
+CSV_ENCODINGS = ['utf-8', 'utf-8-sig', 'gbk', 'latin1']
+
+# 列式存储时各列的类型
+COLUMN_TYPES = {
+    'hash': 'string',
+    'commit_hash': 'string',
+    'author': 'category',
+    'message': 'string',
+    'lines_added': 'int32',
+    'lines_deleted': 'int32',
+    'files_changed': 'int32',
+    'utc_offset': 'Int16',
+}
+
+def detect_format(path, fmt=None):
+    """
+    根据显式参数或文件扩展名确定存储格式
+
+    Args:
+        path (str): 文件路径
+        fmt (str): 显式指定的格式，优先于扩展名
+
+    Returns:
+        str: 'csv'、'parquet' 或 'feather'
+    """
+    if fmt:
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的存储格式: {fmt}")
+        return fmt
+    return FORMAT_BY_SUFFIX.get(Path(path).suffix.lower(), 'csv')
+
+def _require_pyarrow():
+    """列式存储依赖 pyarrow（可选依赖）"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Feather 存储需要安装 pyarrow: pip install pyarrow") from e
+
+# 日期时间之后的部分：可选的小数秒与时区（Z、+0900、+09:00）
+DATE_SUFFIX_RE = re.compile(r'^(?:\.\d+)?\s*(?:(Z)|([+-])(\d{2}):?(\d{2}))?$')
+
+def _suffix_offset(suffix):
+    """解析日期后缀中的 UTC 偏移（分钟），无法识别时返回 NaN"""
+    match = DATE_SUFFIX_RE.match(suffix)
+    if match is None:
+        return np.nan
+    if match.group(2) is None:
+        return 0.0
+    minutes = int(match.group(3)) * 60 + int(match.group(4))
+    return float(minutes if match.group(2) == '+' else -minutes)
+
+def split_date_offset(dates):
+    """
+    向量化解析日期列，拆成本地时间与 UTC 偏移
+
+    支持 "YYYY-MM-DD HH:MM:SS +HHMM"（git --date=iso）、ISO 8601（T 分隔、Z 或 +HH:MM）
+    以及不带时区的格式；不带时区的值（旧版收集器会去掉 +0000）视为 UTC。
+    各收集器现在都写出时区；旧版安全模式写出的是收集机器的本地时间，需要重新收集。
+    前 19 个字符整列按固定格式解析，时区后缀只对去重后的取值解析一次。
+
+    Args:
+        dates (pd.Series): 日期字符串列
+
+    Returns:
+        tuple: (本地时间 datetime64 列, UTC 偏移分钟数 Int16 列)，无法解析的值为缺失值
+    """
+    text = dates.astype('string').str.strip()
+    # 日期与时间之间允许空格或 T
+    separator_ok = text.str.slice(10, 11).isin([' ', 'T']).to_numpy()
+    head = text.str.slice(0, 10) + ' ' + text.str.slice(11, 19)
+    local = pd.to_datetime(head, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+
+    codes, suffixes = pd.factorize(text.str.slice(19))
+    suffix_offsets = np.array([_suffix_offset(suffix) for suffix in suffixes] + [np.nan])
+    offset = pd.Series(suffix_offsets[codes], index=dates.index)
+
+    valid = local.notna().to_numpy() & separator_ok & offset.notna().to_numpy()
+    local = local.where(valid)
+    offset = offset.where(valid)
+    return local, offset.astype('Int16')
+
+def to_typed_frame(df):
+    """
+    把提交数据转换为列式存储使用的类型
+
+    日期转换为本地时间 datetime64，UTC 偏移单独保存在 utc_offset 列；
+    计数列使用 int32，作者使用 category。
+    """
+    typed = df.copy()
+    if 'date' in typed.columns and not pd.api.types.is_datetime64_any_dtype(typed['date']):
+        typed['date'], offset = split_date_offset(typed['date'])
+        if 'utc_offset' not in typed.columns:
+            typed['utc_offset'] = offset
+    for column, dtype in COLUMN_TYPES.items():
+        if column not in typed.columns:
+            continue
+        if dtype == 'int32':
+            typed[column] = pd.to_numeric(typed[column], errors='coerce').fillna(0).astype('int32')
+        else:
+            typed[column] = typed[column].astype(dtype)
+    return typed
+
+def save_commit_table(df, path, fmt=None):
+    """
+    保存提交数据
+
+    Args:
+        df (pd.DataFrame): 提交数据
+        path (str): 输出路径
+        fmt (str): 存储格式，默认根据扩展名推断（.parquet / .feather / .csv）
+
+    Returns:
+        str: 实际使用的存储格式
+    """
+    fmt = detect_format(path, fmt)
+    os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+    if fmt == 'csv':
+        df.to_csv(str(path), index=False, encoding='utf-8-sig')
+    elif fmt == 'parquet':
+        _require_pyarrow()
+        to_typed_frame(df).to_parquet(str(path), index=False)
+    else:
+        _require_pyarrow()
+        to_typed_frame(df).reset_index(drop=True).to_feather(str(path))
+    return fmt
+
+def read_columns(path, fmt=None):
+    """
+    只读取数据文件的列名，不加载数据
+
+    Returns:
+        list: 列名列表
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == 'parquet':
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(str(path)).names)
+    if fmt == 'feather':
+        _require_pyarrow()
+        import pyarrow.ipc as ipc
+        with ipc.open_file(str(path)) as reader:
+            return list(reader.schema.names)
+    with open(str(path), 'r', newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+def load_commit_table(path, columns=None, fmt=None, verbose=False):
+    """
+    加载提交数据，支持列投影
+
+    Args:
+        path (str): 数据文件路径
+        columns (list): 只加载这些列（文件中不存在的列会被忽略）
+        fmt (str): 存储格式，默认根据扩展名推断
+        verbose (bool): 打印 CSV 编码尝试过程
+
+    Returns:
+        pd.DataFrame: 提交数据
+    """
+    fmt = detect_format(path, fmt)
+    if fmt in ('parquet', 'feather'):
+        _require_pyarrow()
+        if columns is not None:
+            available = set(read_columns(path, fmt))
+            columns = [c for c in columns if c in available]
+        if fmt == 'parquet':
+            df = pd.read_parquet(str(path), columns=columns)
+        else:
+            df = pd.read_feather(str(path), columns=columns)
+        if 'author' in df.columns and not isinstance(df['author'].dtype, pd.CategoricalDtype):
+            df['author'] = df['author'].astype('category')
+        return df
+
+    usecols = None
+    if columns is not None:
+        wanted = set(columns)
+        usecols = lambda c: c in wanted
+    # 尝试不同的编码
+    last_error = None
+    for encoding in CSV_ENCODINGS:
+        try:
+            df = pd.read_csv(str(path), encoding=encoding, usecols=usecols)
+            if verbose:
+                print(f"✅ 使用编码 '{encoding}' 成功加载数据")
+            return df
+        except Exception as e:
+            last_error = e
+            if verbose:
+                print(f"⚠️  尝试编码 '{encoding}' 失败: {str(e)}")
+    raise ValueError(f"无法用任何支持的编码读取CSV文件: {last_error}")
+
+class CommitTableWriter:
+    """
+    分批写入提交数据的写入器
+
+    CSV 直接逐批追加；Parquet/Feather 每批转换为带类型的 Arrow 记录批次写入，
+    内存占用只与批大小有关。列式格式不支持原地追加，append 时会先读出旧数据
+    再与新批次一起重写。
+    """
+
+    def __init__(self, path, columns, fmt=None, append=False):
+        self.path = str(path)
+        self.columns = list(columns)
+        self.fmt = detect_format(path, fmt)
+        self.count = 0
+        self._file = None
+        self._writer = None
+        self._previous = None
+        self._schema = None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if self.fmt == 'csv':
+            # 追加时不能再写入 BOM
+            mode, encoding = ('a', 'utf-8') if append else ('w', 'utf-8-sig')
+            self._file = open(self.path, mode, newline='', encoding=encoding)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction='ignore')
+            if not append:
+                self._writer.writeheader()
+        else:
+            _require_pyarrow()
+            if append and os.path.exists(self.path):
+                self._previous = load_commit_table(self.path, fmt=self.fmt)
+
+    def _arrow_batch(self, df):
+        import pyarrow as pa
+        typed = to_typed_frame(df)
+        # 类别列的字典在批次间会变化，批量写入时按普通字符串保存，读取时再恢复为 category
+        for column in typed.columns:
+            if isinstance(typed[column].dtype, pd.CategoricalDtype):
+                typed[column] = typed[column].astype('string')
+        table = pa.Table.from_pandas(typed, preserve_index=False)
+        if self._schema is not None:
+            table = table.cast(self._schema)
+        return table
+
+    def _open_arrow_writer(self, schema):
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+        self._schema = schema
+        if self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, schema)
+        else:
+            self._writer = ipc.new_file(self.path, schema)
+
+    def write(self, records):
+        """写入一批提交记录（dict 列表）"""
+        if not records:
+            return
+        if self.fmt == 'csv':
+            self._writer.writerows(records)
+        else:
+            df = pd.DataFrame(records, columns=self.columns)
+            if self._previous is not None:
+                df = pd.concat([self._previous, to_typed_frame(df)], ignore_index=True)
+                self._previous = None
+            table = self._arrow_batch(df)
+            if self._writer is None:
+                self._open_arrow_writer(table.schema)
+            self._writer.write_table(table)
+        self.count += len(records)
+
+    def close(self):
+        """结束写入；列式格式且没有任何数据时写出空表"""
+        if self.fmt == 'csv':
+            self._file.close()
+            return
+        if self._writer is None:
+            df = self._previous if self._previous is not None else pd.DataFrame(columns=self.columns)
+            self._previous = None
+            save_commit_table(df, self.path, self.fmt)
+            return
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
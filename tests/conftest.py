@@ -46,4 +46,44 @@ def output_dir(tmp_path):
     """创建临时输出目录"""
     output_dir = tmp_path / "analysis_output"
     output_dir.mkdir()
-    return str(output_dir)
\ No newline at end of file
+    return str(output_dir)
+
+def _run_git(repo_dir, *args, env=None):
+    """在测试仓库中执行 git 命令"""
+    import subprocess
+    return subprocess.run(
+        ['git', '-C', str(repo_dir), *args],
+        check=True, capture_output=True, env=env
+    ).stdout.decode('utf-8')
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """
+    创建一个包含若干提交的本地 Git 仓库
+
+    提交使用不同的作者与时区，便于验证解析逻辑。
+    """
+    import os
+    repo_dir = tmp_path / "repo"
+    repo_dir.mkdir()
+    _run_git(repo_dir, 'init', '-q', '-b', 'main')
+    _run_git(repo_dir, 'config', 'user.name', 'Test')
+    _run_git(repo_dir, 'config', 'user.email', 'test@example.com')
+
+    commits = [
+        ('Alice', 'alice@example.com', '2025-01-11T10:30:00+0000', 'Add core module',
+         {'core.py': 'def f():\n    return 1\n'}),
+        ('Bob', 'bob@example.com', '2025-01-12T14:45:00+0900', 'Fix bug | in parser',
+         {'core.py': 'def f():\n    return 2\n', 'util.py': 'import os\n'}),
+        ('Alice', 'alice@example.com', '2025-01-13T09:15:00-0500', 'Update docs',
+         {'README.md': '# Demo\n\nSome docs\n'}),
+    ]
+    for name, email, date, message, files in commits:
+        for filename, content in files.items():
+            (repo_dir / filename).write_text(content, encoding='utf-8')
+        _run_git(repo_dir, 'add', '-A')
+        env = dict(os.environ,
+                   GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email, GIT_AUTHOR_DATE=date,
+                   GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=email, GIT_COMMITTER_DATE=date)
+        _run_git(repo_dir, 'commit', '-q', '-m', message, env=env)
+    return repo_dir
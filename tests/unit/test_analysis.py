@@ -7,7 +7,14 @@ import shutil
 import matplotlib
 matplotlib.use('Agg')  # 确保使用非交互式后端
 
-from src.analysis import analyze_commit_patterns
+import src.analysis as analysis_module
+from src.analysis import (
+    analyze_commit_patterns,
+    build_contributor_profiles,
+    classify_messages,
+    normalize_dates,
+    render_charts,
+)
 
 class TestAnalysis:
     """
@@ -208,4 +215,105 @@ class TestAnalysis:
                 print("\n📁 最小数据集输出内容:")
                 for item in output_dir.iterdir():
                     print(f"  - {item.name} (大小: {item.stat().st_size} 字节)")
-            raise
\ No newline at end of file
+            raise
+
+def test_normalize_dates_keeps_offsets():
+    """向量化日期解析保留 UTC 偏移，无法解析的值逐行回退"""
+    dates = pd.Series([
+        '2025-10-15 20:45:42 +0900',
+        '2025-10-13 16:16:05',
+        '2025-01-13T09:15:00.123+05:30',
+        '2025/01/14 10:00',
+        None,
+    ])
+    result = normalize_dates(dates)
+    assert result['date'].iloc[0] == pd.Timestamp('2025-10-15 20:45:42')
+    assert result['date_utc'].iloc[0] == pd.Timestamp('2025-10-15 11:45:42')
+    assert result['utc_offset'].tolist()[:4] == [540, 0, 330, 0]
+    assert result['date'].iloc[3] == pd.Timestamp('2025-01-14 10:00:00')
+    assert pd.isna(result['date'].iloc[4])
+
+def test_analysis_utc_time_basis(tmp_path):
+    """按 UTC 时间统计小时分布"""
+    data = pd.DataFrame({
+        'commit_hash': ['a1', 'b2'],
+        'author': ['Alice', 'Bob'],
+        'date': ['2025-01-11 10:30:00 +0900', '2025-01-12 23:30:00 -0200'],
+        'message': ['Fix bug', 'Add feature'],
+    })
+    input_path = tmp_path / "commits.csv"
+    data.to_csv(input_path, index=False)
+
+    local = analyze_commit_patterns(str(input_path), str(tmp_path / "local"))
+    utc = analyze_commit_patterns(str(input_path), str(tmp_path / "utc"), time_basis='utc')
+    assert local['hour'].tolist() == [10, 23]
+    assert utc['hour'].tolist() == [1, 1]
+    assert utc['day_of_week'].tolist() == ['Saturday', 'Monday']
+
+@pytest.mark.parametrize("use_arrow", [True, False])
+def test_classify_messages(monkeypatch, use_arrow):
+    """逐条提交标注类型：关键词优先级、Conventional Commits 前缀与自定义规则"""
+    if not use_arrow:
+        monkeypatch.setattr(analysis_module, '_classify_with_arrow', lambda *args, **kwargs: None)
+    messages = pd.Series([
+        'feat(api)!: add streaming mode',
+        'Add test for crash fix',
+        'Update README',
+        'Bump version',
+        None,
+    ])
+    assert classify_messages(messages).tolist() == ['feature', 'fix', 'docs', 'other', 'other']
+
+    rules = {'deps': r'\bbump\b', 'docs': r'readme'}
+    labels = classify_messages(messages, rules=rules, conventional_types={})
+    assert labels.tolist() == ['other', 'other', 'docs', 'deps', 'other']
+
+    # 大写的自定义前缀与规则在两条路径上结果相同
+    custom = pd.Series(['FEAT: new api', 'Feat(core): tweak', 'JIRA-12 Bump deps', 'feature flag'])
+    labels = classify_messages(custom, rules={'deps': r'\bBUMP\b'}, conventional_types={'FEAT': 'feature'})
+    assert labels.tolist() == ['feature', 'feature', 'deps', 'other']
+
+def test_build_contributor_profiles(sample_dataframe):
+    """单次 groupby 生成贡献者画像"""
+    commits = pd.concat([sample_dataframe, sample_dataframe.assign(date='2025-01-12 09:00:00')],
+                        ignore_index=True)
+    commits['date'] = pd.to_datetime(commits['date'])
+    commits['date_only'] = commits['date'].dt.date
+
+    profiles = build_contributor_profiles(commits, core_authors=['Jane Smith'])
+    jane = profiles.loc['Jane Smith']
+    assert jane['total_commits'] == 2
+    assert jane['active_days'] == 2
+    assert jane['first_commit'] == pd.Timestamp('2025-01-11 14:45:00')
+    assert jane['last_commit'] == pd.Timestamp('2025-01-12 09:00:00')
+    assert jane['churn'] == 250
+    assert bool(jane['is_core'])
+    assert not bool(profiles.loc['John Doe', 'is_core'])
+
+def test_render_charts_profiles_and_skip(tmp_path, capsys):
+    """进程池绘制 SVG 图表，输入未变化时跳过重绘"""
+    chart_data = {
+        'weekday_distribution': {'labels': ['周一', '周二'], 'values': [3, 1]},
+        'message_types_pie': {'fix': 2, 'docs': 1, 'other': 0},
+        'code_structure_analysis': {'function_defs': 4},
+    }
+    rendered = render_charts(chart_data, str(tmp_path), profile='vector', workers=2)
+    assert sorted(Path(p).name for p in rendered.values()) == [
+        'code_structure_analysis.svg', 'message_types_pie.svg', 'weekday_distribution.svg']
+    first_mtime = (tmp_path / 'weekday_distribution.svg').stat().st_mtime_ns
+
+    chart_data['message_types_pie']['fix'] = 5
+    capsys.readouterr()
+    render_charts(chart_data, str(tmp_path), profile='vector', workers=1)
+    out = capsys.readouterr().out
+    assert '跳过未变化的图表: weekday_distribution.svg' in out
+    assert '跳过未变化的图表: message_types_pie.svg' not in out
+    assert (tmp_path / 'weekday_distribution.svg').stat().st_mtime_ns == first_mtime
+
+    # 切换输出配置后重新绘制并删除旧格式的文件
+    render_charts(chart_data, str(tmp_path), profile='preview', workers=1)
+    assert (tmp_path / 'weekday_distribution.png').exists()
+    assert not (tmp_path / 'weekday_distribution.svg').exists()
+
+    with pytest.raises(ValueError):
+        render_charts(chart_data, str(tmp_path), profile='poster')
@@ -0,0 +1,57 @@
+import json
+
+from src.backup_store import BackupStore
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+def _set_created(store, name, created):
+    """改写快照时间，模拟不同日期的备份"""
+    manifest_path = store.snapshots_dir / f"{name}.json"
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    manifest['created'] = created
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+
+def test_snapshot_deduplicates_and_restores(tmp_path):
+    """只复制变化的内容；内容未变时不新建快照；可完整恢复"""
+    source = tmp_path / "analysis"
+    _write(source / "report.md", "v1")
+    _write(source / "chart.png", "png-bytes")
+    _write(source / ".cache" / "load.pkl", "cache")
+    store = BackupStore(tmp_path / "backups")
+
+    first = store.snapshot(source, exclude=['.cache'])
+    assert first['name'] and first['files'] == 2 and first['new_objects'] == 2
+
+    unchanged = store.snapshot(source, exclude=['.cache'])
+    assert unchanged['name'] is None and unchanged['new_objects'] == 0
+
+    _write(source / "report.md", "v2 with more text")
+    second = store.snapshot(source, exclude=['.cache'])
+    assert second['name'] and second['new_objects'] == 1
+    assert second['bytes_copied'] == len("v2 with more text")
+    assert store.list_snapshots() == [first['name'], second['name']]
+
+    restored = tmp_path / "restored"
+    assert store.restore(first['name'], restored) == 2
+    assert (restored / "report.md").read_text(encoding='utf-8') == "v1"
+    assert not (restored / ".cache").exists()
+
+def test_retention_and_garbage_collection(tmp_path):
+    """保留最近 N 份和每天最新的一份，回收无引用对象"""
+    source = tmp_path / "analysis"
+    store = BackupStore(tmp_path / "backups")
+    dates = ['2025-01-01T10:00:00', '2025-01-01T12:00:00', '2025-01-02T09:00:00', '2025-01-03T09:00:00']
+    names = []
+    for i, created in enumerate(dates):
+        _write(source / "report.md", f"version {i}")
+        name = store.snapshot(source)['name']
+        _set_created(store, name, created)
+        names.append(name)
+
+    result = store.apply_retention(keep_last=1, keep_daily=2, keep_weekly=0)
+    assert sorted(result['removed']) == sorted(names[:2])
+    assert store.list_snapshots() == sorted(names[2:])
+    assert result['objects_removed'] == 2
+    assert len(list(store.objects_dir.glob('*/*'))) == 2
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from src.batch import load_manifest, run_batch
+
+def test_load_manifest(tmp_path):
+    """文本清单每行一个路径；JSON 清单可指定名称与项目信息"""
+    text = tmp_path / "repos.txt"
+    text.write_text("# 注释\n/srv/a\n\n/srv/b\n", encoding='utf-8')
+    assert [r['name'] for r in load_manifest(str(text))] == ['a', 'b']
+
+    manifest = tmp_path / "repos.json"
+    manifest.write_text('["/srv/a", {"path": "/other/a", "name": "a2", "url": "https://example.com/a"}]',
+                        encoding='utf-8')
+    repos = load_manifest(str(manifest))
+    assert repos[1]['name'] == 'a2' and repos[1]['url'] == 'https://example.com/a'
+
+def test_run_batch_isolates_failures(git_repo, tmp_path, monkeypatch):
+    """每个仓库独立输出，失败的仓库只记录在汇总表中"""
+    monkeypatch.chdir(tmp_path)
+    repos = [{'path': str(git_repo), 'name': 'demo'},
+             {'path': str(tmp_path / "missing"), 'name': 'missing'}]
+    summary = run_batch(repos, output_root=str(tmp_path / "out"), data_dir=str(tmp_path / "data"),
+                        workers=2)
+
+    assert summary['name'].tolist() == ['demo', 'missing']
+    assert summary['status'].tolist() == ['ok', 'failed']
+    assert summary.loc[0, 'commits'] == 3 and summary.loc[0, 'contributors'] == 2
+    assert pd.isna(summary.loc[0, 'warning'])
+    assert (tmp_path / "data" / "demo_commits.csv").exists()
+    report = (tmp_path / "out" / "demo" / "analysis_report.md").read_text(encoding='utf-8')
+    assert '**项目名称**: demo' in report
+    assert (tmp_path / "out" / "logs" / "missing.log").stat().st_size > 0
+    saved = pd.read_csv(tmp_path / "out" / "batch_summary.csv")
+    assert saved['status'].tolist() == ['ok', 'failed']
+
+def test_safe_collector_warns_about_skipped_structure(git_repo, tmp_path, monkeypatch):
+    """safe 收集器没有完整哈希，汇总表注明跳过了代码结构分析"""
+    monkeypatch.chdir(tmp_path)
+    summary = run_batch([{'path': str(git_repo), 'name': 'demo'}], output_root=str(tmp_path / "out"),
+                        data_dir=str(tmp_path / "data"), workers=1, collector='safe')
+    assert summary['status'].tolist() == ['ok']
+    assert '代码结构分析' in summary.loc[0, 'warning']
@@ -0,0 +1,43 @@
+import json
+import subprocess
+
+from src.benchmark import compare_benchmarks, generate_commit_table, generate_repository, run_benchmarks
+
+def test_synthetic_data_follows_config(tmp_path):
+    """合成提交表与合成仓库的规模、作者数与消息类型符合配置"""
+    df = generate_commit_table(200, authors=5, files=10, message_mix={'fix': 1.0}, seed=1)
+    assert len(df) == 200 and df['author'].nunique() <= 5
+    assert df['message'].str.startswith('fix:').all()
+    assert df['date'].str.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} [+-]\d{4}$').all()
+    assert df['hash'].is_unique and df['commit_hash'].is_unique
+    assert (df['commit_hash'] == df['hash'].str[:7]).all()
+
+    repo = generate_repository(str(tmp_path / "repo"), 50, authors=3, files=8, seed=2)
+    count = subprocess.run(['git', '-C', repo, 'rev-list', '--count', 'HEAD'],
+                           capture_output=True, text=True, check=True).stdout.strip()
+    assert count == '50'
+
+def test_run_benchmarks_records_every_phase(tmp_path):
+    """结果 JSON 包含收集器与分析各阶段的耗时，可与另一次结果比较"""
+    output = tmp_path / "bench.json"
+    report = run_benchmarks(sizes=[30], authors=3, files=5, work_dir=str(tmp_path / "work"),
+                            output_path=str(output))
+    names = {r['benchmark'] for r in report['results']}
+    assert {'generate_repository', 'collect_robust', 'collect_safe', 'analysis.load',
+            'analysis.aggregate', 'analysis.report', 'analysis.total'} <= names
+    assert json.loads(output.read_text(encoding='utf-8'))['config']['sizes'] == ['30']
+
+    slower = json.loads(output.read_text(encoding='utf-8'))
+    for result in slower['results']:
+        result['seconds'] = result['seconds'] * 2 + 1
+    comparison = compare_benchmarks(str(output), slower)
+    assert comparison['regression'].all()
+
+def test_cached_cases_are_keyed_by_message_mix(tmp_path):
+    """消息类型比例不同的两次运行不会复用同一份合成提交表"""
+    work = tmp_path / "work"
+    for mix in ({'fix': 1.0}, {'docs': 1.0}):
+        run_benchmarks(sizes=[20], authors=2, files=3, message_mix=mix, work_dir=str(work),
+                       generate_repo=False)
+    cases = sorted(p for p in work.iterdir() if p.is_dir())
+    assert len(cases) == 2
@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.churn import ChurnIndex, FileChangeTable
+from src.data_collection import collect_commit_data_robust
+
+def _table():
+    """三个提交：a/x.py 与 a/y.py 两次一起变更"""
+    table = FileChangeTable()
+    table.start_commit('c1', '2024-01-05 10:00:00 +0000')
+    table.add(10, 0, 'a/x.py')
+    table.add(5, 0, 'a/y.py')
+    table.start_commit('c2', '2024-02-01 10:00:00 +0800')
+    table.add(3, 2, 'a/x.py')
+    table.add(1, 1, 'a/y.py')
+    table.add(4, 0, 'README.md')
+    table.start_commit('c3', '2024-02-03 10:00:00 +0000')
+    table.add(0, 7, 'b/z.py')
+    return table
+
+def test_table_is_integer_coded_and_round_trips(tmp_path):
+    """路径按整数编码，保存后读取结果一致"""
+    table = _table()
+    data = table.arrays()
+    assert table.paths == ['a/x.py', 'a/y.py', 'README.md', 'b/z.py']
+    assert data['path'].dtype == np.int32
+    assert data['path'].tolist() == [0, 1, 0, 1, 2, 3]
+
+    path = tmp_path / 'churn.npz'
+    table.save(str(path))
+    loaded = FileChangeTable.load(str(path))
+    assert loaded.paths == table.paths
+    assert loaded.commit_hashes == table.commit_hashes
+    assert loaded.to_frame().equals(table.to_frame())
+
+def test_index_queries():
+    """热点文件、目录趋势与共同变更"""
+    index = ChurnIndex(_table())
+    hotspots = index.hotspots(top=2)
+    assert hotspots['path'].tolist() == ['a/x.py', 'a/y.py']
+    assert hotspots['churn'].tolist() == [15, 7]
+    assert index.hotspots(since='2024-02-02')['path'].tolist() == ['b/z.py']
+
+    monthly = index.directory_churn(depth=1, freq='M')
+    assert monthly.loc['2024-01', 'a'] == 15
+    assert monthly.loc['2024-02'].to_dict() == {'a': 7, '.': 4, 'b': 7}
+
+    pairs = index.co_change_pairs(min_count=2)
+    assert pairs[['file_a', 'file_b', 'count']].values.tolist() == [['a/x.py', 'a/y.py', 2]]
+    assert pairs['confidence'].tolist() == [1.0]
+    assert index.file_history('README.md')['hash'].tolist() == ['c2']
+
+def test_collector_saves_file_changes(git_repo, tmp_path):
+    """收集时同时保存逐文件变更，行数与提交表的累计值一致"""
+    churn_path = tmp_path / 'churn.npz'
+    df = collect_commit_data_robust(str(git_repo), str(tmp_path / 'commits.csv'), churn_path=str(churn_path))
+    table = FileChangeTable.load(str(churn_path))
+    assert table.commit_hashes == df['hash'].tolist()
+    frame = table.to_frame()
+    assert len(frame) == df['files_changed'].sum()
+    assert frame['added'].sum() == df['lines_added'].sum()
+    assert ChurnIndex(table).hotspots(top=1)['path'].tolist() == ['core.py']
@@ -0,0 +1,76 @@
+import os
+import json
+import subprocess
+
+from src.analysis import analyze_commit_patterns
+from src.code_structure import analyze_code_structure, analyze_source
+from src.data_collection import collect_commit_data_robust, list_commit_hashes
+
+def test_analyze_source():
+    """统计函数、类、导入、分支、循环与注释；语法错误返回 None"""
+    source = b"import os\n# comment\nclass A:\n    def f(self, x):\n        for i in x:\n            if i:\n                return i\n"
+    assert analyze_source(source) == {'function_defs': 1, 'class_defs': 1, 'imports': 1,
+                                      'if_statements': 1, 'loops': 1, 'comments': 1}
+    assert analyze_source(b"def broken(:\n") is None
+
+def test_code_structure_deltas_and_cache(git_repo, tmp_path):
+    """每个提交的增量与最新状态合计；第二次运行全部来自缓存"""
+    hashes = list_commit_hashes(str(git_repo))
+    cache_path = tmp_path / "blobs.json"
+    result = analyze_code_structure(str(git_repo), hashes, cache_path=str(cache_path), workers=1)
+    by_commit = result['commits'].set_index('hash')
+    assert by_commit.loc[hashes[2], 'function_defs'] == 1      # 新增 core.py
+    assert by_commit.loc[hashes[1], 'imports'] == 1            # 新增 util.py，core.py 只改返回值
+    assert by_commit.loc[hashes[1], 'py_files_changed'] == 2
+    assert by_commit.loc[hashes[0], 'py_files_changed'] == 0   # 只改 README.md
+    assert result['totals']['function_defs'] == 1 and result['totals']['imports'] == 1
+    assert result['parsed'] == 3 and len(json.loads(cache_path.read_text())) == 3
+
+    again = analyze_code_structure(str(git_repo), hashes, cache_path=str(cache_path), workers=1)
+    assert again['parsed'] == 0 and again['totals'] == result['totals']
+
+def test_replay_follows_topology_not_dates(git_repo, tmp_path):
+    """提交时间被改早的子提交排在父提交之后时，合计仍取自拓扑顺序最新的提交"""
+    (git_repo / 'core.py').write_text('def f():\n    return 3\n\ndef g():\n    pass\n', encoding='utf-8')
+    date = '2024-06-01T00:00:00+0000'
+    env = dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-qam', 'Back-dated change'], check=True, env=env)
+
+    # 按提交时间从新到旧排列（例如按日期排序后的提交表），回填的提交排在最后
+    hashes = list_commit_hashes(str(git_repo))
+    by_date = hashes[1:] + hashes[:1]
+    result = analyze_code_structure(str(git_repo), by_date, workers=1)
+    assert result['totals']['function_defs'] == 2
+    assert result['commits']['hash'].tolist() == by_date
+    assert result['commits'].set_index('hash').loc[hashes[0], 'function_defs'] == 1
+
+def test_totals_include_merge_resolution(git_repo):
+    """合并提交没有 diff，合计取自最新提交的树，包含冲突解决后的文件内容"""
+    def git(*args):
+        subprocess.run(['git', '-C', str(git_repo), *args], check=True, capture_output=True)
+
+    git('checkout', '-q', '-b', 'side')
+    (git_repo / 'core.py').write_text('import os\nimport sys\n', encoding='utf-8')
+    git('commit', '-qam', 'Side change')
+    git('checkout', '-q', 'main')
+    (git_repo / 'core.py').write_text('import re\nimport json\n', encoding='utf-8')
+    git('commit', '-qam', 'Main change')
+    subprocess.run(['git', '-C', str(git_repo), 'merge', '-q', 'side'], capture_output=True)
+    (git_repo / 'core.py').write_text('import os\nimport re\nimport sys\n\ndef f():\n    pass\n',
+                                      encoding='utf-8')
+    git('commit', '-qam', 'Merge side')
+
+    result = analyze_code_structure(str(git_repo), list_commit_hashes(str(git_repo)), workers=1)
+    # core.py 3 个导入与 1 个函数，加上 util.py 的 1 个导入
+    assert result['totals']['imports'] == 4 and result['totals']['function_defs'] == 1
+
+def test_analysis_with_repo_path(git_repo, tmp_path, monkeypatch):
+    """提供仓库路径时生成真实的代码结构图与逐提交明细"""
+    monkeypatch.chdir(tmp_path)
+    data_path = tmp_path / "commits.csv"
+    collect_commit_data_robust(str(git_repo), str(data_path))
+    output_dir = tmp_path / "out"
+    analyze_commit_patterns(str(data_path), str(output_dir), render_workers=1, repo_path=str(git_repo))
+    assert (output_dir / "code_structure_analysis.png").exists()
+    assert (output_dir / "code_structure_by_commit.csv").exists()
+    assert '1 个函数' in (output_dir / "analysis_report.md").read_text(encoding='utf-8')
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from src.contributors import WindowCounts, contributor_timeline, summarize_contributors
+
+def _regrouped(df, end, window):
+    """直接按窗口重新分组计算，作为对照"""
+    day = pd.Timestamp(end)
+    mask = (df['date'] >= day - pd.Timedelta(days=window - 1)) & (df['date'] < day + pd.Timedelta(days=1))
+    return df.loc[mask, 'author'].value_counts()
+
+def test_window_counts_metrics():
+    """巴士因子、前 k 位占比与基尼系数"""
+    counts = WindowCounts()
+    for author in ['a'] * 6 + ['b'] * 3 + ['c']:
+        counts.add(author)
+    assert counts.bus_factor() == 1 and counts.top_share(2) == 0.9
+    # 基尼系数与两两差值定义一致
+    values = [6, 3, 1]
+    expected = sum(abs(x - y) for x in values for y in values) / (2 * len(values) ** 2 * (sum(values) / 3))
+    assert counts.gini() == pytest.approx(expected)
+    for author in ['a'] * 5:
+        counts.remove(author)
+    assert counts.counts == {'a': 1, 'b': 3, 'c': 1} and counts.bus_factor() == 1
+    assert summarize_contributors(pd.DataFrame({'author': ['a', 'b', 'a', 'c']}))['bus_factor'] == 1
+
+def test_sliding_timeline_matches_regrouping():
+    """增量滑动的结果与逐窗口重新分组一致，新贡献者按首次提交判断"""
+    df = pd.DataFrame({
+        'author': ['a', 'a', 'b', 'c', 'a', 'b', 'd', 'c'],
+        'date': pd.to_datetime(['2024-01-01 09:00', '2024-01-03 23:00', '2024-01-05 00:00', '2024-02-10 12:00',
+                                '2024-02-11 08:00', '2024-03-01 10:00', '2024-03-05 18:00', '2024-03-20 07:00']),
+    })
+    timeline = contributor_timeline(df, windows=(30,), freq='D')
+    assert len(timeline) == (df['date'].max().normalize() - df['date'].min().normalize()).days + 1
+    for row in timeline.itertuples():
+        counts = _regrouped(df, row.date, 30)
+        assert row.commits == counts.sum()
+        assert row.contributors == len(counts)
+    last = timeline.iloc[-1]
+    # 2024-02-20..03-20：b、d、c 活跃，其中只有 d 首次提交在窗口内
+    assert (last['new_contributors'], last['returning_contributors']) == (1, 2)
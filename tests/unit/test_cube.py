@@ -0,0 +1,67 @@
+import pytest
+import pandas as pd
+
+from src.analysis import classify_messages, normalize_stage
+from src.cube import CommitCube
+
+def _commits(n=6):
+    """带时间组件与消息类型的提交数据"""
+    df = pd.DataFrame({
+        'hash': [f'{i:040x}' for i in range(n)],
+        'commit_hash': [f'{i:07x}' for i in range(n)],
+        'author': ['Alice', 'Alice', 'Alice', 'Carol', 'Bob', 'Alice'][:n],
+        'date': ['2024-01-01 09:10:00 +0000', '2024-01-01 09:40:00 +0000', '2024-01-02 14:00:00 +0900',
+                 '2024-02-05 23:59:00 -0500', '2024-02-06 09:00:00 +0000', '2025-03-01 09:30:00 +0000'][:n],
+        'message': ['fix bug', 'fix typo', 'fix crash', 'update docs', 'refactor code', 'add tests'][:n],
+        'lines_added': [1, 2, 3, 4, 5, 6][:n],
+        'lines_deleted': [0, 1, 0, 1, 0, 1][:n],
+        'files_changed': [1, 1, 2, 1, 3, 1][:n],
+    })
+    df = normalize_stage(df)
+    df['message_type'] = classify_messages(df['message'])
+    return df
+
+def test_rollups_match_raw_aggregates():
+    """立方体汇总结果与直接从提交行计算的结果一致"""
+    df = _commits()
+    cube = CommitCube.from_commits(df)
+    assert len(cube.cells) < len(df)
+
+    assert cube.hour_counts().tolist() == df['hour'].value_counts().reindex(range(24), fill_value=0).tolist()
+    assert cube.day_counts()['周一'] == int((df['day_of_week'] == 'Monday').sum())
+    assert cube.author_counts().to_dict() == df['author'].value_counts().to_dict()
+    monthly = cube.monthly_stats()
+    assert monthly['month_str'].tolist() == ['2024-01', '2024-02', '2025-03']
+    assert monthly['commits'].tolist() == [3, 2, 1]
+    assert monthly['authors'].tolist() == [1, 2, 1]
+    assert monthly['net_change'].tolist() == [5, 8, 5]
+
+def test_slice_and_pivot():
+    """按作者和时间切片后做小时 × 星期透视"""
+    cube = CommitCube.from_commits(_commits())
+    alice_2024 = cube.slice(authors=['Alice'], start='2024-01-01', end='2024-12-31')
+    assert alice_2024.cells['commits'].sum() == 3
+    pivot = alice_2024.pivot('hour', 'weekday')
+    assert pivot.loc[9, 0] == 2 and pivot.loc[14, 1] == 1
+    assert cube.slice(message_types=['fix']).cells['lines_added'].sum() == 6
+
+@pytest.mark.parametrize("suffix", ["csv", "parquet"])
+def test_incremental_append_matches_rebuild(tmp_path, suffix):
+    """追加新提交只聚合新增行，结果与整体重建一致；历史被改写时重建"""
+    if suffix == 'parquet':
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"cube.{suffix}"
+    full = _commits()
+    CommitCube.from_commits(full.iloc[:4]).save(str(path))
+
+    cube = CommitCube.load(str(path))
+    assert cube.can_append(full)
+    assert cube.append(full) == 2
+    cube.save(str(path))
+    expected = CommitCube.from_commits(full).rollup('date', 'hour', 'author')
+    pd.testing.assert_frame_equal(CommitCube.load(str(path)).rollup('date', 'hour', 'author'), expected)
+
+    rewritten = full.iloc[::-1].reset_index(drop=True)
+    assert not cube.can_append(rewritten)
+    assert cube.append(rewritten) == len(rewritten)
+    assert not cube.can_append(full, config={'time_basis': 'utc'})
@@ -1,10 +1,295 @@
 import pytest
-from src.data_collection import collect_commit_data
+from src.data_collection import (
+    collect_commit_data,
+    collect_commit_data_incremental,
+    collect_commit_data_parallel,
+    collect_commit_data_robust,
+    collect_commit_data_safe,
+    collect_commit_data_streaming,
+    collect_commits,
+    iter_git_log_commits,
+    write_commit_batches,
+    _split_rename_path,
+    benchmark_rename_detection,
+)
+from src.churn import ChurnIndex, FileChangeTable
 import pandas as pd
 import os
+import subprocess
 
 def test_sample_data(sample_commits):
     """测试 sample_commits fixture 是否正常工作"""
     assert len(sample_commits) == 2
     assert sample_commits[0]['author'] == 'John Doe'
-    assert sample_commits[1]['lines_added'] == 120
\ No newline at end of file
+    assert sample_commits[1]['lines_added'] == 120
+
+def test_iter_git_log_commits(git_repo):
+    """流式解析应逐条生成提交记录，并累计行数统计"""
+    commits = list(iter_git_log_commits(str(git_repo)))
+    assert [c['author'] for c in commits] == ['Alice', 'Bob', 'Alice']
+    assert commits[1]['message'] == 'Fix bug | in parser'
+    assert commits[1]['files_changed'] == 2
+    assert commits[1]['lines_added'] == 2
+    assert commits[1]['lines_deleted'] == 1
+    assert all(len(c['hash']) == 40 for c in commits)
+
+def test_streaming_matches_robust(git_repo, tmp_path):
+    """流式模式与健壮模式输出相同的数据"""
+    robust_path = tmp_path / "robust.csv"
+    stream_path = tmp_path / "stream.csv"
+    robust_df = collect_commit_data(str(git_repo), str(robust_path))
+    total = collect_commit_data_streaming(str(git_repo), str(stream_path), batch_size=2)
+
+    assert total == len(robust_df) == 3
+    stream_df = pd.read_csv(stream_path, encoding='utf-8-sig')
+    pd.testing.assert_frame_equal(stream_df, pd.read_csv(robust_path, encoding='utf-8-sig'))
+
+def test_write_commit_batches_batches(tmp_path):
+    """分批写入应覆盖所有记录"""
+    commits = ({'hash': str(i), 'author': 'A'} for i in range(7))
+    output = tmp_path / "out" / "commits.csv"
+    assert write_commit_batches(commits, str(output), batch_size=3) == 7
+    assert len(pd.read_csv(output, encoding='utf-8-sig')) == 7
+
+def _commit_file(repo_dir, filename, content, message):
+    """在测试仓库中追加一个提交"""
+    (repo_dir / filename).write_text(content, encoding='utf-8')
+    subprocess.run(['git', '-C', str(repo_dir), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(repo_dir), 'commit', '-q', '-m', message], check=True)
+
+def test_incremental_appends_new_commits(git_repo, tmp_path):
+    """增量模式只追加水位线之后的提交"""
+    output = tmp_path / "commits.csv"
+    assert collect_commit_data_incremental(str(git_repo), str(output)) == 3
+
+    _commit_file(git_repo, 'new.py', 'x = 1\n', 'Add new module')
+    assert collect_commit_data_incremental(str(git_repo), str(output)) == 1
+    assert collect_commit_data_incremental(str(git_repo), str(output)) == 0
+
+    df = pd.read_csv(output, encoding='utf-8-sig')
+    assert len(df) == 4
+    assert df['hash'].is_unique
+    assert df.iloc[-1]['message'] == 'Add new module'
+
+def test_failed_append_leaves_dataset_unchanged(git_repo, tmp_path):
+    """git 在追加中途失败时数据文件与水位线都不变，修复后重新收集不会重复"""
+    output = tmp_path / "commits.csv"
+    collect_commit_data_incremental(str(git_repo), str(output))
+    before = output.read_bytes()
+    watermark = (tmp_path / "commits.csv.watermark.json").read_bytes()
+
+    _commit_file(git_repo, 'broken.py', 'b = 1\n', 'Add broken module')
+    _commit_file(git_repo, 'later.py', 'c = 1\n', 'Add later module')
+    blob = subprocess.run(['git', '-C', str(git_repo), 'rev-parse', 'HEAD~1:broken.py'],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    blob_path = git_repo / '.git' / 'objects' / blob[:2] / blob[2:]
+    blob_data = blob_path.read_bytes()
+    os.remove(blob_path)
+
+    # git 先输出 "Add later module"，随后在缺失的对象上退出
+    with pytest.raises(subprocess.CalledProcessError):
+        collect_commit_data_incremental(str(git_repo), str(output))
+    assert output.read_bytes() == before
+    assert (tmp_path / "commits.csv.watermark.json").read_bytes() == watermark
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_file()) == ['commits.csv', 'commits.csv.watermark.json']
+
+    blob_path.write_bytes(blob_data)
+    assert collect_commit_data_incremental(str(git_repo), str(output)) == 2
+    df = pd.read_csv(output, encoding='utf-8-sig')
+    assert len(df) == 5 and df['hash'].is_unique
+
+def test_failed_full_write_keeps_previous_data(tmp_path):
+    """全量写入中途出错时保留原有数据"""
+    output = tmp_path / "commits.csv"
+    write_commit_batches(({'hash': str(i), 'author': 'A'} for i in range(3)), str(output))
+    before = output.read_bytes()
+
+    def failing():
+        yield {'hash': 'x', 'author': 'B'}
+        raise subprocess.CalledProcessError(128, 'git log')
+
+    with pytest.raises(subprocess.CalledProcessError):
+        write_commit_batches(failing(), str(output), batch_size=1)
+    assert output.read_bytes() == before
+    assert [p.name for p in tmp_path.iterdir()] == ['commits.csv']
+
+def test_incremental_detects_rewritten_history(git_repo, tmp_path):
+    """水位线被强制推送改写后应退回全量收集"""
+    output = tmp_path / "commits.csv"
+    collect_commit_data_incremental(str(git_repo), str(output))
+
+    subprocess.run(['git', '-C', str(git_repo), 'reset', '-q', '--hard', 'HEAD~1'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'reflog', 'expire', '--expire=now', '--all'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'gc', '-q', '--prune=now'], check=True)
+    _commit_file(git_repo, 'other.py', 'y = 2\n', 'Rewrite history')
+
+    assert collect_commit_data_incremental(str(git_repo), str(output)) == 3
+    df = pd.read_csv(output, encoding='utf-8-sig')
+    assert len(df) == 3
+    assert 'Update docs' not in df['message'].tolist()
+
+def test_history_range_options(git_repo):
+    """提交数上限、修订范围与时间窗口"""
+    repo = str(git_repo)
+    assert len(list(iter_git_log_commits(repo))) == 3
+    assert len(list(iter_git_log_commits(repo, max_count=2))) == 2
+    assert [c['message'] for c in iter_git_log_commits(repo, rev_range='HEAD~1..HEAD')] == ['Update docs']
+    window = list(iter_git_log_commits(repo, since='2025-01-12 00:00:00 +0000',
+                                        until='2025-01-12 23:59:59 +0000'))
+    assert [c['author'] for c in window] == ['Bob']
+
+@pytest.mark.parametrize("shard_by", ["commits", "date"])
+def test_parallel_matches_robust(git_repo, tmp_path, shard_by):
+    """并行分片收集的结果与健壮模式一致"""
+    robust_df = collect_commit_data(str(git_repo), str(tmp_path / "robust.csv"))
+    parallel_df = collect_commit_data_parallel(
+        str(git_repo), str(tmp_path / "parallel.csv"), workers=2, shards=3, shard_by=shard_by
+    )
+    assert len(parallel_df.attrs['shard_timings']) == 3
+    if shard_by == 'date':
+        parallel_df = parallel_df.sort_values('date').reset_index(drop=True)
+        robust_df = robust_df.sort_values('date').reset_index(drop=True)
+    pd.testing.assert_frame_equal(parallel_df, robust_df)
+
+def test_parallel_date_shards_respect_max_count(git_repo, tmp_path):
+    """时间窗口中同一时刻的其他提交不会突破 max_count"""
+    env = dict(os.environ, GIT_COMMITTER_DATE='2025-02-01T12:00:00+0000', GIT_AUTHOR_DATE='2025-02-01T12:00:00+0000')
+    for i in range(3):
+        (git_repo / f'same_{i}.py').write_text(f'v = {i}\n', encoding='utf-8')
+        subprocess.run(['git', '-C', str(git_repo), 'add', '-A'], check=True)
+        subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', f'Same time {i}'], check=True, env=env)
+
+    robust_df = collect_commit_data_robust(str(git_repo), str(tmp_path / "robust.csv"), max_count=2)
+    parallel_df = collect_commit_data_parallel(str(git_repo), str(tmp_path / "parallel.csv"), workers=1,
+                                               shards=2, shard_by='date', max_count=2)
+    assert sorted(parallel_df['hash']) == sorted(robust_df['hash'])
+    windowed_df = collect_commits(str(git_repo), str(tmp_path / "auto.csv"), windows=2, max_count=2)
+    assert sorted(windowed_df['hash']) == sorted(robust_df['hash'])
+
+def _non_monotonic_repo(tmp_path):
+    """A(1 月) <- B(3 月) <- C(2 月)：B 只能经由更早的 C 到达"""
+    repo = tmp_path / "skewed"
+    subprocess.run(['git', 'init', '-q', '-b', 'main', str(repo)], check=True)
+    for name, date in [('A', '2025-01-01T00:00:00+0000'), ('B', '2025-03-01T00:00:00+0000'),
+                       ('C', '2025-02-01T00:00:00+0000')]:
+        (repo / f'{name}.py').write_text(f'{name} = 1\n', encoding='utf-8')
+        env = dict(os.environ, GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=f'{name}@example.com',
+                   GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=f'{name}@example.com',
+                   GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        subprocess.run(['git', '-C', str(repo), 'add', '-A'], check=True)
+        subprocess.run(['git', '-C', str(repo), 'commit', '-q', '-m', f'Commit {name}'], check=True, env=env)
+    return repo
+
+def test_parallel_date_shards_with_non_monotonic_dates(tmp_path):
+    """提交时间不单调时按时间分片或分窗口都不会漏掉提交，结果与健壮模式一致"""
+    repo = _non_monotonic_repo(tmp_path)
+    robust_df = collect_commit_data_robust(str(repo), str(tmp_path / "robust.csv"))
+    assert robust_df['author'].tolist() == ['C', 'B', 'A']
+    parallel_df = collect_commit_data_parallel(str(repo), str(tmp_path / "parallel.csv"), workers=1,
+                                               shards=2, shard_by='date')
+    assert parallel_df['hash'].tolist() == robust_df['hash'].tolist()
+    windowed_df = collect_commits(str(repo), str(tmp_path / "auto.csv"), windows=2)
+    assert windowed_df['hash'].tolist() == robust_df['hash'].tolist()
+
+def test_safe_mode_matches_robust_stats(git_repo, tmp_path):
+    """安全模式与健壮模式的统计一致"""
+    robust_df = collect_commit_data(str(git_repo), str(tmp_path / "robust.csv"))
+    safe_df = collect_commit_data_safe(str(git_repo), str(tmp_path / "safe.csv"))
+    columns = ['commit_hash', 'author', 'message', 'lines_added', 'lines_deleted', 'files_changed']
+    pd.testing.assert_frame_equal(safe_df[columns], robust_df[columns])
+
+def test_safe_mode_dates_carry_offset(git_repo, tmp_path, monkeypatch):
+    """安全模式的日期带提交者时区，与健壮模式混合后按 UTC 换算一致，不受收集机器时区影响"""
+    import time
+    from src.storage import split_date_offset
+    monkeypatch.setenv('TZ', 'America/Los_Angeles')
+    time.tzset()
+    try:
+        safe_df = collect_commit_data_safe(str(git_repo), str(tmp_path / "safe.csv"))
+    finally:
+        monkeypatch.delenv('TZ')
+        time.tzset()
+    robust_df = collect_commit_data_robust(str(git_repo), str(tmp_path / "robust.csv"))
+
+    mixed = pd.concat([safe_df['date'], robust_df['date']], ignore_index=True)
+    local, offset = split_date_offset(mixed)
+    utc = local - pd.to_timedelta(offset.astype('int64'), unit='m')
+    n = len(safe_df)
+    assert utc[:n].tolist() == utc[n:].tolist()
+    assert offset[:n].tolist() == offset[n:].tolist() == [-300, 540, 0]
+
+def test_safe_mode_skips_broken_commit(git_repo, tmp_path):
+    """缺失对象的提交被跳过，其余提交照常收集"""
+    blob = subprocess.run(['git', '-C', str(git_repo), 'rev-parse', 'HEAD~1:util.py'],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    os.remove(git_repo / '.git' / 'objects' / blob[:2] / blob[2:])
+
+    with pytest.raises(subprocess.CalledProcessError):
+        collect_commit_data(str(git_repo), str(tmp_path / "robust.csv"))
+
+    safe_df = collect_commit_data_safe(str(git_repo), str(tmp_path / "safe.csv"))
+    assert safe_df['message'].tolist() == ['Update docs', 'Add core module']
+
+def test_collect_commits_falls_back_per_range(git_repo, tmp_path):
+    """只有出错的范围退回安全模式，其余范围仍一次性收集"""
+    blob = subprocess.run(['git', '-C', str(git_repo), 'rev-parse', 'HEAD~1:util.py'],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    os.remove(git_repo / '.git' / 'objects' / blob[:2] / blob[2:])
+
+    df = collect_commits(str(git_repo), str(tmp_path / "auto.csv"), ranges=['HEAD~1..HEAD', 'HEAD~1'])
+    assert df['message'].tolist() == ['Update docs', 'Add core module']
+    assert [(r['mode'], r['commits'], r['skipped']) for r in df.attrs['ranges']] == [
+        ('robust', 1, 0), ('safe', 1, 1)]
+    assert df.attrs['ranges'][1]['error']
+    # 退回安全模式的范围与健壮模式的输出格式相同
+    assert df['date'].str.contains(r'[+-]\d{4}$').all()
+
+def test_collect_commits_windows_match_robust(git_repo, tmp_path):
+    """按时间窗口收集与一次性收集的结果一致；格式参数优先于扩展名"""
+    robust_df = collect_commit_data_robust(str(git_repo), str(tmp_path / "robust.csv"))
+    output_path = tmp_path / "auto.data"
+    df = collect_commits(str(git_repo), str(output_path), windows=2, output_format='parquet')
+    assert len(df.attrs['ranges']) == 2
+    assert {r['mode'] for r in df.attrs['ranges']} == {'robust'}
+    pd.testing.assert_frame_equal(df, robust_df)
+    assert pd.read_parquet(output_path)['hash'].tolist() == robust_df['hash'].tolist()
+
+    with pytest.raises(ValueError):
+        collect_commits(str(git_repo), str(output_path), mode='safe', windows=2)
+
+@pytest.mark.parametrize("raw, expected", [
+    ("src/a.py", (None, "src/a.py")),
+    ("old.py => new.py", ("old.py", "new.py")),
+    ("src/{core => lib}/a.py", ("src/core/a.py", "src/lib/a.py")),
+    ("src/{ => lib}/a.py", ("src/a.py", "src/lib/a.py")),
+])
+def test_split_rename_path(raw, expected):
+    """numstat 的两种重命名写法都能拆出新旧路径"""
+    assert _split_rename_path(raw) == expected
+
+def test_rename_mode_counts_only_content_changes(git_repo, tmp_path):
+    """检测重命名时，移动文件不再计为整个文件的删除 + 新增，逐文件记录带新旧路径"""
+    (git_repo / 'pkg').mkdir()
+    subprocess.run(['git', '-C', str(git_repo), 'mv', 'core.py', 'pkg/core.py'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', 'Move core'], check=True)
+
+    plain = list(iter_git_log_commits(str(git_repo), max_count=1))[0]
+    assert (plain['lines_added'], plain['lines_deleted'], plain['files_changed']) == (2, 2, 2)
+
+    table = FileChangeTable()
+    renamed = list(iter_git_log_commits(str(git_repo), max_count=1, file_changes=table, find_renames=50))[0]
+    assert (renamed['lines_added'], renamed['lines_deleted'], renamed['files_changed']) == (0, 0, 1)
+    assert table.to_frame()[['path', 'old_path']].astype(str).values.tolist() == [['pkg/core.py', 'core.py']]
+
+    churn_path = tmp_path / 'churn.npz'
+    collect_commit_data_robust(str(git_repo), str(tmp_path / 'commits.csv'), churn_path=str(churn_path),
+                               find_renames=50)
+    index = ChurnIndex(FileChangeTable.load(str(churn_path)))
+    assert index.renames()[['old_path', 'new_path']].values.tolist() == [['core.py', 'pkg/core.py']]
+    assert index.file_history('pkg/core.py')['path'].tolist() == ['pkg/core.py', 'core.py', 'core.py']
+    assert len(index.file_history('pkg/core.py', follow_renames=False)) == 1
+
+    result = benchmark_rename_detection(str(git_repo), thresholds=(50,))
+    assert result['mode'].tolist() == ['no-renames', 'find-renames=50%']
+    assert result['renames'].tolist() == [0, 1]
+    assert result['lines_added'].iloc[1] < result['lines_added'].iloc[0]
@@ -0,0 +1,60 @@
+import subprocess
+
+import pytest
+
+from src.git_backend import GitBackend
+
+def _rev(repo, rev):
+    return subprocess.check_output(['git', '-C', str(repo), 'rev-parse', rev]).decode().strip()
+
+def test_read_blobs_with_cache(git_repo):
+    """一个 cat-file 进程读取多个对象，重复读取命中 LRU 缓存"""
+    with GitBackend(git_repo) as backend:
+        assert backend.read_blob('HEAD~2:core.py') == b'def f():\n    return 1\n'
+        sha = _rev(git_repo, 'HEAD:core.py')
+        blobs = backend.read_blobs([sha, 'HEAD:util.py', 'HEAD:missing.py', sha])
+        assert blobs == [b'def f():\n    return 2\n', b'import os\n', None, b'def f():\n    return 2\n']
+        assert backend.read_blob(sha) == blobs[0] and backend.cache.hits == 1
+        with pytest.raises(KeyError):
+            backend.read_object('0' * 40)
+        pid = backend._cat_file.pid
+        backend.read_blob(_rev(git_repo, 'HEAD:README.md'))
+        assert backend._cat_file.pid == pid
+
+def test_diff_trees(git_repo):
+    """按提交或两棵树批量获取文件级变更"""
+    commits = subprocess.check_output(['git', '-C', str(git_repo), 'rev-list', 'HEAD']).decode().split()
+    with GitBackend(git_repo) as backend:
+        changes = backend.diff_trees(commits)
+        assert [c['new_path'] for c in changes[2]] == ['core.py']
+        assert changes[2][0]['status'] == 'A' and changes[2][0]['old_sha'] is None
+        assert sorted((c['status'], c['new_path']) for c in changes[1]) == [('A', 'util.py'), ('M', 'core.py')]
+        assert backend.read_blob(changes[1][0]['new_sha']).startswith(b'def f()')
+
+        trees = backend.diff_tree(_rev(git_repo, 'HEAD~2^{tree}'), _rev(git_repo, 'HEAD^{tree}'))
+        assert {c['new_path'] for c in trees} == {'core.py', 'util.py', 'README.md'}
+
+def test_missing_path_with_space(git_repo):
+    """路径含空格的对象名：存在时正常读取，不存在时返回 None 而不是解析失败"""
+    (git_repo / 'my file.py').write_text('x = 1\n', encoding='utf-8')
+    subprocess.run(['git', '-C', str(git_repo), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', 'Add file with space'], check=True)
+    with GitBackend(git_repo) as backend:
+        assert backend.read_blobs(['HEAD:no_such file.py', 'HEAD:my file.py']) == [None, b'x = 1\n']
+        with pytest.raises(KeyError):
+            backend.read_blob('HEAD:no_such file.py')
+
+def test_merge_commits_have_no_changes(git_repo):
+    """合并提交不输出变更（与 git log --numstat 一致）"""
+    def git(*args):
+        subprocess.run(['git', '-C', str(git_repo), *args], check=True, capture_output=True)
+    git('checkout', '-q', '-b', 'side', 'HEAD~1')
+    (git_repo / 'side.py').write_text('y = 1\n', encoding='utf-8')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'Side change')
+    git('checkout', '-q', 'main')
+    git('merge', '-q', '--no-edit', 'side')
+    with GitBackend(git_repo) as backend:
+        merge, side = backend.diff_trees([_rev(git_repo, 'HEAD'), _rev(git_repo, 'side')])
+        assert merge == []
+        assert [c['new_path'] for c in side] == ['side.py']
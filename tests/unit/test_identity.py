@@ -0,0 +1,87 @@
+import os
+import subprocess
+
+import pandas as pd
+
+import src.identity as identity
+from src.identity import IdentityResolver, blocking_keys, resolve_author_identities
+
+def test_resolver_merges_aliases_without_all_pairs():
+    """共享分块键或名称足够相似的身份合并，通用名称与相似的短名不合并"""
+    resolver = IdentityResolver()
+    for name, email, commits in [
+        ('John Doe', 'john.doe@example.com', 5),
+        ('johndoe', '1234+johndoe@users.noreply.github.com', 2),
+        ('Doe, John', 'jd@work.example', 1),
+        ('Jon Doe', 'jon@elsewhere.example', 1),
+        ('Bob', 'bob@example.com', 3),
+        ('Rob', 'rob@example.com', 1),
+        ('root', 'root@localhost', 4),
+    ]:
+        resolver.add(name, email, commits)
+    canonical = resolver.canonical_names()
+    assert {canonical[i] for i in resolver.identities if 'oe' in i} == {'John Doe'}
+    assert canonical['Bob <bob@example.com>'] == 'Bob'
+    assert canonical['Rob <rob@example.com>'] == 'Rob'
+    assert 'compact:root' not in blocking_keys('root', 'root@localhost')
+
+def test_mailmap_and_cached_mapping(git_repo, tmp_path):
+    """先应用 .mailmap，映射缓存后再次运行只处理新身份"""
+    env = {'GIT_AUTHOR_NAME': 'bob', 'GIT_AUTHOR_EMAIL': 'bob@example.com',
+           'GIT_COMMITTER_NAME': 'bob', 'GIT_COMMITTER_EMAIL': 'bob@example.com'}
+    (git_repo / 'extra.txt').write_text('x\n', encoding='utf-8')
+    subprocess.run(['git', '-C', str(git_repo), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', 'Extra'], check=True,
+                   env=dict(os.environ, **env))
+    (git_repo / '.mailmap').write_text('Alice Liddell <alice@example.com>\n', encoding='utf-8')
+
+    authors = pd.Series(['bob', 'Alice', 'Bob', 'Alice'])
+    cache_path = tmp_path / 'identities.json'
+    first = resolve_author_identities(authors, repo_path=str(git_repo), cache_path=str(cache_path))
+    assert first['mapping'] == {'Alice': 'Alice Liddell', 'bob': 'Bob'}
+    assert first['clusters'] == 2 and first['new_identities'] == 3
+
+    second = resolve_author_identities(authors, repo_path=str(git_repo), cache_path=str(cache_path))
+    assert second['new_identities'] == 0
+    assert second['mapping'] == first['mapping']
+
+    names_only = resolve_author_identities(pd.Series(['Carol Smith', 'carol smith', 'Carol Smith']))
+    assert names_only['mapping'] == {'carol smith': 'Carol Smith'}
+
+def test_same_first_name_or_handle_stays_separate():
+    """只共享名字或邮箱用户名的不同的人不合并；用户名与完整名称匹配时才合并"""
+    resolver = IdentityResolver()
+    for name, email in [('Alex', 'alex@a.example'), ('Alex', 'alex@b.example'),
+                        ('alexsmith', 'alexsmith@c.example'), ('alexsmith', 'alexsmith@d.example'),
+                        ('Alex Smith', 'as@e.example')]:
+        resolver.add(name, email)
+    assert resolver.find('Alex <alex@a.example>') != resolver.find('Alex <alex@b.example>')
+    # 两个 alexsmith 用户名都与完整名称 "Alex Smith" 匹配
+    assert len({resolver.find(f'alexsmith <alexsmith@{d}.example>') for d in 'cd'}
+               | {resolver.find('Alex Smith <as@e.example>')}) == 1
+    assert blocking_keys('Alex', 'alex@a.example') == ['email:alex@a.example']
+
+def test_git_identities_cached_by_head(git_repo, tmp_path, monkeypatch):
+    """HEAD 未变化时不再运行 git log，新提交只读取增量；分块截断会被报告"""
+    calls = []
+    original = identity.read_git_identities
+    monkeypatch.setattr(identity, 'read_git_identities',
+                        lambda repo_path, rev='HEAD': calls.append(rev) or original(repo_path, rev))
+    authors = pd.Series(['Alice', 'Bob'])
+    cache_path = str(tmp_path / 'identities.json')
+    resolve_author_identities(authors, repo_path=str(git_repo), cache_path=cache_path)
+    resolve_author_identities(authors, repo_path=str(git_repo), cache_path=cache_path)
+    assert len(calls) == 1
+
+    env = dict(os.environ, GIT_AUTHOR_NAME='Bob', GIT_AUTHOR_EMAIL='bob@example.com')
+    (git_repo / 'more.txt').write_text('x\n', encoding='utf-8')
+    subprocess.run(['git', '-C', str(git_repo), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', 'More'], check=True, env=env)
+    resolve_author_identities(authors, repo_path=str(git_repo), cache_path=cache_path)
+    assert len(calls) == 2 and '..' in calls[1]
+    cached = IdentityResolver.load(cache_path).identities
+    assert cached['Bob <bob@example.com>'][2] == 2
+
+    monkeypatch.setattr(identity, 'MAX_BLOCK_SIZE', 1)
+    result = resolve_author_identities(pd.Series(['Ann Lee', 'Ann Low', 'Ann Lin']))
+    assert result['truncated_blocks'] == 1
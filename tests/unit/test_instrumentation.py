@@ -0,0 +1,65 @@
+import json
+import time
+
+import pandas as pd
+
+from src.analysis import RUN_PROFILE, RUN_TRACE, analyze_commit_patterns
+from src.instrumentation import Profiler, profiling, record_span, span
+
+def test_spans_are_recorded_only_while_profiling(tmp_path):
+    """激活期间的区间（含嵌套与外部测得的区间）写入剖析，未激活时为空操作"""
+    with span('outside') as s:
+        s.set(rows=1)
+
+    path, trace_path = tmp_path / 'profile.json', tmp_path / 'profile.trace.json'
+    with profiling(str(path), str(trace_path), name='demo') as profiler:
+        with span('outer', rows=3) as outer:
+            with span('inner', 'subprocess'):
+                pass
+            outer.set(extra=True)
+        record_span('chart demo', 'chart', time.perf_counter(), 0.25, pid=123)
+
+    profile = json.loads(path.read_text(encoding='utf-8'))
+    spans = {s['name']: s for s in profile['spans']}
+    assert profile['name'] == 'demo'
+    assert set(spans) == {'outer', 'inner', 'chart demo'}
+    assert spans['outer']['rows'] == 3 and spans['outer']['extra']
+    assert spans['outer']['seconds'] >= spans['inner']['seconds']
+    assert spans['inner']['category'] == 'subprocess'
+    assert spans['chart demo']['seconds'] == 0.25 and spans['chart demo']['pid'] == 123
+
+    trace = json.loads(trace_path.read_text(encoding='utf-8'))
+    assert {e['ph'] for e in trace['traceEvents']} == {'X'}
+    assert {e['name']: e['dur'] for e in trace['traceEvents']}['chart demo'] == 250000
+    assert len(profiler.spans) == 3
+
+def test_nested_profilers_share_spans():
+    """外层记录器同样收到内层激活期间的区间"""
+    with Profiler('batch') as outer:
+        with Profiler('analysis') as inner:
+            with span('aggregate'):
+                pass
+    assert [s.name for s in outer.spans] == [s.name for s in inner.spans] == ['aggregate']
+
+def test_analysis_writes_run_profile(tmp_path, monkeypatch):
+    """分析结束后在输出目录写入运行剖析，覆盖流水线阶段、日期解析与每张图表"""
+    monkeypatch.chdir(tmp_path)
+    data = pd.DataFrame({
+        'commit_hash': ['a1', 'b2', 'c3'],
+        'author': ['Alice', 'Bob', 'Alice'],
+        'date': ['2025-01-11 10:30:00 +0000', '2025-01-12 11:00:00 +0900', '2025-02-01 09:00:00 +0000'],
+        'message': ['Fix bug', 'Add feature', 'Update docs'],
+    })
+    input_path = tmp_path / "commits.csv"
+    data.to_csv(input_path, index=False)
+    output_dir = tmp_path / "out"
+
+    analyze_commit_patterns(str(input_path), str(output_dir), render_profile='preview', render_workers=1,
+                            profile_trace=True)
+    profile = json.loads((output_dir / RUN_PROFILE).read_text(encoding='utf-8'))
+    names = {s['name'] for s in profile['spans']}
+    assert {'load', 'normalize', 'aggregate', 'render', 'report', 'date parse', 'aggregate cube'} <= names
+    assert any(name.startswith('chart ') for name in names)
+    assert {s['rows'] for s in profile['spans'] if s['name'] == 'date parse'} == {3}
+    assert (output_dir / RUN_TRACE).exists()
+    assert (output_dir / 'summary.txt').exists()
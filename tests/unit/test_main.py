@@ -0,0 +1,61 @@
+import json
+
+import pandas as pd
+import pytest
+
+import src.main as main_module
+from src import analysis, data_collection, storage
+from src.main import COLLECT_MODES, RENDER_PROFILES, STORAGE_FORMATS, load_module, main, measure_startup
+
+def test_startup_skips_plotting_libraries():
+    """只有实际绘图时才导入 matplotlib / seaborn，report 子命令不导入任何较重的库"""
+    results = {item['command']: item for item in measure_startup(['collect', 'analyze', 'report'], repeat=1)}
+    for command in ('collect', 'analyze'):
+        assert 'pandas' in results[command]['modules']
+        assert not {'matplotlib', 'seaborn'} & set(results[command]['modules'])
+    assert results['report']['modules'] == []
+    assert results['report']['import_seconds'] < results['collect']['import_seconds']
+
+def test_choices_match_modules():
+    """入口不导入较重的模块，收集模式、存储格式与图表配置列表需与其保持一致"""
+    assert COLLECT_MODES == data_collection.COLLECTION_MODES
+    assert STORAGE_FORMATS == storage.SUPPORTED_FORMATS
+    assert set(RENDER_PROFILES) == set(analysis.RENDER_PROFILES)
+    with pytest.raises(SystemExit):
+        main(['analyze', 'commits.csv', 'out', '--profile', 'vectr'])
+
+def test_load_module_reraises_missing_dependencies(monkeypatch):
+    """src 下的模块缺少依赖时直接抛出，只有 src 包不可导入时才回退为顶层模块"""
+    attempts = []
+
+    def fake_import(name):
+        attempts.append(name)
+        missing = 'pandas' if name == 'src.analysis' else 'src'
+        raise ImportError(f"No module named {missing!r}", name=missing)
+
+    monkeypatch.setattr(main_module.importlib, 'import_module', fake_import)
+    with pytest.raises(ImportError) as excinfo:
+        load_module('analysis')
+    assert excinfo.value.name == 'pandas' and attempts == ['src.analysis']
+
+    attempts.clear()
+    with pytest.raises(ImportError):
+        load_module('storage')
+    assert attempts == ['src.storage', 'storage']
+
+def test_collect_analyze_report(git_repo, tmp_path, monkeypatch, capsys):
+    """collect -> analyze -> report 子命令串联运行"""
+    monkeypatch.chdir(tmp_path)  # 备份目录相对于当前工作目录
+    data_path = tmp_path / 'commits.csv'
+    output_dir = tmp_path / 'out'
+    assert main(['collect', str(git_repo), str(data_path)]) == 0
+    assert len(pd.read_csv(data_path)) > 0
+
+    assert main(['analyze', str(data_path), str(output_dir), '--profile', 'preview', '--workers', '1']) == 0
+    assert json.loads((output_dir / 'run_profile.json').read_text(encoding='utf-8'))['spans']
+
+    capsys.readouterr()
+    assert main(['report', str(output_dir), '--top', '3']) == 0
+    printed = capsys.readouterr().out
+    assert '运行剖析' in printed
+    assert main(['report', str(tmp_path / 'missing')]) == 1
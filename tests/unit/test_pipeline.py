@@ -0,0 +1,67 @@
+import pandas as pd
+
+from src.analysis import analyze_commit_patterns
+from src.pipeline import Pipeline
+
+def _build(cache_dir, calls, factor=2):
+    """两阶段流水线：source -> scaled"""
+    pipeline = Pipeline(cache_dir=cache_dir)
+    def source():
+        calls.append('source')
+        return [1, 2, 3]
+    def scaled(values, factor):
+        calls.append('scaled')
+        return [v * factor for v in values]
+    pipeline.add_stage('source', source, digest='input-v1')
+    pipeline.add_stage('scaled', scaled, inputs=['source'], config={'factor': factor})
+    return pipeline
+
+def test_pipeline_cache_skips_upstream(tmp_path):
+    """下游命中缓存时不执行也不读取上游阶段；配置变化只重算受影响的阶段"""
+    calls = []
+    assert _build(tmp_path, calls).result('scaled') == [2, 4, 6]
+    assert calls == ['source', 'scaled']
+
+    calls.clear()
+    pipeline = _build(tmp_path, calls)
+    assert pipeline.result('scaled') == [2, 4, 6]
+    assert calls == []
+    assert [m['stage'] for m in pipeline.metrics] == ['scaled']
+    assert pipeline.metrics[0]['cached']
+
+    calls.clear()
+    pipeline = _build(tmp_path, calls, factor=3)
+    assert pipeline.result('scaled') == [3, 6, 9]
+    assert calls == ['scaled']
+    metric = pipeline.metrics[-1]
+    assert not metric['cached'] and metric['seconds'] >= 0 and metric['peak_memory_mb'] > 0
+
+def test_analysis_reuses_cached_stages(tmp_path, monkeypatch):
+    """第二次分析直接复用聚合结果，输入文件变化后重新计算"""
+    monkeypatch.chdir(tmp_path)  # 备份目录相对于当前工作目录
+    data = pd.DataFrame({
+        'commit_hash': ['a1', 'b2', 'c3'],
+        'author': ['Alice', 'Bob', 'Alice'],
+        'date': ['2025-01-11 10:30:00 +0000', '2025-01-12 11:00:00 +0900', '2025-02-01 09:00:00 +0000'],
+        'message': ['Fix bug', 'Add feature', 'Update docs'],
+    })
+    input_path = tmp_path / "commits.csv"
+    data.to_csv(input_path, index=False)
+    output_dir = tmp_path / "out"
+
+    first = analyze_commit_patterns(str(input_path), str(output_dir), render_workers=1)
+    assert [m['stage'] for m in first.attrs['stage_metrics']] == [
+        'load', 'normalize', 'code_structure', 'identity', 'aggregate', 'render', 'report']
+    assert (output_dir / "stage_metrics.json").exists()
+
+    second = analyze_commit_patterns(str(input_path), str(output_dir), render_workers=1)
+    metrics = {m['stage']: m for m in second.attrs['stage_metrics']}
+    assert metrics['aggregate']['cached']
+    assert 'load' not in metrics and 'normalize' not in metrics
+    assert (output_dir / "analysis_report.md").exists()
+    assert second['message_type'].tolist() == first['message_type'].tolist()
+
+    data.iloc[:2].to_csv(input_path, index=False)
+    third = analyze_commit_patterns(str(input_path), str(output_dir), render_workers=1)
+    assert not {m['stage']: m for m in third.attrs['stage_metrics']}['aggregate']['cached']
+    assert len(third) == 2
@@ -0,0 +1,86 @@
+import sys
+import subprocess
+from pathlib import Path
+
+from src.setup_repo import fetch_history, is_shallow_repo, setup_requests_repo, sync_repositories
+
+def _count_commits(repo_dir):
+    """统计仓库中可见的提交数"""
+    result = subprocess.run(['git', '-C', str(repo_dir), 'rev-list', '--count', 'HEAD'],
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+def test_shallow_clone_can_be_deepened(git_repo, tmp_path):
+    """已有的浅层克隆应增量加深，而不是重新克隆"""
+    clone_dir = tmp_path / "clone"
+    setup_requests_repo(str(clone_dir), repo_url=f"file://{git_repo}", depth=1)
+    assert is_shallow_repo(str(clone_dir))
+    assert _count_commits(clone_dir) == 1
+
+    setup_requests_repo(str(clone_dir), repo_url=f"file://{git_repo}", deepen=1)
+    assert _count_commits(clone_dir) == 2
+
+    setup_requests_repo(str(clone_dir), repo_url=f"file://{git_repo}", full_history=True)
+    assert not is_shallow_repo(str(clone_dir))
+    assert _count_commits(clone_dir) == 3
+    assert fetch_history(str(clone_dir), unshallow=True) is False
+
+def test_command_line_deepens_and_unshallows(git_repo, tmp_path):
+    """命令行的 --deepen / --full-history 传给 setup_requests_repo"""
+    script = Path(__file__).resolve().parents[2] / 'src' / 'setup_repo.py'
+    clone_dir = tmp_path / "clone"
+
+    def run(*args):
+        subprocess.run([sys.executable, str(script), '--repo-path', str(clone_dir),
+                        '--repo-url', f"file://{git_repo}", *args], check=True, capture_output=True)
+
+    run('--depth', '1')
+    assert _count_commits(clone_dir) == 1
+    run('--deepen', '1')
+    assert _count_commits(clone_dir) == 2
+    run('--full-history')
+    assert not is_shallow_repo(str(clone_dir)) and _count_commits(clone_dir) == 3
+
+def test_concurrent_sync_clones_then_fetches(git_repo, tmp_path):
+    """并发部分克隆多个仓库，再次同步时 fetch 并快进；单个失败不影响其他仓库"""
+    bare = tmp_path / "upstream.git"
+    subprocess.run(['git', 'clone', '-q', '--bare', str(git_repo), str(bare)], check=True)
+    subprocess.run(['git', '-C', str(bare), 'config', 'uploadpack.allowFilter', 'true'], check=True)
+    repos = [{'name': f'mirror{i}', 'path': str(tmp_path / f"mirror{i}"), 'url': f"file://{bare}"}
+             for i in range(3)]
+    repos.append({'name': 'broken', 'path': str(tmp_path / "broken"), 'url': f"file://{tmp_path / 'missing.git'}"})
+
+    results = sync_repositories(repos, concurrency=2, partial=True)
+    assert [r['action'] for r in results] == ['clone'] * 4
+    assert [r['status'] for r in results] == ['ok', 'ok', 'ok', 'failed']
+    assert all(r['seconds'] is not None for r in results)
+    config = subprocess.run(['git', '-C', repos[0]['path'], 'config', 'remote.origin.partialclonefilter'],
+                            capture_output=True, text=True, check=True)
+    assert config.stdout.strip() == 'blob:none'
+
+    (git_repo / "new.txt").write_text("new\n", encoding='utf-8')
+    subprocess.run(['git', '-C', str(git_repo), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', 'New'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'push', '-q', str(bare), 'main'], check=True)
+
+    results = sync_repositories(repos[:3], concurrency=3)
+    assert [(r['action'], r['status']) for r in results] == [('fetch', 'ok')] * 3
+    assert all(_count_commits(repo['path']) == 4 for repo in repos[:3])
+
+def test_sync_defaults_to_full_clone_and_updates_bare_clones(git_repo, tmp_path):
+    """默认完整克隆（分析不需要向远程补取文件内容）；裸仓库 fetch 时更新分支"""
+    clone = {'name': 'clone', 'path': str(tmp_path / "clone"), 'url': f"file://{git_repo}"}
+    bare = tmp_path / "mirror.git"
+    subprocess.run(['git', 'clone', '-q', '--bare', str(git_repo), str(bare)], check=True)
+    assert [r['status'] for r in sync_repositories([clone])] == ['ok']
+    config = subprocess.run(['git', '-C', clone['path'], 'config', 'remote.origin.partialclonefilter'],
+                            capture_output=True, text=True)
+    assert config.returncode != 0
+
+    (git_repo / "new.txt").write_text("new\n", encoding='utf-8')
+    subprocess.run(['git', '-C', str(git_repo), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(git_repo), 'commit', '-q', '-m', 'New'], check=True)
+
+    results = sync_repositories([{'name': 'bare', 'path': str(bare)}])
+    assert [(r['action'], r['status']) for r in results] == [('fetch', 'ok')]
+    assert _count_commits(bare) == 4
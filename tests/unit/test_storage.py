@@ -0,0 +1,59 @@
+import pytest
+import pandas as pd
+
+from src.storage import (
+    detect_format,
+    load_commit_table,
+    save_commit_table,
+    split_date_offset,
+)
+from src.data_collection import collect_commit_data_streaming
+
+def test_detect_format():
+    """根据扩展名推断存储格式"""
+    assert detect_format("a/b.csv") == 'csv'
+    assert detect_format("a/b.parquet") == 'parquet'
+    assert detect_format("a/b.feather") == 'feather'
+    assert detect_format("a/b.parquet", 'csv') == 'csv'
+    with pytest.raises(ValueError):
+        detect_format("a/b.csv", 'xlsx')
+
+def test_split_date_offset():
+    """日期拆分为本地时间与 UTC 偏移（分钟）"""
+    dates = pd.Series(['2025-10-15 20:45:42 +0900', '2025-10-13 16:16:05', '2025-01-13 09:15:00 -0530', 'bad'])
+    local, offset = split_date_offset(dates)
+    assert local.iloc[0] == pd.Timestamp('2025-10-15 20:45:42')
+    assert offset.tolist()[:3] == [540, 0, -330]
+    assert pd.isna(local.iloc[3]) and pd.isna(offset.iloc[3])
+
+@pytest.mark.parametrize("suffix", ["parquet", "feather"])
+def test_columnar_roundtrip(sample_dataframe, tmp_path, suffix):
+    """列式存储保留类型并支持列投影"""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"commits.{suffix}"
+    save_commit_table(sample_dataframe, str(path))
+
+    df = load_commit_table(str(path))
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert isinstance(df['author'].dtype, pd.CategoricalDtype)
+    assert str(df['lines_added'].dtype) == 'int32'
+    assert df['lines_added'].tolist() == [45, 120]
+
+    projected = load_commit_table(str(path), columns=['author', 'lines_added', 'missing'])
+    assert list(projected.columns) == ['author', 'lines_added']
+
+def test_csv_projection(sample_dataframe, tmp_path):
+    """CSV 仍可作为导出格式，并支持列投影"""
+    path = tmp_path / "commits.csv"
+    save_commit_table(sample_dataframe, str(path))
+    df = load_commit_table(str(path), columns=['commit_hash', 'message'])
+    assert list(df.columns) == ['commit_hash', 'message']
+
+def test_streaming_to_parquet(git_repo, tmp_path):
+    """流式收集可以分批直接写入 Parquet"""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "commits.parquet"
+    assert collect_commit_data_streaming(str(git_repo), str(path), batch_size=1) == 3
+    df = load_commit_table(str(path))
+    assert df['author'].tolist() == ['Alice', 'Bob', 'Alice']
+    assert df['utc_offset'].tolist() == [-300, 540, 0]